@@ -1,31 +1,23 @@
-import json
 from threading import Thread, Event
 from multiprocessing import Queue
 import numpy as np
 import requests
 from utils.utils import Logger, function_name, get_local_ip
+from hotelling_server.parameters.config_service import ConfigService
 
 
 class GenericBotClient(Thread, Logger):
 
-    # noinspection SpellCheckingInspection
-    with open("hotelling_server/parameters/network.json") as file:
-        network_parameters = json.load(file)
-
-    if network_parameters["ip_autodetect"] and not network_parameters["local"]:
-        ip_address = get_local_ip()
-    elif network_parameters["local"]:
-        ip_address = "localhost"
-    else:
-        ip_address = network_parameters["ip_address"]
-
-    port = network_parameters["port"]
     delay_retry = 1
 
     def __init__(self):
 
         super().__init__()
 
+        # autodetection is done once for every bot
+        self.ip_address = ConfigService.derived("network", "bot_ip_address", self.get_ip_address)
+        self.port = ConfigService.get("network")["port"]
+
         # Would be set after get init
         self.idx = None
 
@@ -37,6 +29,16 @@ class GenericBotClient(Thread, Logger):
 
         self.queue = Queue()
 
+    @staticmethod
+    def get_ip_address(network_parameters):
+
+        if network_parameters["ip_autodetect"] and not network_parameters["local"]:
+            return get_local_ip()
+        elif network_parameters["local"]:
+            return "localhost"
+        else:
+            return network_parameters["ip_address"]
+
     def handle(self, what, params):
 
         self.log("Handle {} with params '{}'.".format(what, params))
@@ -88,13 +90,11 @@ class HotellingBot(GenericBotClient):
     # noinspection SpellCheckingInspection
     name = "HotellingBot"
 
-    # noinspection SpellCheckingInspection
-    with open("hotelling_server/parameters/game.json") as f:
-        game_parameters = json.load(f)
-
     def __init__(self, name=None):
         super().__init__()
 
+        self.game_parameters = ConfigService.get("game")
+
         if name is not None:
             self.name = name
 
@@ -1,16 +1,24 @@
 from multiprocessing import Queue, Event
-import json
 import numpy as np
 
 from utils.utils import Logger
+from utils.message_bus import Message, CommandRegistry
 
 from hotelling_server.control import server
+from hotelling_server.parameters.config_service import ConfigService
 
 
 class BotController(Logger):
 
     name = "BotController"
 
+    # Commands that can be sent by server through 'queue'
+    commands = (
+        "server_running",
+        "server_error",
+        "server_request"
+    )
+
     def __init__(self, firm):
 
         self.role = firm
@@ -18,6 +26,7 @@ class BotController(Logger):
         self.parameters = {}
         self.shutdown = Event()
         self.queue = Queue()
+        self.registry = CommandRegistry(owner=self, commands=self.commands)
 
         self.setup()
 
@@ -26,24 +35,22 @@ class BotController(Logger):
 
     def setup(self):
 
-        for key in ["network", "game", "folders", "map_android_id_server_id", "parametrization"]:
-
-            # noinspection SpellCheckingInspection
-            with open("hotelling_server/parameters/{}.json".format(key)) as file:
-                self.parameters[key] = json.load(file)
+        self.parameters.update(
+            ConfigService.get_many("network", "game", "folders", "map_android_id_server_id", "parametrization")
+        )
 
     def run(self):
 
         self.server.start()
 
-        self.server.queue.put(("Go", ))
+        self.server.queue.put(Message("Go"))
 
         while not self.shutdown.is_set():
 
             try:
                 self.log("Waiting for a message.")
                 message = self.queue.get()
-                if message == "break":
+                if message.command == "break":
                     break
                 else:
                     self.handle_message(message)
@@ -56,7 +63,7 @@ class BotController(Logger):
                     self.log("Game Over at t {}".format(self.game.end))
                     self.log("Waiting for a message.")
                     message = self.queue.get()
-                    if message == "break":
+                    if message.command == "break":
                         break
                     else:
                         self.handle_message(message)
@@ -69,26 +76,20 @@ class BotController(Logger):
         self.server.end()
         self.shutdown.set()
 
-    # noinspection PyMethodMayBeStatic
     def handle_message(self, message):
 
-        command = message[0]
-        args = message[1:]
-        if len(args):
-            eval("self.{}(*args)".format(command))
-        else:
-            eval("self.{}()".format(command))
+        self.registry.dispatch(message)
 
     def server_running(self):
         self.log("Server running.")
 
     def server_error(self, arg):
         self.log("Server error: {}.".format(arg))
-        self.queue.put("break")
+        self.queue.put(Message("break"))
 
     def server_request(self, server_data):
         response = self.game.handle_request(server_data)
-        self.server.queue.put(("reply", response))
+        self.server.queue.put(Message("reply", response))
 
     def get_parameters(self, key):
 
@@ -1,9 +1,9 @@
-import json
 import pickle
 from threading import Thread, Event
 import numpy as np
 
 from utils.utils import Logger
+from hotelling_server.parameters.config_service import ConfigService
 
 
 # noinspection SpellCheckingInspection
@@ -11,9 +11,6 @@ class HotellingLocalBots(Logger, Thread):
 
     name = "HotellingLocalBots"
 
-    with open("hotelling_server/parameters/game.json") as f:
-        game_parameters = json.load(f)
-
     # load conditions
     with open("hotelling_server/parameters/means.p", "rb") as f:
         customer_extra_view_means = pickle.load(f)
@@ -28,6 +25,11 @@ class HotellingLocalBots(Logger, Thread):
         self.time_manager = controller.time_manager
         self.data = controller.data
 
+        self.game_parameters = ConfigService.get("game")
+
+        self.watchdog = controller.watchdog
+        self.heartbeat_name = "{} ({})".format(self.name, controller.label)
+
         self.n_positions = self.game_parameters["n_positions"]
 
         self.n_customers = n_customers
@@ -55,6 +57,8 @@ class HotellingLocalBots(Logger, Thread):
 
         while True:
 
+            self.watchdog.beat(self.heartbeat_name)
+
             Event().wait(1)
 
             # if all non bot agents are connected then break
@@ -64,13 +68,15 @@ class HotellingLocalBots(Logger, Thread):
             if cond:
                 break
 
-            if not self.controller.server.is_alive() or self.stopped():
+            if not self.controller.is_serving() or self.stopped():
+                self.watchdog.forget(self.heartbeat_name)
                 return 0
 
         self.log("Bot initialization...", level=1)
 
         # start to init bots
-        self.init()
+        with self.data.lock:
+            self.init()
 
         self.log("Game is starting.", level=1)
 
@@ -83,32 +89,38 @@ class HotellingLocalBots(Logger, Thread):
 
         while True:
 
+            self.watchdog.beat(self.heartbeat_name)
+
             # play bot firms
             for firm_id in self.data.bot_firms_id.values():
 
-                if self.data.current_state["firm_status"][firm_id] == "active":
-                    self.play_active_firm(firm_id)
+                with self.data.lock:
 
-                else:
-                    self.play_passive_firm(firm_id)
+                    if self.data.current_state["firm_status"][firm_id] == "active":
+                        self.play_active_firm(firm_id)
 
-                self.data.save()
+                    else:
+                        self.play_passive_firm(firm_id)
+
+                    self.data.save()
 
             # play bot customers
             for customer_id in self.data.bot_customers_id.values():
 
-                self.play_customer(customer_id)
-                self.data.save()
+                with self.data.lock:
+                    self.play_customer(customer_id)
+                    self.data.save()
 
             Event().wait(1)
 
             self.time_manager.check_state()
 
-            if self.time_manager.state == "end_game" or self.controller.server.shutdown_event.is_set() \
+            if self.time_manager.state == "end_game" or not self.controller.is_serving() \
                 or self.stopped() or not self.controller.running_game.is_set():
 
                 self.set_bots_to_end_state()
                 self.log("Game ends, bots are going to shutdown.")
+                self.watchdog.forget(self.heartbeat_name)
 
                 break
 
@@ -117,11 +129,13 @@ class HotellingLocalBots(Logger, Thread):
 
     def set_bots_to_end_state(self):
 
-        for firm_id in self.data.bot_firms_id.values():
-            self.data.current_state["firm_states"][firm_id] = "end_game"
+        with self.data.lock:
+
+            for firm_id in self.data.bot_firms_id.values():
+                self.data.write("firm_states", firm_id, "end_game")
 
-        for customer_id in self.data.bot_customers_id.values():
-            self.data.current_state["customer_states"][customer_id] = "end_game"
+            for customer_id in self.data.bot_customers_id.values():
+                self.data.write("customer_states", customer_id, "end_game")
 
     # ---------------------------------------------------------- #
 
@@ -158,11 +172,11 @@ class HotellingLocalBots(Logger, Thread):
 
                 if game_id not in self.data.customers_id.keys():
 
-                    self.data.customers_id[game_id] = customer_id
-                    self.data.bot_customers_id[game_id] = customer_id
+                    self.data.write_field("customers_id", game_id, customer_id)
+                    self.data.write_field("bot_customers_id", game_id, customer_id)
 
-                    self.data.roles[game_id] = "customer"
-                    self.data.current_state["time_since_last_request_customers"][customer_id] = " ✔ "
+                    self.data.write_field("roles", game_id, "customer")
+                    self.data.write("time_since_last_request_customers", customer_id, " ✔ ")
 
             # --------------- init firms ------------------------------------ #
 
@@ -174,11 +188,11 @@ class HotellingLocalBots(Logger, Thread):
 
                 if game_id not in self.data.firms_id.keys():
 
-                    self.data.firms_id[game_id] = firm_id
-                    self.data.bot_firms_id[game_id] = firm_id
+                    self.data.write_field("firms_id", game_id, firm_id)
+                    self.data.write_field("bot_firms_id", game_id, firm_id)
 
-                    self.data.roles[game_id] = "firm"
-                    self.data.current_state["time_since_last_request_firms"][firm_id] = " ✔ "
+                    self.data.write_field("roles", game_id, "firm")
+                    self.data.write("time_since_last_request_firms", firm_id, " ✔ ")
 
         self.check_remaining_agents()
 
@@ -189,7 +203,7 @@ class HotellingLocalBots(Logger, Thread):
         remaining = len(self.data.roles) - (len(self.data.firms_id) + len(self.data.customers_id))
 
         if not remaining:
-            self.data.current_state["init_done"] = True
+            self.data.write_entry("init_done", True)
             self.time_manager.check_state()
 
         else:
@@ -205,12 +219,12 @@ class HotellingLocalBots(Logger, Thread):
             if not self.data.current_state["customer_replies"][customer_id]:
                 extra_view, firm = self.customer_choice(customer_id)
 
-                self.data.current_state["customer_extra_view_choices"][customer_id] = extra_view
+                self.data.write("customer_extra_view_choices", customer_id, extra_view)
 
-                self.data.current_state["customer_firm_choices"][customer_id] = firm
-                self.data.current_state["customer_replies"][customer_id] = 1
+                self.data.write("customer_firm_choices", customer_id, firm)
+                self.data.write("customer_replies", customer_id, 1)
 
-                self.data.current_state["customer_states"][customer_id] = "ask_customer_choice_recording"
+                self.data.write("customer_states", customer_id, "ask_customer_choice_recording")
 
                 self.controller.game.compute_utility(customer_id)
 
@@ -275,9 +289,9 @@ class HotellingLocalBots(Logger, Thread):
 
         if not self.data.current_state["active_gets_results"]:
             if self.time_manager.state == "active_has_played_and_all_customers_replied":
-                self.data.current_state["active_gets_results"] = True
+                self.data.write_entry("active_gets_results", True)
                 self.firm_n_client(firm_id)
-                self.data.current_state["firm_states"][firm_id] = "ask_firm_active_customer_choices"
+                self.data.write("firm_states", firm_id, "ask_firm_active_customer_choices")
 
     # ---------------------------------------------------------- #
 
@@ -285,9 +299,9 @@ class HotellingLocalBots(Logger, Thread):
 
         if self.time_manager.state == "active_has_played_and_all_customers_replied":
             if not self.data.current_state["passive_gets_results"]:
-                self.data.current_state["passive_gets_results"] = True
+                self.data.write_entry("passive_gets_results", True)
                 self.firm_n_client(firm_id)
-                self.data.current_state["firm_states"][firm_id] = "ask_firm_passive_customer_choices"
+                self.data.write("firm_states", firm_id, "ask_firm_passive_customer_choices")
 
     # ---------------------------------------------------------- #
 
@@ -296,9 +310,9 @@ class HotellingLocalBots(Logger, Thread):
         own_position = np.random.randint(1, self.n_positions)
         own_price = np.random.randint(1, self.firm_attributes["n_prices"])
 
-        self.data.current_state["firm_positions"][firm_id] = own_position
-        self.data.current_state["firm_prices"][firm_id] = own_price
-        self.data.current_state["active_replied"] = True
+        self.data.write("firm_positions", firm_id, own_position)
+        self.data.write("firm_prices", firm_id, own_price)
+        self.data.write_entry("active_replied", True)
 
         self.time_manager.check_state()
 
@@ -312,8 +326,8 @@ class HotellingLocalBots(Logger, Thread):
 
         price = self.data.current_state["firm_prices"][firm_id]
 
-        self.data.current_state["firm_cumulative_profits"][firm_id] += n * price
-        self.data.current_state["firm_profits"][firm_id] = n * price
-        self.data.current_state["n_client"][firm_id] = n
+        self.data.add("firm_cumulative_profits", firm_id, n * price)
+        self.data.write("firm_profits", firm_id, n * price)
+        self.data.write("n_client", firm_id, n)
 
         self.time_manager.check_state()
@@ -0,0 +1,151 @@
+import os
+import pickle
+import struct
+from os import path
+
+from utils.utils import Logger
+
+
+class Archive(Logger):
+
+    """
+    State of a game at the end of each turn ('<stem>.turns'), with an index ('<stem>.turns.idx')
+    giving the offset and the size of each turn, so that one turn is read without reading the others.
+    Turns are appended to the data file before their entries are appended to the index,
+    so that an entry of the index always points to a complete turn.
+    """
+
+    name = "Archive"
+
+    entry = struct.Struct("<QI")
+
+    def __init__(self, file):
+
+        self.file = file
+        self.index_file = "{}.idx".format(file)
+
+        self.stream = None
+        self.index_stream = None
+
+    @staticmethod
+    def get_file(snapshot_file):
+        return "{}.turns".format(path.splitext(snapshot_file)[0])
+
+    @staticmethod
+    def encode(state):
+        """called under data lock, state can be modified once this method returns"""
+        return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # ------------------------------ Writing ------------------------------------------------------ #
+
+    def open(self):
+
+        if self.stream is None:
+
+            # turns written after the last complete index entry are dropped
+            self.truncate(len(self))
+
+            self.stream = open(self.file, "ab")
+            self.index_stream = open(self.index_file, "ab")
+
+    def write(self, blobs, fsync=False):
+
+        if not blobs:
+            return
+
+        self.open()
+
+        offset = self.stream.tell()
+
+        entries = []
+
+        for blob in blobs:
+            entries.append(self.entry.pack(offset, len(blob)))
+            offset += len(blob)
+
+        self.stream.write(b"".join(blobs))
+        self.stream.flush()
+
+        if fsync:
+            os.fsync(self.stream.fileno())
+
+        self.index_stream.write(b"".join(entries))
+        self.index_stream.flush()
+
+    def truncate(self, n_turns):
+        """keep only the first 'n_turns' turns"""
+
+        self.close()
+
+        if n_turns == 0 or not path.exists(self.index_file) or not path.exists(self.file):
+            open(self.file, "wb").close()
+            open(self.index_file, "wb").close()
+            return
+
+        end = self.get_entry(n_turns - 1)
+        end = end[0] + end[1]
+
+        with open(self.index_file, "r+b") as f:
+            f.truncate(n_turns * self.entry.size)
+
+        with open(self.file, "r+b") as f:
+            f.truncate(end)
+
+    def close(self):
+
+        for stream in (self.stream, self.index_stream):
+            if stream is not None:
+                stream.close()
+
+        self.stream = None
+        self.index_stream = None
+
+    # ------------------------------ Reading ------------------------------------------------------ #
+
+    def __len__(self):
+
+        if not path.exists(self.index_file):
+            return 0
+
+        return path.getsize(self.index_file) // self.entry.size
+
+    def get_entry(self, t):
+
+        with open(self.index_file, "rb") as f:
+            f.seek(t * self.entry.size)
+            return self.entry.unpack(f.read(self.entry.size))
+
+    def read(self, t):
+        """state at the end of turn 't'"""
+
+        n_turns = len(self)
+
+        if t < 0:
+            t += n_turns
+
+        if not 0 <= t < n_turns:
+            raise IndexError("Archive has {} turns, turn {} does not exist.".format(n_turns, t))
+
+        offset, size = self.get_entry(t)
+
+        with open(self.file, "rb") as f:
+            f.seek(offset)
+            return pickle.loads(f.read(size))
+
+    def __getitem__(self, t):
+        return self.read(t)
+
+    def __iter__(self):
+        """turns in order, the data file being opened once"""
+
+        if not len(self):
+            return
+
+        with open(self.index_file, "rb") as index, open(self.file, "rb") as f:
+
+            for _ in range(len(self)):
+
+                offset, size = self.entry.unpack(index.read(self.entry.size))
+
+                f.seek(offset)
+                yield pickle.loads(f.read(size))
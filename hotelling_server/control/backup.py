@@ -1,16 +1,105 @@
+import os
+import hashlib
+from copy import deepcopy
 from os import path, mkdir
-import json
-import pickle
+from glob import glob
 from datetime import datetime
+from threading import Lock
 from utils.utils import Logger
+from hotelling_server.control import journal, checkpointer, session_store, catalog, archive
+from hotelling_server.control.snapshot import Snapshot
+from hotelling_server.control.data import Data
+from hotelling_server.parameters.config_service import ConfigService
+
+
+class LoadError(Exception):
+    pass
 
 
 class Backup(Logger):
 
+    """
+    A game is saved as a snapshot ('xp_*.p') and a journal of the changes
+    made since this snapshot ('xp_*.journal').
+    Files are written by a checkpointer thread: each checkpoint appends a record
+    to the journal, and the journal is compacted into a new snapshot
+    every 'compaction_interval' records.
+    Snapshots are written to a temporary file then renamed, so that
+    a crash never leaves a truncated snapshot (see 'Snapshot' for their format).
+    If 'sqlite' is set, turns are also inserted in the session store
+    of the save folder ('sessions.db').
+    Games are described in the catalog of the save folder ('catalog.json').
+    If 'archive' is set, the state at the end of each turn is also appended
+    to an archive which can be read turn by turn ('xp_*.turns').
+    """
+
     def __init__(self, controller):
 
         self.controller = controller
-        self.file = "{}/xp_{}.p".format(self.folder, datetime.now().strftime("%y-%m-%d_%H-%M-%S-%f"))
+
+        # files are named when a game is created or loaded, so that
+        # a server started without playing leaves nothing in save folder
+        self.file = None
+        self.journal = None
+        self.archive = None
+
+        # a snapshot is written at next checkpoint (new game or journal replayed)
+        self.snapshot_needed = True
+
+        # records encoded under data lock, waiting for next checkpoint
+        self.pending = []
+
+        # session store rows of each turn, waiting for next checkpoint
+        self.pending_rows = []
+
+        if self.policy["sqlite"]:
+            self.store = session_store.SessionStore(file=path.join(self.folder, "sessions.db"))
+        else:
+            self.store = None
+
+        # encoded turns waiting for next checkpoint
+        self.pending_turns = []
+
+        self.catalog = catalog.Catalog(folder=self.folder)
+
+        # entry of the game last written in catalog
+        self.catalog_entry = None
+
+        # increased when a game is created or loaded, so that checkpoints
+        # prepared for the previous one are dropped
+        self.generation = 0
+
+        # held while files are written, never while waiting for data lock
+        self.io_lock = Lock()
+
+        self.checkpointer = checkpointer.Checkpointer(backup=self)
+
+    @property
+    def journal_file(self):
+        return self.get_journal_file(self.file)
+
+    @staticmethod
+    def get_journal_file(file):
+        return "{}.journal".format(path.splitext(file)[0])
+
+    @property
+    def session(self):
+        return path.basename(path.splitext(self.file)[0])
+
+    def get_new_file(self):
+        return path.join(self.folder, "xp_{}.p".format(datetime.now().strftime("%y-%m-%d_%H-%M-%S-%f")))
+
+    def get_archive(self):
+
+        if self.policy["archive"]:
+            return archive.Archive(file=archive.Archive.get_file(self.file))
+
+    @property
+    def history_folder(self):
+        """folder of memory mapped history, if this backend is used"""
+
+        if self.policy["history_backend"] == "memmap":
+            return "{}.history".format(path.splitext(self.file)[0])
 
     @property
     def folder(self):
@@ -20,29 +109,302 @@ class Backup(Logger):
             mkdir(folder)
         return folder
 
-    def write(self, data):
+    @property
+    def policy(self):
+        return self.controller.data.param["persistence"]
+
+    def new(self):
+        """called under data lock"""
+
+        self.generation += 1
+        self.pending = []
+        self.pending_rows = []
+        self.pending_turns = []
+        self.catalog_entry = None
+
+        with self.io_lock:
+
+            # each game has its own files, it never overwrites the previous one
+            self.open_files(self.get_new_file())
+            self.journal.reset()
+
+    def open_files(self, file, game_journal=None):
+        """files of game 'file' replace those of previous game, called under io lock"""
+
+        self.close_files()
+
+        self.file = file
+        self.journal = game_journal if game_journal is not None else journal.Journal(file=self.journal_file)
+        self.archive = self.get_archive()
+
+        # a snapshot is written at next checkpoint
+        self.snapshot_needed = True
+
+    def close_files(self):
+
+        if self.journal is not None:
+            self.journal.close()
+
+        if self.archive is not None:
+            self.archive.close()
+
+    def notify(self, turn_end=False):
+        """data changed, called under data lock"""
+        self.checkpointer.notify(turn_end=turn_end)
+
+    def add_record(self, kind, payload):
+        """record to write at next checkpoint, called under data lock"""
+        self.pending.append(self.journal.encode(kind, payload))
+
+    def add_turn(self, t):
+        """turn 't' ends, called under data lock"""
+
+        data = self.controller.data
+
+        state = {s: data.current_state[s] for s in data.entries}
+
+        self.add_record("turn", state)
+
+        if self.archive is not None:
+            self.pending_turns.append(self.archive.encode(state))
+
+        if self.store is not None:
+            self.pending_rows.append(self.store.get_rows(session=self.session, file=self.file, t=t, data=data))
+
+        self.notify(turn_end=True)
+
+    def should_compact(self):
+        return self.snapshot_needed or self.journal.n_records + len(self.pending) >= self.policy["compaction_interval"]
+
+    def checkpoint(self):
+
+        data = self.controller.data
+
+        # what is saved is taken under lock so that checkpoint is consistent,
+        # it is pickled and written once lock is released
+        with data.lock:
+
+            generation = self.generation
+
+            # rows are shared, not copied (see 'HistoryStore.freeze')
+            history = data.history.freeze()
+
+            # files of history columns kept in memory are removed once a snapshot holds their rows
+            if self.should_compact() or history.stale_files:
+
+                # state is small, its copy is quick
+                state = dict(deepcopy(data.get_state()), history=history, journal_seq=self.journal.seq)
+
+                data.clear_dirty()
+                data.history.stale_files = []
+
+                records = []
+
+            else:
+
+                state = None
+                # only what changed since previous checkpoint
+                records = self.pending + [self.journal.encode("delta", data.get_delta())]
+
+            self.pending = []
 
-        with open(self.file, "wb") as file:
-            pickle.dump(obj=data, file=file)
+            rows = self.pending_rows
+            self.pending_rows = []
+
+            turns = self.pending_turns
+            self.pending_turns = []
+
+            entry = self.catalog.get_entry(file=self.file, data=data, time_manager=self.controller.time_manager)
+
+        try:
+            self.write_checkpoint(generation, history, state, records, rows, turns, entry)
+
+        except Exception:
+
+            with data.lock:
+
+                if generation == self.generation:
+
+                    # changes of this checkpoint are saved by a snapshot at next one,
+                    # turns that were not written are written then
+                    self.snapshot_needed = True
+                    data.history.stale_files = history.stale_files + data.history.stale_files
+                    self.pending_rows = rows + self.pending_rows
+                    self.pending_turns = turns + self.pending_turns
+
+            raise
+
+    def write_checkpoint(self, generation, history, state, records, rows, turns, entry):
+        """rows and turns are removed from their lists once written"""
+
+        with self.io_lock:
+
+            # a game was created or loaded meanwhile
+            if generation != self.generation:
+                return
+
+            # memory mapped history is not part of snapshots, its index gives the turns written
+            if history.folder is not None:
+                history.flush()
+                history.write_index()
+
+            if state is not None:
+                self.write(Snapshot.encode(state))
+                self.journal.truncate()
+                self.snapshot_needed = False
+
+                history.remove_stale_files()
+
+            else:
+                self.journal.write(records, fsync=self.policy["fsync"])
+
+            if self.store is not None:
+                self.store.write(rows)
+                del rows[:]
+
+            if self.archive is not None:
+                self.archive.write(turns, fsync=self.policy["fsync"])
+                del turns[:]
+
+            if entry != self.catalog_entry:
+                self.catalog.update(self.session, entry)
+                self.catalog_entry = entry
+
+    def write(self, snapshot):
+
+        tmp_file = "{}.tmp".format(self.file)
+
+        with open(tmp_file, "wb") as file:
+
+            Snapshot.write(
+                file, snapshot,
+                compression=self.policy["compression"],
+                level=self.policy["compression_level"]
+            )
+            file.flush()
+
+            if self.policy["fsync"]:
+                os.fsync(file.fileno())
+
+        os.replace(tmp_file, self.file)
+
+    def close(self):
+        """write last changes"""
+
+        if self.checkpointer.ident is not None:
+
+            self.checkpointer.stop()
+
+            try:
+                self.checkpoint()
+
+            except Exception as e:
+                self.log("Last checkpoint of '{}' failed: {}".format(self.file, e), level=3)
+
+        with self.io_lock:
+            self.close_files()
+
+        if self.store is not None:
+            self.store.close()
 
     def load(self, file):
+        """
+        returns the state of game 'file', journal replayed, and the number of replayed records.
+        raises 'LoadError' if it can not be read, files of the previous game being kept.
+        """
 
         if not path.exists(file):
-            return "error"
+            raise LoadError("File '{}' does not exist.".format(file))
 
-        else:
-            self.file = file
-            with open(self.file, "rb") as file:
-                try:
-                    data = pickle.load(file=file)
-                except EOFError:
-                    return "error"
+        game_journal = journal.Journal(file=self.get_journal_file(file))
+
+        try:
+            with open(file, "rb") as f:
+                data = Snapshot.read(f)
+
+            n_records = Data.replay(data, game_journal.read(after=data.get("journal_seq", 0)))
+
+        except Snapshot.errors + (OSError, KeyError, TypeError, AttributeError) as e:
+            self.log("Game '{}' can not be read: {}".format(file, e), level=3)
+            raise LoadError("Game '{}' can not be read: {}".format(file, e))
+
+        self.generation += 1
+        self.pending = []
+        self.pending_rows = []
+        self.pending_turns = []
+        self.catalog_entry = None
+
+        with self.io_lock:
+            # journal knows the sequence number and the number of records it read
+            self.open_files(file, game_journal=game_journal)
+
+        return data, n_records
+
+    def sync_archive(self, history):
+        """once journal is replayed, archive gets the turns of history, called under data lock"""
+
+        if self.archive is None:
+            return
+
+        with self.io_lock:
+
+            n_turns = len(self.archive)
+
+            # turns that are not part of the saved game
+            if n_turns > len(history):
+                self.archive.truncate(len(history))
+
+            # archive was enabled after the game was saved, or a crash happened between journal and archive writes
+            elif n_turns < len(history):
+                self.archive.write([
+                    self.archive.encode({key: column[t] for key, column in history.items()})
+                    for t in range(n_turns, len(history))
+                ])
+
+    @staticmethod
+    def read_session(file):
+        """state of a saved game, journal included"""
 
-            return data
+        with open(file, "rb") as f:
+            data = Snapshot.read(f)
+
+        j = journal.Journal(file=Backup.get_journal_file(file))
+
+        Data.replay(data, j.read(after=data["journal_seq"]))
+
+        data["journal_seq"] = j.seq
+
+        return data
+
+    @staticmethod
+    def get_hash(file):
+        """hash of the snapshot and of its journal"""
+
+        h = hashlib.sha1()
+
+        for f in (file, Backup.get_journal_file(file)):
+
+            if path.exists(f):
+                with open(f, "rb") as stream:
+                    for chunk in iter(lambda: stream.read(1 << 20), b""):
+                        h.update(chunk)
+
+        return h.hexdigest()
+
+    @staticmethod
+    def get_latest_file(folder):
+        """most recently written snapshot of the save folder"""
+
+        files = glob(path.join(path.expanduser(folder), "xp_*.p"))
+
+        if files:
+            return max(files, key=path.getmtime)
 
     @staticmethod
     def write_param(key, new_value):
+        ConfigService.write(key, new_value)
 
-        # noinspection SpellCheckingInspection
-        with open("hotelling_server/parameters/{}.json".format(key), "w") as param_file:
-            json.dump(new_value, param_file)
+    @staticmethod
+    def write_params(params):
+        """key: name of parameters file, value: its new content"""
+        ConfigService.write_many(params)
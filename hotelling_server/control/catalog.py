@@ -0,0 +1,232 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from glob import glob
+from os import path
+from threading import Lock
+
+from utils.utils import Logger
+from hotelling_server.control import journal
+from hotelling_server.control.data import Data
+from hotelling_server.control.snapshot import Snapshot
+
+try:
+    import fcntl
+
+# e.g. Windows, where only the rooms of a process are kept from writing at the same time
+except ImportError:
+    fcntl = None
+
+
+class Catalog(Logger):
+
+    """
+    Index of the games of the save folder ('catalog.json'),
+    key: session, value: description of the game (condition, number of players, turns played...),
+    so that games can be listed and checked without being loaded.
+    Entry of a game is written by its backup at each checkpoint where it changed,
+    games saved before the catalog existed are added by 'rebuild'.
+    Writers of every process take the lock file of the catalog ('catalog.json.lock') one at a time.
+    """
+
+    name = "Catalog"
+
+    file_name = "catalog.json"
+
+    # shared by the rooms of a process
+    lock = Lock()
+
+    def __init__(self, folder):
+
+        self.folder = folder
+        self.file = path.join(folder, self.file_name)
+        self.lock_file = "{}.lock".format(self.file)
+
+    @classmethod
+    def get_entry(cls, file, data, time_manager):
+        """description of the game, called under data lock"""
+
+        return cls.describe(
+            file=file, assignment=data.assignment, parametrization=data.parametrization,
+            current_state=data.current_state, n_turns=len(data.history), ended=time_manager.state == "end_game"
+        )
+
+    @staticmethod
+    def describe(file, assignment, parametrization, current_state, n_turns, ended):
+
+        players = [
+            i["name"] for i in assignment.values() if not i.get("bot")
+        ] if isinstance(assignment, dict) else []
+
+        return {
+            "file": file,
+            "condition": parametrization.get("condition"),
+            "n_firms": len(current_state["firm_positions"]),
+            "n_customers": len(current_state["customer_firm_choices"]),
+            "n_turns": n_turns,
+            "players": players,
+            "ended": ended
+        }
+
+    @classmethod
+    def read_entry(cls, file):
+        """description of saved game 'file', its snapshot and journal being read"""
+
+        with open(file, "rb") as f:
+            data = Snapshot.read(f)
+
+        Data.replay(data, journal.Journal(file="{}.journal".format(path.splitext(file)[0])).read(
+            after=data.get("journal_seq", 0)))
+
+        return cls.describe(
+            file=file, assignment=data["assignment"], parametrization=data["parametrization"],
+            current_state=data["current_state"], n_turns=len(data["history"]),
+            ended=data["time_manager_state"] == "end_game"
+        )
+
+    @contextmanager
+    def locked(self):
+        """held while catalog is read then written, by one thread of one process at a time"""
+
+        with self.lock, open(self.lock_file, "a") as f:
+
+            # released when file is closed
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+            yield
+
+    def read(self):
+
+        if not path.exists(self.file):
+            return {}
+
+        try:
+            with open(self.file) as f:
+                return json.load(f)
+
+        except (OSError, ValueError) as e:
+            self.log("Catalog '{}' can not be read: {}".format(self.file, e), level=2)
+            return {}
+
+    def update(self, session, entry):
+
+        entry = dict(entry, saved=datetime.now().strftime("%y-%m-%d %H:%M:%S"), version=Snapshot.version)
+
+        with self.locked():
+
+            catalog = self.read()
+            catalog[session] = entry
+
+            self.write(catalog)
+
+    def remove(self, session):
+
+        with self.locked():
+
+            catalog = self.read()
+
+            if catalog.pop(session, None) is not None:
+                self.write(catalog)
+
+    def rebuild(self, ignored=()):
+        """
+        add the games of the save folder that have no entry, e.g. saved by previous versions,
+        except files 'ignored'. Returns the number of added games.
+        """
+
+        files = sorted(glob(path.join(self.folder, "xp_*.p")))
+
+        known = {path.basename(entry["file"]) for entry in self.read().values()}
+
+        ignored = {path.realpath(i) for i in ignored}
+
+        entries = {}
+
+        for file in files:
+
+            if path.basename(file) in known or path.realpath(file) in ignored:
+                continue
+
+            error = self.validate(file)
+
+            if error is not None:
+                self.log(error, level=2)
+                continue
+
+            try:
+                entry = self.read_entry(file)
+
+            except Snapshot.errors + (OSError, KeyError, TypeError, AttributeError) as e:
+                self.log("Game '{}' can not be read: {}".format(file, e), level=2)
+                continue
+
+            with open(file, "rb") as f:
+                version = Snapshot.read_version(f)
+
+            entries[path.basename(path.splitext(file)[0])] = dict(
+                entry, saved=datetime.fromtimestamp(path.getmtime(file)).strftime("%y-%m-%d %H:%M:%S"),
+                version=version
+            )
+
+        if entries:
+
+            with self.locked():
+
+                catalog = self.read()
+
+                # entries written meanwhile by a backup are kept
+                catalog.update({k: v for k, v in entries.items() if k not in catalog})
+
+                self.write(catalog)
+
+            self.log("{} game(s) added to catalog '{}'.".format(len(entries), self.file), level=1)
+
+        return len(entries)
+
+    def write(self, catalog):
+        """called under lock, a temporary file of its own replaces the catalog"""
+
+        fd, tmp_file = tempfile.mkstemp(dir=path.dirname(self.file), prefix="{}.".format(self.file_name),
+                                        suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(catalog, f, indent=2, sort_keys=True)
+
+            os.replace(tmp_file, self.file)
+
+        except BaseException:
+
+            if path.exists(tmp_file):
+                os.remove(tmp_file)
+
+            raise
+
+    def get_sessions(self):
+        """entries of games whose snapshot still exists, most recent first"""
+
+        sessions = [
+            dict(entry, session=session) for session, entry in self.read().items() if path.exists(entry["file"])
+        ]
+
+        return sorted(sessions, key=lambda i: i["saved"], reverse=True)
+
+    @staticmethod
+    def validate(file):
+        """returns why 'file' can not be loaded, None if it can"""
+
+        if not path.exists(file):
+            return "File '{}' does not exist.".format(file)
+
+        try:
+            with open(file, "rb") as f:
+                version = Snapshot.read_version(f)
+
+        except Snapshot.errors as e:
+            return "File '{}' is not a snapshot: {}".format(file, e)
+
+        if version > Snapshot.version:
+            return "File '{}' was saved by a newer version (schema version {}).".format(file, version)
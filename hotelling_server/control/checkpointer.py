@@ -0,0 +1,98 @@
+import traceback
+from threading import Thread, Event, Lock
+
+from utils.utils import Logger
+
+
+class Checkpointer(Thread, Logger):
+
+    """
+    Write backups of a room out of request threads.
+    Notifications received while waiting are coalesced in one checkpoint.
+    With the 'interval' policy, a checkpoint is written at most every 'checkpoint_interval' seconds
+    after a change, with the 'turn' policy it is written at the end of each turn only.
+    A failed checkpoint is logged, shown on the interface, and tried again until it succeeds.
+    """
+
+    name = "Checkpointer"
+
+    # seconds between two attempts when a checkpoint failed
+    retry_delay = 1
+
+    def __init__(self, backup):
+
+        super().__init__()
+
+        self.daemon = True
+
+        self.backup = backup
+
+        self.dirty = Event()
+        self.shutdown = Event()
+
+        # rooms are notified by request and controller threads
+        self.start_lock = Lock()
+
+        # a warning is shown once for each series of failed checkpoints
+        self.failing = False
+
+    @property
+    def policy(self):
+        return self.backup.policy
+
+    def notify(self, turn_end=False):
+
+        if turn_end or self.policy["checkpoint"] == "interval":
+
+            # started on first change, so that rooms that never play do not hold a thread
+            with self.start_lock:
+                if self.ident is None:
+                    self.start()
+
+            self.dirty.set()
+
+    def run(self):
+
+        while not self.shutdown.is_set():
+
+            self.dirty.wait()
+
+            if self.shutdown.is_set():
+                break
+
+            # let changes accumulate before writing them
+            if self.policy["checkpoint"] == "interval":
+                self.shutdown.wait(self.policy["checkpoint_interval"])
+
+            self.dirty.clear()
+
+            try:
+                self.backup.checkpoint()
+
+            except Exception as e:
+                self.failed(e)
+
+                # tried again later, with everything that was not saved
+                self.shutdown.wait(self.retry_delay)
+                self.dirty.set()
+
+            else:
+                if self.failing:
+                    self.log("Checkpoints of '{}' are written again.".format(self.backup.file), level=1)
+                    self.failing = False
+
+    def failed(self, error):
+
+        self.log("Checkpoint of '{}' failed:\n{}".format(self.backup.file, traceback.format_exc()), level=3)
+
+        if not self.failing:
+            self.failing = True
+            self.backup.controller.warn("Game can not be saved: {}".format(error))
+
+    def stop(self):
+
+        self.shutdown.set()
+        self.dirty.set()
+
+        if self.ident is not None:
+            self.join()
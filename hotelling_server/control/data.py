@@ -1,13 +1,27 @@
-import json
+import numpy as np
+
 from utils.utils import Logger
+from utils.locks import InstrumentedLock
+from hotelling_server.control.history import HistoryStore
+from hotelling_server.parameters.config_service import ConfigService
 
 
 class Data(Logger):
 
-    def __init__(self, controller):
+    # --- server parameters --- #
+
+    keys = [
+        "network", "game", "folders", "parametrization", "assignment_php",
+        "sql_tables", "engine", "matchmaking", "persistence", "housekeeping"
+    ]
+
+    def __init__(self, controller, param=None):
 
         self.controller = controller
 
+        # guards every read-modify-write of game variables and time manager state
+        self.lock = InstrumentedLock(name="data")
+
         # --- game variables --- #
 
         self.entries = [
@@ -21,10 +35,34 @@ class Data(Logger):
             "firm_states", "customer_states"
         ]
 
-        self.history = {s: [] for s in self.entries}
+        # history of a new game is created by 'new'
+        self.history = HistoryStore(self.entries)
 
         self.current_state = {s: [] for s in self.entries}
 
+        # rewritten by (almost) every request, they are only displayed by interface
+        self.activity_entries = {"time_since_last_request_firms", "time_since_last_request_customers"}
+
+        # increased each time game variables change, never reset
+        self.version = 0
+
+        # replies saved in order to be sent again after a crash, never displayed nor read by snapshots:
+        # their changes are saved without increasing version
+        self.unversioned_fields = {"last_replies"}
+
+        # increased instead of version when a row of an activity entry changes,
+        # so that polling clients do not invalidate the snapshot at each request
+        self.activity_version = 0
+
+        # changed since last checkpoint, key: name of current state entry (or of field),
+        # value: changed rows, None if whole entry was replaced
+        self.dirty_entries = {}
+        self.dirty_fields = {}
+
+        # read only copy of current state shared by readers while version does not change
+        self.current_snapshot = None
+        self.snapshot_version = None
+
         self.firms_id = {}  # key: game_id, value: firm_id
         self.customers_id = {}  # key: game_id, value: customer_id
 
@@ -36,6 +74,9 @@ class Data(Logger):
 
         self.server_id_in_use = {}
 
+        # key: game_id, value: last request and its reply
+        self.last_replies = {}
+
         self.time_manager_state = "beginning_init"
         self.time_manager_t = 0
         self.time_manager_ending_t = None
@@ -49,17 +90,30 @@ class Data(Logger):
 
         # --- server parameters --- #
 
-        self.keys = ["network", "game", "folders", "parametrization", "assignment_php", "sql_tables"]
+        if param is not None:
+            self.param = param
 
-        self.param = {}
-
-        self.setup()
+        else:
+            self.param = {}
+            self.setup()
 
     def set_assignment(self, assignment):
-        self.assignment = assignment
+
+        with self.lock:
+            self.assignment = assignment
+            self.mark_dirty(self.dirty_fields, "assignment")
 
     def set_parametrization(self, parametrization):
-        self.parametrization = parametrization
+
+        with self.lock:
+            self.parametrization = parametrization
+            self.mark_dirty(self.dirty_fields, "parametrization")
+
+    def set_roles(self, roles):
+
+        with self.lock:
+            self.roles = roles
+            self.mark_dirty(self.dirty_fields, "roles")
 
     def new(self):
         """when a new game is launched"""
@@ -77,53 +131,217 @@ class Data(Logger):
 
         self.server_id_in_use = {}
 
+        self.last_replies = {}
+
         self.time_manager_state = "beginning_init"
         self.time_manager_t = 0
         self.time_manager_ending_t = None
         self.continue_game = True
 
-    def setup(self):
+        self.controller.backup.new()
+        self.clear_dirty()
+
+        self.history = HistoryStore(self.entries, folder=self.controller.backup.history_folder)
+
+        self.touch()
+
+    def touch(self):
+        """game variables changed, called under lock"""
+        self.version += 1
 
-        for key in self.keys:
+    def snapshot(self):
+        """
+        consistent read only view of current state, called under lock.
+        entries are frozen into tuples, so the view can be kept and shared
+        after the lock is released without deep copying current state.
+        it is rebuilt when version changes, rows of activity entries may be older
+        than those of current state (see 'activity_version').
+        """
 
-            # noinspection SpellCheckingInspection
-            with open("hotelling_server/parameters/{}.json".format(key)) as file:
-                self.param[key] = json.load(file)
+        if self.snapshot_version != self.version:
+
+            self.current_snapshot = {
+                k: tuple(v) if isinstance(v, (list, np.ndarray)) else v
+                for k, v in self.current_state.items()
+            }
+
+            self.snapshot_version = self.version
+
+        return self.current_snapshot
+
+    @classmethod
+    def load_param(cls):
+        return ConfigService.get_many(*cls.keys)
+
+    def setup(self):
+
+        # update in place as parameters are shared by the components of a room
+        self.param.update(self.load_param())
 
     def write_param(self, key, new_value):
 
         self.controller.backup.write_param(key, new_value)
 
     def save(self):
+        """state changed, it will be written by the checkpointer of backup"""
+        self.controller.backup.notify()
+
+    def get_state(self):
+        """everything but history, its size does not depend on game length"""
+
+        return {
+            "current_state": self.current_state,
+            "firms_id": self.firms_id,
+            "customers_id": self.customers_id,
+            "bot_firms_id": self.bot_firms_id,
+            "bot_customers_id": self.bot_customers_id,
+            "map_server_id_android_id": self.map_server_id_android_id,
+            "map_server_id_game_id": self.map_server_id_game_id,
+            "server_id_in_use": self.server_id_in_use,
+            "last_replies": self.last_replies,
+            "roles": self.roles,
+            "time_manager_t": self.controller.time_manager.t,
+            "time_manager_ending_t": self.controller.time_manager.ending_t,
+            "continue": self.controller.time_manager.continue_game,
+            "time_manager_state": self.controller.time_manager.state,
+            "assignment": self.assignment,
+            "parametrization": self.parametrization
+        }
+
+    # ------------------------------ Writing ------------------------------------------------------ #
+    # game variables are changed through these methods, under lock,
+    # so that checkpoints only save what changed (see 'get_delta')
+
+    def write(self, key, game_id, value):
+        """change one row of a current state entry"""
+
+        if self.is_unchanged(self.current_state[key], game_id, value):
+            return
+
+        self.current_state[key][game_id] = value
+        self.mark_dirty(self.dirty_entries, key, game_id)
+
+        if key in self.activity_entries:
+            self.activity_version += 1
+        else:
+            self.touch()
+
+    def add(self, key, game_id, value):
+        self.write(key, game_id, self.current_state[key][game_id] + value)
+
+    def write_entry(self, key, value):
+        """replace a whole current state entry"""
+
+        self.current_state[key] = value
+        self.mark_dirty(self.dirty_entries, key)
+        self.touch()
+
+    def write_field(self, name, key, value):
+        """change one item of a game variable other than current state (e.g. 'firms_id')"""
+
+        if self.is_unchanged(getattr(self, name), key, value):
+            return
+
+        getattr(self, name)[key] = value
+        self.mark_dirty(self.dirty_fields, name, key)
 
-        self.controller.backup.write(
-            {
-                "history": self.history,
-                "current_state": self.current_state,
-                "firms_id": self.firms_id,
-                "customers_id": self.customers_id,
-                "bot_firms_id": self.bot_firms_id,
-                "bot_customers_id": self.bot_customers_id,
-                "map_server_id_android_id": self.map_server_id_android_id,
-                "map_server_id_game_id": self.map_server_id_game_id,
-                "server_id_in_use": self.server_id_in_use,
-                "roles": self.roles,
+        if name not in self.unversioned_fields:
+            self.touch()
+
+    @classmethod
+    def is_plain(cls, value):
+        """Python scalars, and tuples, lists and dicts of them (e.g. replies), can be compared with '=='"""
+
+        if isinstance(value, (tuple, list)):
+            return all(cls.is_plain(i) for i in value)
+
+        elif isinstance(value, dict):
+            return all(cls.is_plain(i) for i in value.values())
+
+        return isinstance(value, (bool, int, float, str))
+
+    @classmethod
+    def is_unchanged(cls, container, key, value):
+        """writing a plain value equal to the current one changes nothing, it is neither saved nor versioned"""
+
+        if not cls.is_plain(value):
+            return False
+
+        try:
+            current = container[key]
+
+        except (KeyError, IndexError):
+            return False
+
+        return type(current) is type(value) and cls.is_plain(current) and current == value
+
+    @staticmethod
+    def mark_dirty(dirty, name, key=None):
+
+        if key is None:
+            dirty[name] = None
+
+        elif dirty.get(name, set()) is not None:
+            dirty.setdefault(name, set()).add(key)
+
+    def clear_dirty(self):
+        """everything is saved"""
+
+        self.dirty_entries = {}
+        self.dirty_fields = {}
+
+    def get_delta(self):
+        """changes made since last call, called under lock"""
+
+        def get_changes(dirty, get):
+            return {
+                name: ("entry", get(name)) if keys is None else ("rows", {k: get(name)[k] for k in keys})
+                for name, keys in dirty.items()
+            }
+
+        delta = {
+            "current_state": get_changes(self.dirty_entries, self.current_state.get),
+            "fields": get_changes(self.dirty_fields, lambda name: getattr(self, name)),
+            # a few scalars, always saved
+            "time_manager": {
                 "time_manager_t": self.controller.time_manager.t,
                 "time_manager_ending_t": self.controller.time_manager.ending_t,
                 "continue": self.controller.time_manager.continue_game,
-                "time_manager_state": self.controller.time_manager.state,
-                "assignment": self.assignment,
-                "parametrization": self.parametrization
+                "time_manager_state": self.controller.time_manager.state
             }
-        )
+        }
 
-    def write(self, key, game_id, value):
+        self.clear_dirty()
 
-        self.current_state[key][game_id] = value
+        return delta
+
+    @staticmethod
+    def apply_delta(data, delta):
+        """apply changes given by 'get_delta' to state 'data' (see 'get_state')"""
+
+        for target, changes in ((data["current_state"], delta["current_state"]), (data, delta["fields"])):
+
+            for name, (kind, value) in changes.items():
+
+                if kind == "entry":
+                    target[name] = value
+
+                else:
+                    for k, v in value.items():
+                        target[name][k] = v
+
+        data.update(delta["time_manager"])
 
     def load(self, file):
+        """
+        load snapshot and replay journal written after it, returns the number of replayed records.
+        game variables are left as they are if the game can not be read ('backup.LoadError')
+        """
+
+        data, n_records = self.controller.backup.load(file=file)
+
+        self.controller.backup.sync_archive(data["history"])
 
-        data = self.controller.backup.load(file=file)
         self.history = data["history"]
         self.current_state = data["current_state"]
         self.firms_id = data["firms_id"]
@@ -133,6 +351,7 @@ class Data(Logger):
         self.map_server_id_android_id = data["map_server_id_android_id"]
         self.map_server_id_game_id = data["map_server_id_game_id"]
         self.server_id_in_use = data["server_id_in_use"]
+        self.last_replies = data["last_replies"]
         self.roles = data["roles"]
         self.time_manager_state = data["time_manager_state"]
         self.time_manager_t = data["time_manager_t"]
@@ -141,7 +360,37 @@ class Data(Logger):
         self.assignment = data["assignment"]
         self.parametrization = data["parametrization"]
 
+        self.clear_dirty()
+        self.touch()
+
+        return n_records
+
+    @staticmethod
+    def replay(data, records):
+        """apply to snapshot 'data' the changes made since it was written, returns the number of records"""
+
+        n_records = 0
+
+        for kind, payload in records:
+
+            n_records += 1
+
+            if kind == "delta":
+                Data.apply_delta(data, payload)
+
+            # journals written by previous versions
+            elif kind == "state":
+                data.update(payload)
+
+            elif kind == "turn":
+                data["history"].append(payload)
+
+        return n_records
+
     def update_history(self):
 
-        for s in self.entries:
-            self.history[s].append(self.current_state[s])
+        self.history.append(self.current_state)
+
+        self.controller.backup.add_turn(self.controller.time_manager.t)
+
+        self.touch()
@@ -16,18 +16,22 @@ class Game(Logger):
         self.data = self.controller.data
         self.time_manager = self.controller.time_manager
 
-        # get parameters from interface and json files
-        self.game_parameters = self.data.param["game"]
-        self.parametrization = self.data.param["parametrization"]
         self.assignment = None
 
-        # set number of type of players
-        self.n_customers = self.game_parameters["n_customers"]
-        self.n_firms = self.game_parameters["n_firms"]
-        self.n_agents = self.n_firms + self.n_customers
+        self.game_parameters = None
+        self.parametrization = None
+        self.n_customers = None
+        self.n_firms = None
+        self.n_agents = None
+
+        self.set_parameters()
 
         self.client_time = {}
 
+        # last reply of each client saved before a game was loaded,
+        # sent again if the client repeats its request
+        self.recovered_replies = {}
+
         # ---------------- #
         self.bots = None
         self.interface_parameters = None
@@ -35,31 +39,45 @@ class Game(Logger):
 
         # ----------------------------------- sides methods --------------------------------------#
 
+    def set_parameters(self):
+        """parameters can change between games, they are read again when a game is launched"""
+
+        # get parameters from interface and json files
+        self.game_parameters = self.data.param["game"]
+        self.parametrization = self.data.param["parametrization"]
+
+        # set number of type of players
+        self.n_customers = self.game_parameters["n_customers"]
+        self.n_firms = self.game_parameters["n_firms"]
+        self.n_agents = self.n_firms + self.n_customers
+
     def new(self):
         """called if new game is launched"""
 
+        self.set_parameters()
+
         self.assignment = self.data.assignment
         self.interface_parameters = self.data.parametrization
 
         self.unexpected_id_list = []
+        self.recovered_replies = {}
 
-        self.data.roles = [""] * self.n_agents
+        self.data.set_roles([""] * self.n_agents)
 
-        self.data.current_state["time_since_last_request_firms"] = [""] * self.n_firms
-        self.data.current_state["time_since_last_request_customers"] = [""] * self.n_customers
-        self.data.current_state["firm_states"] = [""] * self.n_firms
-        self.data.current_state["customer_states"] = [""] * self.n_customers
+        self.data.write_entry("time_since_last_request_firms", [""] * self.n_firms)
+        self.data.write_entry("time_since_last_request_customers", [""] * self.n_customers)
+        self.data.write_entry("firm_states", [""] * self.n_firms)
+        self.data.write_entry("customer_states", [""] * self.n_customers)
 
-        self.data.current_state["firm_status"] = ["active", "passive"]
-        self.data.current_state["n_client"] = [0, 0]
-        self.data.current_state["firm_profits"] = [0, 0]
-        self.data.current_state["firm_cumulative_profits"] = [0, 0]
+        self.data.write_entry("firm_status", ["active", "passive"])
+        self.data.write_entry("n_client", [0, 0])
+        self.data.write_entry("firm_profits", [0, 0])
+        self.data.write_entry("firm_cumulative_profits", [0, 0])
 
-        self.data.current_state["firm_positions"] = \
-            np.random.choice(range(1, self.game_parameters["n_positions"]), size=2, replace=False)
+        self.data.write_entry(
+            "firm_positions", np.random.choice(range(1, self.game_parameters["n_positions"]), size=2, replace=False))
 
-        self.data.current_state["firm_prices"] = \
-            np.random.randint(1, self.game_parameters["n_prices"], size=2)
+        self.data.write_entry("firm_prices", np.random.randint(1, self.game_parameters["n_prices"], size=2))
 
         # init customer current_state arrays
         customer_keys = (
@@ -71,8 +89,7 @@ class Game(Logger):
         )
 
         for key in customer_keys:
-            self.data.current_state[key] = \
-                np.zeros(self.game_parameters["n_customers"], dtype=int)
+            self.data.write_entry(key, np.zeros(self.game_parameters["n_customers"], dtype=int))
 
         self.launch_bots()
 
@@ -80,10 +97,14 @@ class Game(Logger):
         """called if a previous game is loaded"""
 
         self.data.setup()
+        self.set_parameters()
+
         self.interface_parameters = self.data.parametrization
         self.unexpected_id_list = []
         self.assignment = self.data.assignment
 
+        self.recovered_replies = dict(self.data.last_replies)
+
         self.launch_bots()
 
     # -------------------------------| bots |------------------------------------------------------------ #
@@ -119,7 +140,9 @@ class Game(Logger):
             self.bots.start()
 
     def stop_bots(self):
-        self.bots.stop()
+
+        if self.bots is not None:
+            self.bots.stop()
 
     # -------------------------------| network related method |----------------------------------------- #
 
@@ -140,14 +163,29 @@ class Game(Logger):
         # retrieve method arguments
         args = [int(a) if a.isdigit() else a for a in whole[1:]]
 
+        # first argument is game id, except for admin requests whose first argument is time:
+        # admin only reads the game, its replies are neither saved nor recovered
+        game_id = args[0] if args and not whole[0].startswith("ask_admin") else None
+
+        recovered = self.recovered_replies.pop(game_id, None) if game_id is not None else None
+
+        # the client did not get its reply before the game was interrupted:
+        # the request already changed the game, so it is not handled again
+        if recovered is not None and recovered[0] == request:
+            to_client = recovered[1]
+            self.log("Reply recovered for request '{}'.".format(request), level=1)
+
         # don't launch methods if init is not done
-        if not self.data.current_state["init_done"]:
+        elif not self.data.current_state["init_done"]:
             to_client = self.reply_error("wait_init")
 
         # regular launch method
         else:
             to_client = command(*args)
 
+        if game_id is not None and to_client[0] == "reply":
+            self.data.write_field("last_replies", game_id, (request, to_client))
+
         self.log("Reply '{}' to request '{}'.".format(to_client, request))
 
         # save in case server shuts down
@@ -208,12 +246,12 @@ class Game(Logger):
         opponent_pos, opponent_price = self.get_opponent_choices(opponent_id)
 
         for ids, pos, px in [(firm_id, position, price), (opponent_id, opponent_pos, opponent_price)]:
-            self.data.current_state["firm_positions"][int(ids)] = pos
-            self.data.current_state["firm_prices"][int(ids)] = px
+            self.data.write("firm_positions", int(ids), pos)
+            self.data.write("firm_prices", int(ids), px)
 
         # check state
-        self.data.current_state["active_replied"] = True
-        self.data.current_state["firm_states"][firm_id] = state
+        self.data.write_entry("active_replied", True)
+        self.data.write("firm_states", firm_id, state)
 
     def firm_end_of_turn(self, firm_id, t, status):
         """both firm end of turn"""
@@ -223,10 +261,10 @@ class Game(Logger):
         n, n_opp = self.get_nb_of_clients(firm_id, opponent_id, t)
         price = self.data.current_state["firm_prices"][firm_id]
 
-        self.data.current_state["firm_cumulative_profits"][firm_id] += n * price
-        self.data.current_state["firm_profits"][firm_id] = n * price
-        self.data.current_state["n_client"][firm_id] = n
-        self.data.current_state["{}_gets_results".format(status)] = True
+        self.data.add("firm_cumulative_profits", firm_id, n * price)
+        self.data.write("firm_profits", firm_id, n * price)
+        self.data.write("n_client", firm_id, n)
+        self.data.write_entry("{}_gets_results".format(status), True)
 
     # --------------------------------| customer sides methods |------------------------------------- #
 
@@ -241,14 +279,14 @@ class Game(Logger):
 
         utility = found * uc - ((ec * view_choice) + found * price)
 
-        self.data.current_state["customer_utility"][customer_id] = utility
-        self.data.current_state["customer_cumulative_utility"][customer_id] += utility
+        self.data.write("customer_utility", customer_id, utility)
+        self.data.add("customer_cumulative_utility", customer_id, utility)
 
     def customer_end_of_turn(self, customer_id, extra_view, firm):
 
-        self.data.current_state["customer_extra_view_choices"][customer_id] = extra_view
-        self.data.current_state["customer_firm_choices"][customer_id] = int(firm)
-        self.data.current_state["customer_replies"][customer_id] = 1
+        self.data.write("customer_extra_view_choices", customer_id, extra_view)
+        self.data.write("customer_firm_choices", customer_id, int(firm))
+        self.data.write("customer_replies", customer_id, 1)
 
         self.compute_utility(customer_id)
 
@@ -282,14 +320,17 @@ class Game(Logger):
         return self.data.current_state["firm_positions"], self.data.current_state["firm_prices"]
 
     def set_state(self, role, role_id, state):
-        self.data.current_state["{}_states".format(role)][role_id] = state
+        self.data.write("{}_states".format(role), role_id, state)
 
     def set_time_since_last_request(self, game_id, role):
 
         if game_id in self.client_time:
 
-            self.data.current_state["time_since_last_request_{}s".format(role)][game_id] = \
-                    abs(self.client_time[game_id] - time.time())
+            # entries have a row per firm or per customer
+            role_id = self.data.firms_id[game_id] if role == "firm" else self.data.customers_id[game_id]
+
+            self.data.write(
+                "time_since_last_request_{}s".format(role), role_id, abs(self.client_time[game_id] - time.time()))
 
         self.client_time[game_id] = time.time()
 
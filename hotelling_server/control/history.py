@@ -0,0 +1,440 @@
+import json
+import os
+from copy import copy
+from os import path
+import numpy as np
+from numpy.lib.format import open_memmap
+
+
+class HistoryColumn:
+
+    """
+    Values of one current state entry at each turn, stored as rows of a preallocated array
+    whose capacity doubles when it is full.
+    Numeric entries are stored with their NumPy type, string entries (status and states)
+    are encoded as small integers, other entries are stored as objects.
+    Rows are copied at appending, so later changes of current state are not seen by history.
+    If a file is given, numeric and encoded arrays are memory mapped '.npy' files,
+    object columns are kept in memory and have no file.
+    """
+
+    initial_capacity = 64
+
+    def __init__(self, file=None):
+
+        self.file = file
+
+        self.array = None
+        self.length = 0
+
+        # for encoded columns: value of each code, and code of each value
+        self.categories = None
+        self.codes = None
+
+    @staticmethod
+    def get_kind(value):
+
+        items = value if isinstance(value, (list, tuple, np.ndarray)) else (value, )
+
+        if all(isinstance(i, str) for i in items):
+            return "enum"
+
+        elif all(isinstance(i, (bool, int, float, np.number, np.bool_)) for i in items):
+            return "number"
+
+        else:
+            return "object"
+
+    @property
+    def kind(self):
+
+        if self.categories is not None:
+            return "enum"
+
+        elif self.array.dtype == object:
+            return "object"
+
+        else:
+            return "number"
+
+    # ------------------------------ Writing ------------------------------------------------------ #
+
+    def append(self, value):
+
+        if self.array is None:
+            self.allocate(value)
+
+        row = self.encode(value)
+
+        if row is None:
+            self.to_objects()
+            row = self.encode(value)
+
+        if self.length == len(self.array):
+            self.grow()
+
+        self.array[self.length] = row
+        self.length += 1
+
+    def new_array(self, shape, dtype):
+
+        if dtype == object:
+            return np.empty(shape, dtype=object)
+
+        elif self.file is None:
+            return np.zeros(shape, dtype=dtype)
+
+        # array is written in a temporary file which replaces the previous one,
+        # so that a crash while growing does not lose rows
+        tmp_file = "{}.tmp".format(self.file)
+
+        return open_memmap(tmp_file, mode="w+", dtype=dtype, shape=shape)
+
+    def set_array(self, array):
+
+        if isinstance(array, np.memmap):
+            array.flush()
+            os.replace(array.filename, self.file)
+
+        self.array = array
+
+    def allocate(self, value):
+
+        kind = self.get_kind(value)
+
+        if kind == "object":
+            self.file = None
+            self.array = self.new_array(self.initial_capacity, object)
+
+        else:
+
+            sample = np.asarray(value)
+
+            if kind == "enum":
+                self.categories = []
+                self.codes = {}
+                dtype = np.int16
+
+            else:
+                dtype = sample.dtype
+
+            self.set_array(self.new_array((self.initial_capacity, ) + sample.shape, dtype))
+
+    def encode(self, value):
+        """returns the row to store, or None if column has to store objects from now on"""
+
+        kind = self.kind
+
+        if kind == "object":
+            return self.to_object(value)
+
+        if self.get_kind(value) != kind or np.shape(value) != self.array.shape[1:]:
+            return None
+
+        if kind == "enum":
+            items = value if isinstance(value, (list, tuple, np.ndarray)) else (value, )
+            codes = np.array([self.get_code(str(i)) for i in items], dtype=np.int16)
+
+            return codes.reshape(np.shape(value))
+
+        row = np.asarray(value)
+
+        # e.g. an integer column receiving floats
+        if not np.can_cast(row.dtype, self.array.dtype, casting="safe"):
+
+            array = self.new_array(self.array.shape, np.result_type(row.dtype, self.array.dtype))
+            array[:self.length] = self.array[:self.length]
+
+            self.set_array(array)
+
+        return row
+
+    def get_code(self, value):
+
+        if value not in self.codes:
+            self.codes[value] = len(self.categories)
+            self.categories.append(value)
+
+        return self.codes[value]
+
+    @staticmethod
+    def to_object(value):
+
+        # an object array would try to broadcast a list in its cell
+        cell = np.empty(1, dtype=object)
+        cell[0] = list(value) if isinstance(value, (list, tuple, np.ndarray)) else value
+
+        return cell[0]
+
+    def to_objects(self):
+
+        array = self.new_array(len(self.array), object)
+
+        for t in range(self.length):
+            array[t] = self.to_object(self.decode(t))
+
+        # objects are kept in memory, the previous file is removed by the store (see 'HistoryStore.append')
+        self.file = None
+
+        self.array = array
+        self.categories = None
+        self.codes = None
+
+    def grow(self):
+
+        capacity = max(2 * len(self.array), self.initial_capacity)
+
+        array = self.new_array((capacity, ) + self.array.shape[1:], self.array.dtype)
+        array[:self.length] = self.array[:self.length]
+
+        self.set_array(array)
+
+    # ------------------------------ Reading ------------------------------------------------------ #
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, t):
+
+        if isinstance(t, slice):
+            return [self.decode(i) for i in range(*t.indices(self.length))]
+
+        if t < 0:
+            t += self.length
+
+        if not 0 <= t < self.length:
+            raise IndexError("History has {} turns, turn {} does not exist.".format(self.length, t))
+
+        return self.decode(t)
+
+    def __iter__(self):
+        return (self.decode(t) for t in range(self.length))
+
+    def decode(self, t):
+
+        kind = self.kind
+
+        if kind == "enum":
+
+            if self.array.ndim == 1:
+                return self.categories[self.array[t]]
+
+            return [self.categories[i] for i in self.array[t]]
+
+        elif kind == "object":
+            return self.array[t]
+
+        # a view of the row, scalars are returned as Python types
+        return self.array[t] if self.array.ndim > 1 else self.array[t].item()
+
+    def values(self):
+        """the whole column as an array, strings columns are returned as codes (see 'categories')"""
+        return self.array[:self.length]
+
+    @property
+    def is_mapped(self):
+        return isinstance(self.array, np.memmap)
+
+    def get_index(self):
+        return {"length": self.length, "categories": self.categories}
+
+    def flush(self):
+
+        if self.is_mapped:
+            self.array.flush()
+
+    def freeze(self):
+        """
+        read only copy of the rows written so far, sharing them with this column.
+        written rows never change (an array that has to change is copied into a new one),
+        so the copy is not affected by rows appended afterwards
+        """
+
+        column = copy(self)
+
+        if self.array is not None:
+            column.array = self.values()
+
+        if self.categories is not None:
+            column.categories = list(self.categories)
+            column.codes = dict(self.codes)
+
+        return column
+
+    # ------------------------------ Pickling ----------------------------------------------------- #
+
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+
+        # mapped arrays are already in their file
+        if self.is_mapped:
+            self.flush()
+            state["array"] = None
+
+        # unused capacity is not saved
+        elif self.array is not None:
+            state["array"] = self.values().copy()
+
+        return state
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+
+        if self.array is None and self.file is not None and path.exists(self.file):
+            self.array = np.load(self.file, mmap_mode="r+")
+
+
+class HistoryStore:
+
+    """
+    History of current state entries, one column per entry.
+    'history[key][t]' gives the value of entry 'key' at turn 't'.
+    If a folder is given, columns are memory mapped files of this folder ('<entry>.npy'),
+    and 'index.json' gives the number of turns and the meaning of codes of each column
+    at the last checkpoint, so that history of a running game can be opened read only (see 'open').
+    Files of columns that are kept in memory from now on ('stale_files') are removed once a snapshot
+    holds their rows: until then, they are those of the previous snapshot.
+    """
+
+    index_file = "index.json"
+
+    def __init__(self, entries, folder=None):
+
+        self.folder = folder
+
+        if folder is not None:
+
+            os.makedirs(folder, exist_ok=True)
+
+            # files of a previous game in the same folder
+            for file in [self.index_file] + ["{}.npy".format(s) for s in entries]:
+                if path.exists(path.join(folder, file)):
+                    os.remove(path.join(folder, file))
+
+        self.columns = {s: HistoryColumn(file=self.get_file(s)) for s in entries}
+
+        self.stale_files = []
+
+    def get_file(self, key):
+
+        if self.folder is not None:
+            return path.join(self.folder, "{}.npy".format(key))
+
+    @classmethod
+    def open(cls, folder):
+        """read only history of a game saved with memory mapped columns"""
+
+        with open(path.join(folder, cls.index_file)) as file:
+            index = json.load(file)
+
+        store = cls(entries=(), folder=None)
+
+        for key, info in index.items():
+
+            column = HistoryColumn()
+            column.length = info["length"]
+            column.categories = info["categories"]
+
+            file = path.join(folder, "{}.npy".format(key))
+
+            # columns that were not mapped (objects) are not available
+            if path.exists(file):
+                column.array = np.load(file, mmap_mode="r")
+                store.columns[key] = column
+
+        return store
+
+    @classmethod
+    def from_lists(cls, history):
+        """history saved as lists of values by previous versions"""
+
+        store = cls(history.keys())
+
+        for key, values in history.items():
+            for value in values:
+                store.columns[key].append(value)
+
+        return store
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def keys(self):
+        return self.columns.keys()
+
+    def items(self):
+        return self.columns.items()
+
+    def __len__(self):
+        return min((len(c) for c in self.columns.values()), default=0)
+
+    def append(self, state):
+
+        for key, column in self.columns.items():
+
+            file = column.file if column.is_mapped else None
+
+            column.append(state[key])
+
+            # column changed for objects
+            if file is not None and column.file is None:
+                self.stale_files.append(file)
+
+    def remove_stale_files(self):
+        """called once a snapshot holding the rows of the columns kept in memory is written"""
+
+        for file in self.stale_files:
+            if path.exists(file):
+                os.remove(file)
+
+    def write_index(self):
+        """called by checkpoints, on a frozen copy (see 'freeze'), so that no file is written at each turn"""
+
+        tmp_file = path.join(self.folder, "{}.tmp".format(self.index_file))
+
+        with open(tmp_file, "w") as file:
+            json.dump({key: column.get_index() for key, column in self.columns.items() if column.is_mapped}, file)
+
+        os.replace(tmp_file, path.join(self.folder, self.index_file))
+
+    def flush(self):
+
+        for column in self.columns.values():
+            column.flush()
+
+    def freeze(self):
+        """
+        read only copy of the turns played so far, called under data lock.
+        it takes no copy of the rows, so it can be pickled once the lock is released
+        """
+
+        store = HistoryStore(entries=())
+
+        store.folder = self.folder
+        store.columns = {key: column.freeze() for key, column in self.columns.items()}
+        store.stale_files = list(self.stale_files)
+
+        return store
+
+    # ------------------------------ Pickling ----------------------------------------------------- #
+
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+
+        # a loaded snapshot holds the rows of the columns whose files were stale
+        state["stale_files"] = []
+
+        return state
+
+    def __setstate__(self, state):
+
+        # snapshots of previous versions
+        state.setdefault("stale_files", [])
+
+        self.__dict__.update(state)
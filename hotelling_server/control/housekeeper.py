@@ -0,0 +1,273 @@
+import os
+import shutil
+import sys
+import threading
+import time
+from glob import glob
+from os import path
+from threading import Thread
+
+from utils.utils import Logger
+from hotelling_server.control.backup import Backup
+from hotelling_server.control.catalog import Catalog
+from hotelling_server.control.snapshot import Snapshot
+
+
+class Housekeeper(Thread, Logger):
+
+    """
+    Keep the save folder small, in a thread of idle priority.
+    Every 'interval' seconds, games whose files did not change for 'min_idle_time' seconds
+    are compressed (journal replayed into a compressed snapshot of the current format),
+    copies of the same game are removed (the oldest one is kept), then the oldest games are removed
+    while there are more than 'max_count' games, older than 'max_age_days' days
+    or more than 'max_size_mb' megabytes (0: no limit).
+    Games of the rooms of this server are never touched.
+    Games missing from the catalog are added to it at start and before each pass.
+    Policy is read from 'housekeeping' parameters.
+    """
+
+    name = "Housekeeper"
+
+    # time left to other threads between two games
+    pause = 0.5
+
+    def __init__(self, controller):
+
+        super().__init__()
+
+        self.daemon = True
+
+        self.cont = controller
+
+    @property
+    def param(self):
+        return self.cont.sessions.param["housekeeping"]
+
+    @property
+    def folder(self):
+        return path.expanduser(self.cont.sessions.param["folders"]["save"])
+
+    def run(self):
+
+        self.set_idle_priority()
+
+        # games saved before the catalog existed are listed at once
+        self.rebuild_catalog()
+
+        while not self.cont.shutdown.wait(self.param["interval"]):
+
+            self.rebuild_catalog()
+
+            if not self.param["enabled"] or not path.exists(self.folder):
+                continue
+
+            try:
+                self.clean()
+
+            except Exception as e:
+                self.log("Housekeeping of '{}' failed: {}".format(self.folder, e), level=3)
+
+    def rebuild_catalog(self):
+
+        if not path.exists(self.folder):
+            return
+
+        try:
+            Catalog(folder=self.folder).rebuild(ignored=self.cont.sessions.get_open_files())
+
+        except Exception as e:
+            self.log("Catalog of '{}' could not be rebuilt: {}".format(self.folder, e), level=3)
+
+    def set_idle_priority(self):
+
+        # Linux schedules each thread on its own, elsewhere this thread only pauses between games
+        if not sys.platform.startswith("linux"):
+            return
+
+        try:
+            os.sched_setscheduler(threading.get_native_id(), os.SCHED_IDLE, os.sched_param(0))
+
+        except (AttributeError, OSError) as e:
+            self.log("Idle priority is not available: {}".format(e), level=2)
+
+    def clean(self):
+
+        sessions = self.get_idle_sessions()
+
+        if self.param["compress"]:
+
+            for file in sessions:
+
+                self.touch(file, self.compress)
+
+                if self.cont.shutdown.wait(self.pause):
+                    return
+
+        if self.param["deduplicate"]:
+            sessions = self.deduplicate(sessions)
+
+        self.apply_retention(sessions)
+
+    # ------------------------------ Sessions ----------------------------------------------------- #
+
+    def get_sessions(self):
+        return glob(path.join(self.folder, "xp_*.p"))
+
+    def get_idle_sessions(self):
+        """
+        snapshots of the games nobody uses, oldest first.
+        a game can be loaded afterwards, so each one is reserved again before it is changed (see 'touch')
+        """
+
+        open_files = self.cont.sessions.get_open_files()
+
+        now = time.time()
+
+        sessions = [
+            file for file in self.get_sessions()
+            if path.realpath(file) not in open_files and now - self.get_mtime(file) >= self.param["min_idle_time"]
+        ]
+
+        return sorted(sessions, key=self.get_mtime)
+
+    def touch(self, file, task, *args):
+        """run 'task' on game 'file' if no room uses it, rooms can not load it meanwhile"""
+
+        if not self.cont.sessions.reserve(file):
+            self.log("'{}' is used by a room, it is left as it is.".format(file), level=1)
+            return False
+
+        try:
+            # e.g. removed by a previous task
+            if path.exists(file):
+                task(file, *args)
+                return True
+
+            return False
+
+        finally:
+            self.cont.sessions.release(file)
+
+    @staticmethod
+    def get_files(file):
+        """every file of a game"""
+
+        stem = path.splitext(file)[0]
+
+        files = [file, Backup.get_journal_file(file), "{}.turns".format(stem), "{}.turns.idx".format(stem),
+                 "{}.history".format(stem)]
+
+        return [f for f in files if path.exists(f)]
+
+    def get_mtime(self, file):
+        return max(path.getmtime(f) for f in self.get_files(file))
+
+    def get_size(self, file):
+
+        size = 0
+
+        for f in self.get_files(file):
+
+            if path.isdir(f):
+                size += sum(path.getsize(i) for i in glob(path.join(f, "*")))
+            else:
+                size += path.getsize(f)
+
+        return size
+
+    def remove(self, file, reason):
+
+        for f in self.get_files(file):
+
+            if path.isdir(f):
+                shutil.rmtree(f)
+            else:
+                os.remove(f)
+
+        Catalog(folder=self.folder).remove(path.basename(path.splitext(file)[0]))
+
+        self.log("'{}' removed ({}).".format(file, reason), level=1)
+
+    # ------------------------------ Tasks -------------------------------------------------------- #
+
+    def compress(self, file):
+
+        with open(file, "rb") as f:
+            version, compression = Snapshot.read_info(f)
+
+        journal_file = Backup.get_journal_file(file)
+        has_journal = path.exists(journal_file) and path.getsize(journal_file) > 0
+
+        if compression and version == Snapshot.version and not has_journal:
+            return
+
+        # game keeps its age
+        mtime = self.get_mtime(file)
+        size = path.getsize(file)
+
+        data = Backup.read_session(file)
+
+        tmp_file = "{}.tmp".format(file)
+
+        with open(tmp_file, "wb") as f:
+            Snapshot.write(f, Snapshot.encode(data), compression="zlib", level=self.param["compression_level"])
+
+        os.replace(tmp_file, file)
+
+        # its records are in the snapshot now
+        if path.exists(journal_file):
+            os.remove(journal_file)
+
+        os.utime(file, (mtime, mtime))
+
+        self.log("'{}' compressed ({} to {} bytes).".format(file, size, path.getsize(file)), level=1)
+
+    def deduplicate(self, sessions):
+        """returns the sessions that are kept"""
+
+        kept = {}
+
+        for file in sessions:
+
+            file_hash = Backup.get_hash(file)
+
+            if file_hash in kept:
+                self.touch(file, self.remove, "copy of '{}'".format(kept[file_hash]))
+
+            else:
+                kept[file_hash] = file
+
+        return [i for i in sessions if i in kept.values()]
+
+    def apply_retention(self, sessions):
+
+        max_count = self.param["max_count"]
+        max_age = self.param["max_age_days"] * 24 * 3600
+        max_size = self.param["max_size_mb"] * 2 ** 20
+
+        # games in use count, but only idle ones are removed
+        n_sessions = len(self.get_sessions())
+        total_size = sum(self.get_size(i) for i in self.get_sessions()) if max_size else 0
+
+        now = time.time()
+
+        for file in sessions:
+
+            if max_count and n_sessions > max_count:
+                reason = "more than {} games".format(max_count)
+
+            elif max_age and now - self.get_mtime(file) > max_age:
+                reason = "older than {} days".format(self.param["max_age_days"])
+
+            elif max_size and total_size > max_size:
+                reason = "more than {} MB".format(self.param["max_size_mb"])
+
+            else:
+                continue
+
+            size = self.get_size(file) if max_size else 0
+
+            if self.touch(file, self.remove, reason):
+                n_sessions -= 1
+                total_size -= size
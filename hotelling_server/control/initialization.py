@@ -1,6 +1,3 @@
-from copy import deepcopy
-
-
 from multiprocessing import Queue
 import numpy as np
 
@@ -28,7 +25,7 @@ class Init:
 
         role = self.get_role(game_id)
 
-        self.data.roles[game_id] = role
+        self.data.write_field("roles", game_id, role)
 
         if role == "firm":
             return self.init_firms("ask_init", game_id)
@@ -39,7 +36,7 @@ class Init:
 
         if game_id not in self.data.customers_id.keys():
             customer_id = len(self.data.customers_id)
-            self.data.customers_id[game_id] = customer_id
+            self.data.write_field("customers_id", game_id, customer_id)
 
         else:
             customer_id = self.data.customers_id[game_id]
@@ -57,7 +54,7 @@ class Init:
         position = customer_id + 1
         exploration_cost = self.data.parametrization["exploration_cost"]
         utility_consumption = self.data.parametrization["utility_consumption"]
-        utility = self.data.current_state["customer_cumulative_utility"][customer_id]
+        utility = self.data.snapshot()["customer_cumulative_utility"][customer_id]
 
         return position, exploration_cost, utility_consumption, utility
 
@@ -65,7 +62,7 @@ class Init:
 
         if game_id not in self.data.firms_id.keys():
             firm_id = len(self.data.firms_id)
-            self.data.firms_id[game_id] = firm_id
+            self.data.write_field("firms_id", game_id, firm_id)
 
         # if device already asked for init, get id
         else:
@@ -92,7 +89,7 @@ class Init:
         opponent_id = (firm_id + 1) % 2
 
         t = self.time_manager.t
-        cs = deepcopy(self.data.current_state)
+        cs = self.data.snapshot()
 
         position = cs["firm_positions"][firm_id]
         price = cs["firm_prices"][firm_id]
@@ -144,7 +141,7 @@ class Init:
         remaining = len(self.data.roles) - (len(self.data.firms_id) + len(self.data.customers_id))
 
         if not remaining:
-            self.data.current_state["init_done"] = True
+            self.data.write_entry("init_done", True)
             self.time_manager.check_state()
 
     # ------------------------------- Admin init ----------------------------------------------------------- #
@@ -158,15 +155,17 @@ class Init:
             firm_0 = self.data.firms_id[0]
             firm_1 = self.data.firms_id[1]
 
-            state = self.data.current_state["firm_status"][firm_0]
+            cs = self.data.snapshot()
+
+            state = cs["firm_status"][firm_0]
 
-            position = self.data.current_state["firm_positions"][firm_0]
-            price = self.data.current_state["firm_prices"][firm_0]
-            profits = self.data.current_state["firm_cumulative_profits"][firm_0]
+            position = cs["firm_positions"][firm_0]
+            price = cs["firm_prices"][firm_0]
+            profits = cs["firm_cumulative_profits"][firm_0]
 
-            opp_position = self.data.current_state["firm_positions"][firm_1]
-            opp_price = self.data.current_state["firm_prices"][firm_1]
-            opp_profits = self.data.current_state["firm_cumulative_profits"][firm_1]
+            opp_position = cs["firm_positions"][firm_1]
+            opp_price = cs["firm_prices"][firm_1]
+            opp_profits = cs["firm_cumulative_profits"][firm_1]
 
             return self.reply(
                 game_id,
@@ -0,0 +1,107 @@
+import os
+import pickle
+import struct
+from os import path
+
+from utils.utils import Logger
+
+
+class Journal(Logger):
+
+    """
+    Append-only file of records (sequence number, kind, payload)
+    written since the last snapshot of a game.
+    Each record is a pickle prefixed by its length, so that
+    a record truncated by a crash is detected and ignored at reading.
+    """
+
+    name = "Journal"
+
+    header = struct.Struct("<I")
+
+    def __init__(self, file):
+
+        self.file = file
+        self.stream = None
+
+        # sequence number of the last record encoded
+        self.seq = 0
+
+        # records written since last truncation
+        self.n_records = 0
+
+    def encode(self, kind, payload):
+        """
+        returns the record as bytes, numbered in encoding order.
+        payload is pickled at once, so it can be modified once this method returns
+        """
+
+        self.seq += 1
+
+        blob = pickle.dumps((self.seq, kind, payload), protocol=pickle.HIGHEST_PROTOCOL)
+
+        return self.header.pack(len(blob)) + blob
+
+    def write(self, records, fsync=False):
+
+        if self.stream is None:
+            self.stream = open(self.file, "ab")
+
+        self.stream.write(b"".join(records))
+        self.stream.flush()
+
+        if fsync:
+            os.fsync(self.stream.fileno())
+
+        self.n_records += len(records)
+
+    def truncate(self):
+        """records are now part of a snapshot"""
+
+        self.close()
+
+        open(self.file, "wb").close()
+
+        self.n_records = 0
+
+    def reset(self):
+        """a new game starts"""
+
+        self.truncate()
+        self.seq = 0
+
+    def read(self, after=0):
+        """yields records whose sequence number is greater than 'after'"""
+
+        if not path.exists(self.file):
+            return
+
+        with open(self.file, "rb") as file:
+
+            while True:
+
+                header = file.read(self.header.size)
+
+                if not header:
+                    break
+
+                blob = file.read(self.header.unpack(header)[0]) if len(header) == self.header.size else b""
+
+                try:
+                    seq, kind, payload = pickle.loads(blob)
+
+                except Exception:
+                    self.log("Journal '{}' ends with a truncated record, it is ignored.".format(self.file), level=2)
+                    break
+
+                self.seq = max(self.seq, seq)
+
+                if seq > after:
+                    self.n_records += 1
+                    yield kind, payload
+
+    def close(self):
+
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
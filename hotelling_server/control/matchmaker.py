@@ -0,0 +1,133 @@
+import time
+from threading import Thread, Event
+
+from utils.utils import Logger
+
+
+class Matchmaker(Thread, Logger):
+
+    """
+    Partition the waiting list into full games, each one launched in its own room.
+    The thread only polls the waiting list: matching is done by the controller thread
+    when the waiting list comes back from the server.
+    Policy is read from 'matchmaking' parameters:
+    players fill roles in 'human_roles' order, and once the oldest
+    unmatched player waited 'max_waiting_time' seconds, the remaining players
+    are completed with bots (if 'fill_with_bots' is set).
+    """
+
+    name = "Matchmaker"
+
+    def __init__(self, controller):
+
+        super().__init__()
+
+        self.daemon = True
+
+        self.cont = controller
+
+        # names already assigned to a room, as long as they remain in the waiting list
+        self.matched = set()
+
+        # key: name, value: time at which it was seen for the first time in the waiting list
+        self.first_seen = {}
+
+    # read at each use, parameters can be reloaded
+    @property
+    def param(self):
+        return self.cont.sessions.param["matchmaking"]
+
+    @property
+    def game_param(self):
+        return self.cont.sessions.param["game"]
+
+    @property
+    def n_player(self):
+        return self.game_param["n_firms"] + self.game_param["n_customers"]
+
+    def is_enabled(self):
+        return self.param["enabled"]
+
+    def run(self):
+
+        while not self.cont.shutdown.is_set():
+
+            Event().wait(self.param["interval"])
+
+            if self.is_enabled() and self.cont.running_server.is_set():
+                self.cont.server.side_queue.put(("get_waiting_list", ))
+
+    def get_unmatched(self, waiting_list):
+
+        # names that left the waiting list can be matched again if they come back
+        self.matched &= set(waiting_list)
+
+        unmatched = [i for i in waiting_list if i not in self.matched]
+
+        now = time.time()
+
+        self.first_seen = {name: self.first_seen.get(name, now) for name in unmatched}
+
+        return unmatched
+
+    def reserve(self, names):
+        """names assigned to a room by other means"""
+        self.matched |= {i for i in names if i != "Bot"}
+
+    def match(self, waiting_list, n_free_rooms):
+        """returns the assignments of the games that can be launched"""
+
+        unmatched = self.get_unmatched(waiting_list)
+
+        groups = []
+
+        while unmatched and len(groups) < n_free_rooms:
+
+            if len(unmatched) >= self.n_player:
+                group = unmatched[:self.n_player]
+
+            elif self.should_fill_with_bots(unmatched):
+                group = unmatched
+
+            else:
+                break
+
+            unmatched = unmatched[len(group):]
+            groups.append(group)
+
+        for group in groups:
+            self.reserve(group)
+
+        if groups:
+            self.log("Matched {} game(s), {} player(s) still waiting.".format(len(groups), len(unmatched)), level=1)
+
+        return [self.get_assignment(group) for group in groups]
+
+    def should_fill_with_bots(self, unmatched):
+
+        if not self.param["fill_with_bots"] or len(unmatched) < self.param["min_players"]:
+            return False
+
+        oldest = min(self.first_seen[name] for name in unmatched)
+
+        return time.time() - oldest >= self.param["max_waiting_time"]
+
+    def get_roles(self):
+
+        n_roles = {"firm": self.game_param["n_firms"], "customer": self.game_param["n_customers"]}
+
+        return [role for role in self.param["human_roles"] for _ in range(n_roles[role])]
+
+    def get_assignment(self, names):
+        """players take the first roles, remaining ones are played by bots"""
+
+        return {
+
+            game_id: {
+                "name": names[game_id] if game_id < len(names) else "Bot",
+                "role": role,
+                "bot": game_id >= len(names)
+            }
+
+            for game_id, role in enumerate(self.get_roles())
+        }
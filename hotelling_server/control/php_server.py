@@ -4,6 +4,7 @@ from threading import Thread, Event
 import requests as rq
 
 from utils.utils import Logger
+from utils.message_bus import Message
 
 
 class RequestManager(Logger):
@@ -85,7 +86,7 @@ class PHPServer(Thread, RequestManager):
             elif response.text == "Another server seems to be running.":
 
                 self.log("Another server seems to be running! Game could be compromised!", level=3)
-                self.cont.queue.put((
+                self.cont.queue.put(Message(
                     "ask_interface",
                     "show_critical_and_ok",
                     "Another server seems to be running! Game could be compromised!"))
@@ -111,6 +112,8 @@ class PHPServer(Thread, RequestManager):
 
         while self.serve_event.is_set():
 
+            self.cont.watchdog.beat(self.name)
+
             self.treat_sides_requests()
 
             if self.running_game.is_set():
@@ -118,6 +121,9 @@ class PHPServer(Thread, RequestManager):
 
             Event().wait(self.request_frequency)
 
+        # waiting for a new 'serve' message is not a stall
+        self.cont.watchdog.forget(self.name)
+
     def treat_game_requests(self):
 
         response = self.send_request(
@@ -130,11 +136,13 @@ class PHPServer(Thread, RequestManager):
             requests = [i for i in response.text.split("&")[1:] if i]
 
             if requests:
-                for request in requests:
-                    self.cont.queue.put(("server_request", request))
 
                 self.log("I will treat {} request(s).".format(len(requests)))
-                self.treat_requests(n_requests=len(requests))
+
+                # requests of the batch are handled before any response is sent,
+                # so that rooms of different shards handle them in parallel
+                for response in self.cont.serve_requests(requests):
+                    self.send_response(*response)
 
     def treat_sides_requests(self):
 
@@ -153,7 +161,7 @@ class PHPServer(Thread, RequestManager):
             elif msg and msg[0] == "get_waiting_list":
 
                 waiting_list = self.get_waiting_list()
-                self.cont.queue.put(("server_update_assignment_frame", waiting_list))
+                self.cont.queue.put(Message("server_update_assignment_frame", waiting_list))
 
             elif msg and msg[0] == "erase_sql_tables":
 
@@ -167,31 +175,26 @@ class PHPServer(Thread, RequestManager):
 
                 self.set_missing_players(msg[1])
 
-    def treat_requests(self, n_requests):
-
-        for i in range(n_requests):
-
-            self.log("I'm treating the request no {}.".format(i))
+    def send_response(self, should_be_reply, response):
 
-            should_be_reply, response = self.main_queue.get()
+        if should_be_reply == "reply":
 
-            if should_be_reply == "reply":
-
-                response = self.send_request(
-                    demand_type="writing",
-                    table="response",
-                    gameId=response["game_id"],
-                    response=response["response"]
-                )
+            response = self.send_request(
+                demand_type="writing",
+                table="response",
+                gameId=response["game_id"],
+                roomId=response.get("room_id", 0),
+                response=response["response"]
+            )
 
-                self.log("Response from distant server is: '{}'.".format(response.text))
+            self.log("Response from distant server is: '{}'.".format(response.text))
 
-            elif should_be_reply == "error":
+        elif should_be_reply == "error":
 
-                self.log("I will not send response now (code error is '{}').".format(response))
+            self.log("I will not send response now (code error is '{}').".format(response))
 
-            else:
-                raise Exception("Something went wrong...")
+        else:
+            raise Exception("Something went wrong...")
 
     def receive_messages(self):
 
@@ -217,7 +220,7 @@ class PHPServer(Thread, RequestManager):
                     sep_args = arg.split("<>")
                     user_name, message = sep_args[0], sep_args[1]
 
-                    self.cont.queue.put(("server_new_message", user_name, message))
+                    self.cont.queue.put(Message("server_new_message", user_name, message))
 
                     self.log("I send confirmation for message '{}'.".format(arg))
 
@@ -347,7 +350,7 @@ class PHPServer(Thread, RequestManager):
             if response.text == "I inserted names in 'waiting_list' table.":
                 break
 
-    def authorize_participants(self, participants, roles, game_ids):
+    def authorize_participants(self, participants, roles, game_ids, room_id):
 
         while True:
 
@@ -359,7 +362,8 @@ class PHPServer(Thread, RequestManager):
                 table="participants",
                 gameIds=json.dumps(game_ids),
                 names=json.dumps(participants),
-                roles=json.dumps(roles)
+                roles=json.dumps(roles),
+                roomId=room_id
             )
 
             self.log("I got the response '{}' from the distant server.".format(response.text), level=1)
@@ -0,0 +1,281 @@
+import time
+from copy import copy
+from threading import Event
+
+from utils.utils import Logger
+from utils.message_bus import Message
+from hotelling_server.control import backup, data, game, statistician, \
+    time_manager, initialization, state_buffer
+
+
+class Room(Logger):
+
+    """
+    One game session: its own state, time manager,
+    backup, statistics, game and bots.
+    Each room has its own copy of the parameters, updated when no game is running.
+    """
+
+    name = "Room"
+
+    # Methods that can be called on a room hosted by a shard worker
+    remote_commands = (
+        "launch",
+        "stop",
+        "stop_as_soon_as_possible",
+        "new_game",
+        "load_game",
+        "set_assignment",
+        "get_assignment",
+        "set_parametrization",
+        "set_params",
+        "set_time_since_last_request",
+        "stop_bots",
+        "is_ended",
+        "handle_request",
+        "compute_figures",
+        "get_current_data",
+        "get_lock_stats",
+        "get_backup_file",
+        "close"
+    )
+
+    def __init__(self, controller, room_id, param):
+
+        self.controller = controller
+        self.room_id = room_id
+
+        self.watchdog = controller.watchdog
+
+        # threading events are cheaper than multiprocessing ones
+        # and rooms are only accessed from the process hosting them
+        self.running_game = Event()
+        self.continue_game = Event()
+
+        self.data = data.Data(controller=self, param=param)
+        self.time_manager = time_manager.TimeManager(controller=self)
+        self.backup = backup.Backup(controller=self)
+        self.statistician = statistician.Statistician(controller=self)
+        self.game = game.Game(controller=self)
+        self.init = initialization.Init(controller=self)
+
+        # numeric state shared with the interface, created at first publication
+        self.state_buffer = None
+
+    @property
+    def label(self):
+        return "room {}".format(self.room_id)
+
+    def ask_controller(self, command):
+        """send a command concerning this room to the controller"""
+        self.controller.queue.put(Message(command, self.room_id))
+
+    def is_serving(self):
+        return self.controller.is_serving()
+
+    def warn(self, msg):
+        """show a warning concerning this room on the interface"""
+        self.controller.queue.put(Message("ask_interface", "show_warning", "Room {}: {}".format(self.room_id, msg)))
+
+    # ------------------------------ Game life cycle ---------------------------------------------- #
+
+    def launch(self):
+
+        self.continue_game.set()
+        self.running_game.set()
+
+    def stop(self):
+
+        # last changes are written whatever the checkpoint policy
+        if self.running_game.is_set():
+            self.backup.notify(turn_end=True)
+
+        self.continue_game.clear()
+        self.running_game.clear()
+
+    def stop_as_soon_as_possible(self):
+
+        self.continue_game.clear()
+        self.time_manager.stop_as_soon_as_possible()
+
+    def new_game(self):
+
+        with self.data.lock:
+            self.data.new()
+            self.time_manager.setup()
+            self.launch()
+            self.game.new()
+
+    def load_game(self, file):
+        """
+        returns assignment of the game and a report on its recovery,
+        None and the reason of the failure ('error') if it can not be loaded
+        """
+
+        start = time.perf_counter()
+
+        with self.data.lock:
+
+            try:
+                n_records = self.data.load(file)
+
+            except backup.LoadError as e:
+                return None, {"file": file, "error": str(e)}
+
+            # set assignment for init
+            self.set_assignment(self.data.assignment)
+
+            self.time_manager.setup(loaded=True)
+            self.launch()
+            self.game.load()
+
+            recovery = {
+                "file": file,
+                "t": self.time_manager.t,
+                "journal_records": n_records,
+                "time": time.perf_counter() - start
+            }
+
+            self.log("Game recovered from '{}' at turn {} in {:.3f} s ({} journal record(s) replayed).".format(
+                file, recovery["t"], recovery["time"], n_records), level=1)
+
+            return self.data.assignment, recovery
+
+    def set_assignment(self, assignment):
+
+        self.data.set_assignment(assignment)
+        self.init.set_assignment(assignment)
+
+    def get_assignment(self):
+        return self.data.assignment
+
+    def set_parametrization(self, param):
+
+        self.data.set_parametrization(param)
+        self.data.condition = param["condition"]
+
+    def set_params(self, params):
+        """new values of server parameters files, given when no game is running"""
+
+        with self.data.lock:
+            self.data.param.update(params)
+
+    def set_time_since_last_request(self, role, role_id, value):
+
+        with self.data.lock:
+            self.data.write("time_since_last_request_{}s".format(role), role_id, value)
+
+    def stop_bots(self):
+        self.game.stop_bots()
+
+    def is_ended(self):
+        return self.game.is_ended()
+
+    # ------------------------------ Requests and figures ----------------------------------------- #
+
+    def handle_request(self, request):
+
+        # version of game variables is increased by the writes made while handling the request,
+        # so requests that change nothing (e.g. waiting for other players) keep snapshots valid
+        with self.data.lock:
+
+            # When game is launched
+            if "ask_init" in request:
+                return self.init.ask_init(request)
+
+            # init admin
+            elif "ask_admin_init" in request:
+                return self.init.ask_admin_init()
+
+            else:
+                return self.game.handle_request(request)
+
+    def compute_figures(self):
+
+        with self.data.lock:
+            self.statistician.compute_distance()
+            self.statistician.compute_mean_extra_view_choices()
+            self.statistician.compute_profits()
+            self.statistician.compute_mean_utility()
+
+    def publish_state(self):
+        """write numeric state and statistics in the state buffer"""
+
+        n_points = len(self.statistician.mean_utility)
+
+        n_firms = self.data.param["game"]["n_firms"]
+        n_customers = self.data.param["game"]["n_customers"]
+
+        # numbers of players can change between games
+        if self.state_buffer is None or n_points > self.state_buffer.capacity or \
+                (self.state_buffer.n_firms, self.state_buffer.n_customers) != (n_firms, n_customers):
+
+            if self.state_buffer is not None:
+                self.state_buffer.close()
+
+            self.state_buffer = state_buffer.StateBuffer(
+                n_firms=n_firms,
+                n_customers=n_customers,
+                capacity=max(self.data.param["engine"]["state_buffer_capacity"], 2 * n_points)
+            )
+
+        self.state_buffer.write(
+            current_state=self.data.current_state,
+            t=self.time_manager.t,
+            statistics=self.statistician.data
+        )
+
+    def get_versions(self):
+        return (self.data.version, self.data.activity_version), self.statistician.version
+
+    def get_current_data(self, known_versions=None):
+        """
+        publish numeric state in the state buffer
+        and return the rest of the data displayed by interface,
+        or None if nothing changed since 'known_versions'
+        """
+
+        # data is copied as it is sent to interface after the lock is released
+        with self.data.lock:
+
+            versions = self.get_versions()
+
+            if versions == known_versions:
+                return None
+
+            self.publish_state()
+
+            current_state = {k: v for k, v in self.data.snapshot().items() if k not in self.state_buffer.state}
+
+            # snapshot is shared until game variables change, activity entries are read when displayed
+            current_state.update({k: tuple(self.data.current_state[k]) for k in self.data.activity_entries})
+
+            return {
+                "versions": versions,
+                "current_state": current_state,
+                "state_buffer": self.state_buffer.descriptor,
+                "bot_firms_id": copy(self.data.bot_firms_id),
+                "firms_id": copy(self.data.firms_id),
+                "bot_customers_id": copy(self.data.bot_customers_id),
+                "customers_id": copy(self.data.customers_id),
+                "roles": copy(self.data.roles),
+                "time_manager_t": self.time_manager.t,
+                "map_server_id_game_id": copy(self.data.map_server_id_game_id),
+                "assignment": self.data.assignment
+            }
+
+    def get_lock_stats(self):
+        return self.data.lock.get_stats()
+
+    def get_backup_file(self):
+        """snapshot of the game of the room, None if no game was played"""
+        return self.backup.file
+
+    def close(self):
+
+        self.game.stop_bots()
+
+        self.backup.close()
+
+        if self.state_buffer is not None:
+            self.state_buffer.close()
@@ -0,0 +1,235 @@
+import traceback
+from multiprocessing import Event
+from os import path
+from threading import RLock
+
+from utils.utils import Logger
+from hotelling_server.control import data, room, shard
+
+
+class SessionManager(Logger):
+
+    """
+    Host several independent rooms in the same server.
+    Clients only know their game id, given when they are authorized to play (see 'register'):
+    game ids of the default room are those of its assignment, those of the other rooms
+    are shifted by 'game_ids_per_room' times their room id, so that they are unique
+    in the request and response tables shared by every room.
+    Requests are routed to a room from their game id, translated to the game id in the room.
+    Requests without a known game id (e.g. admin) go to the default room,
+    unless they start with a 'room/<room_id>/' prefix.
+    If 'n_shards' is set in engine parameters, rooms are hosted
+    by a pool of worker processes instead of the controller process.
+    """
+
+    name = "SessionManager"
+
+    default_room_id = 0
+
+    game_ids_per_room = 1000
+
+    def __init__(self, controller):
+
+        self.controller = controller
+
+        # parameters are read once, each room gets a copy
+        self.param = data.Data.load_param()
+
+        self.rooms = {}
+        self.next_room_id = self.default_room_id
+
+        # key: game id known by the client, value: room id and game id in this room
+        self.clients = {}
+
+        self.lock = RLock()
+
+        # real paths of the games changed by the housekeeper, and of those being loaded by a room:
+        # a game can not be in both at once
+        self.reserved_files = set()
+        self.loading_files = set()
+
+        # set while server serves requests, shared with shard workers (see 'ShardWorker.is_serving')
+        self.serving = Event()
+
+        n_shards = self.param["engine"]["n_shards"]
+
+        if n_shards:
+            self.pool = shard.ShardPool(
+                n_shards=n_shards, param=self.param, controller_queue=controller.queue, serving=self.serving)
+        else:
+            self.pool = None
+
+    def new_room(self):
+
+        with self.lock:
+
+            room_id = self.next_room_id
+            self.next_room_id += 1
+
+            if self.pool is not None:
+                self.rooms[room_id] = shard.RemoteRoom(pool=self.pool, room_id=room_id)
+            else:
+                # each room has its own copy, so that a running game keeps its parameters
+                self.rooms[room_id] = room.Room(controller=self.controller, room_id=room_id, param=dict(self.param))
+
+        self.log("New room: {}.".format(room_id), level=1)
+
+        return self.rooms[room_id]
+
+    def get(self, room_id):
+        return self.rooms.get(room_id)
+
+    def get_room_ids(self):
+        return sorted(self.rooms.keys())
+
+    def get_running_rooms(self):
+        return [r for r in self.rooms.values() if r.running_game.is_set()]
+
+    def get_stopped_rooms(self):
+        return [r for r in self.rooms.values() if not r.running_game.is_set()]
+
+    def remove_room(self, room_id):
+        """close a room whose game is over, its game stays in save folder"""
+
+        with self.lock:
+
+            r = self.rooms.pop(room_id)
+
+            self.clients = {k: v for k, v in self.clients.items() if v[0] != room_id}
+
+        r.close()
+
+        self.log("Room {} removed.".format(room_id), level=1)
+
+    def register(self, room_id, game_ids):
+        """players of 'game_ids' play in room 'room_id', returns the game ids given to their clients"""
+
+        client_ids = [room_id * self.game_ids_per_room + i for i in game_ids]
+
+        with self.lock:
+
+            # clients of a previous game of the room
+            self.clients = {k: v for k, v in self.clients.items() if v[0] != room_id}
+
+            self.clients.update({c: (room_id, i) for c, i in zip(client_ids, game_ids)})
+
+        return client_ids
+
+    def get_client_id(self, room_id, game_id):
+        """game id known by the client of player 'game_id' of room 'room_id'"""
+
+        if game_id == -1:
+            # admin
+            return game_id
+
+        return room_id * self.game_ids_per_room + game_id
+
+    def route(self, request):
+        """returns the room concerned by the request and the request as the room knows it"""
+
+        whole = [i for i in request.split("/") if i != ""]
+
+        if len(whole) > 1 and whole[0] == "room" and whole[1].isdigit():
+            return self.get(int(whole[1])), "/".join(whole[2:])
+
+        # second item is game id, except for admin requests
+        if len(whole) > 1 and whole[1].isdigit() and not whole[0].startswith("ask_admin"):
+
+            with self.lock:
+                client = self.clients.get(int(whole[1]))
+
+            if client is not None:
+                room_id, game_id = client
+                return self.get(room_id), "/".join([whole[0], str(game_id)] + whole[2:])
+
+        return self.get(self.default_room_id), request
+
+    def handle_requests(self, requests):
+        """
+        replies to (room, request) pairs, in order, an exception for requests that could not be handled.
+        Requests of rooms hosted by different shards are handled in parallel.
+        """
+
+        if self.pool is not None:
+            return self.pool.call_many([(r.room_id, "handle_request", (request, )) for r, request in requests])
+
+        replies = []
+
+        for r, request in requests:
+
+            try:
+                replies.append(r.handle_request(request))
+
+            except Exception as e:
+                self.log("Error while handling '{}':\n{}".format(request, traceback.format_exc()), level=3)
+                replies.append(e)
+
+        return replies
+
+    def set_serving(self, serving):
+
+        if serving:
+            self.serving.set()
+        else:
+            self.serving.clear()
+
+    def get_lock_stats(self):
+        return {r.label: r.get_lock_stats() for r in self.rooms.values()}
+
+    def get_open_files(self):
+        """real paths of the snapshots of the games of the rooms, they must not be touched by anybody else"""
+
+        with self.lock:
+            rooms = list(self.rooms.values())
+
+        return {path.realpath(i) for i in (r.get_backup_file() for r in rooms) if i is not None}
+
+    def reserve(self, file):
+        """
+        the housekeeper is about to change game 'file', returns False if a room uses it.
+        A reserved game is not loaded until it is released.
+        """
+
+        file = path.realpath(file)
+
+        with self.lock:
+
+            if file in self.loading_files or file in self.get_open_files():
+                return False
+
+            self.reserved_files.add(file)
+
+            return True
+
+    def release(self, file):
+
+        with self.lock:
+            self.reserved_files.discard(path.realpath(file))
+
+    def start_loading(self, file):
+        """a room is about to load game 'file', returns False if the housekeeper is changing it"""
+
+        file = path.realpath(file)
+
+        with self.lock:
+
+            if file in self.reserved_files:
+                return False
+
+            self.loading_files.add(file)
+
+            return True
+
+    def end_loading(self, file):
+
+        with self.lock:
+            self.loading_files.discard(path.realpath(file))
+
+    def close(self):
+
+        if self.pool is not None:
+            self.pool.close()
+
+        else:
+            for r in self.rooms.values():
+                r.close()
@@ -0,0 +1,117 @@
+import json
+import sqlite3
+
+from utils.utils import Logger
+
+
+class SessionStore(Logger):
+
+    """
+    SQLite database gathering the turns of every game, in order to query them across sessions,
+    e.g. "SELECT session, t FROM turns WHERE firm_id = 0 AND status = 'active' AND price > 8".
+    'turns' has one row per firm and turn, 'choices' one row per customer and turn,
+    'sessions' one row per game (a session is named after its backup file).
+    """
+
+    name = "SessionStore"
+
+    schema = (
+        """CREATE TABLE IF NOT EXISTS sessions (
+            session TEXT PRIMARY KEY, file TEXT, condition TEXT,
+            n_firms INTEGER, n_customers INTEGER, n_turns INTEGER,
+            parametrization TEXT, assignment TEXT)""",
+        """CREATE TABLE IF NOT EXISTS turns (
+            session TEXT, t INTEGER, firm_id INTEGER, game_id INTEGER, status TEXT,
+            position INTEGER, price INTEGER, profits REAL, cumulative_profits REAL, n_client INTEGER,
+            PRIMARY KEY (session, t, firm_id))""",
+        "CREATE INDEX IF NOT EXISTS turns_game_id ON turns (session, game_id)",
+        """CREATE TABLE IF NOT EXISTS choices (
+            session TEXT, t INTEGER, customer_id INTEGER, game_id INTEGER,
+            firm_choice INTEGER, extra_view INTEGER, utility REAL,
+            PRIMARY KEY (session, t, customer_id))""",
+        "CREATE INDEX IF NOT EXISTS choices_game_id ON choices (session, game_id)"
+    )
+
+    # time waited for a lock taken by another room or process
+    timeout = 10
+
+    def __init__(self, file):
+
+        self.file = file
+        self.connection = None
+
+    def connect(self):
+
+        if self.connection is None:
+
+            # connection is used by checkpointer thread, then by the thread closing the room
+            self.connection = sqlite3.connect(self.file, timeout=self.timeout, check_same_thread=False)
+
+            with self.connection:
+                for statement in self.schema:
+                    self.connection.execute(statement)
+
+        return self.connection
+
+    @staticmethod
+    def get_rows(session, file, t, data):
+        """rows describing turn 't', called under data lock"""
+
+        cs = data.current_state
+
+        firms_game_id = {firm_id: game_id for game_id, firm_id in data.firms_id.items()}
+        customers_game_id = {customer_id: game_id for game_id, customer_id in data.customers_id.items()}
+
+        turns = [
+            (session, t, firm_id, firms_game_id.get(firm_id), cs["firm_status"][firm_id],
+             int(cs["firm_positions"][firm_id]), int(cs["firm_prices"][firm_id]),
+             float(cs["firm_profits"][firm_id]), float(cs["firm_cumulative_profits"][firm_id]),
+             int(cs["n_client"][firm_id]))
+            for firm_id in range(len(cs["firm_positions"]))
+        ]
+
+        choices = [
+            (session, t, customer_id, customers_game_id.get(customer_id),
+             int(cs["customer_firm_choices"][customer_id]), int(cs["customer_extra_view_choices"][customer_id]),
+             float(cs["customer_utility"][customer_id]))
+            for customer_id in range(len(cs["customer_firm_choices"]))
+        ]
+
+        sessions = [
+            (session, file, data.parametrization.get("condition"),
+             len(cs["firm_positions"]), len(cs["customer_firm_choices"]), t + 1,
+             json.dumps(data.parametrization), json.dumps(data.assignment))
+        ]
+
+        return {"sessions": sessions, "turns": turns, "choices": choices}
+
+    def write(self, batches):
+        """insert rows of several turns in one transaction"""
+
+        if not batches:
+            return
+
+        connection = self.connect()
+
+        with connection:
+
+            for rows in batches:
+                connection.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows["sessions"])
+                connection.executemany("INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows["turns"])
+                connection.executemany("INSERT OR REPLACE INTO choices VALUES (?, ?, ?, ?, ?, ?, ?)", rows["choices"])
+
+    def delete(self, session):
+        """a new game reuses the name of a session"""
+
+        with self.connect() as connection:
+            for table in ("sessions", "turns", "choices"):
+                connection.execute("DELETE FROM {} WHERE session = ?".format(table), (session, ))
+
+    def query(self, sql, parameters=()):
+        return self.connect().execute(sql, parameters).fetchall()
+
+    def close(self):
+
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,338 @@
+import traceback
+from multiprocessing import Process, Pipe
+from threading import Event, Lock
+
+from utils.utils import Logger
+from utils.message_bus import Message, CommandRegistry
+from utils.watchdog import Watchdog
+from hotelling_server.control import room
+
+
+class ShardError(Exception):
+    pass
+
+
+class ShardWorker(Process, Logger):
+
+    """
+    Process hosting a subset of rooms.
+    Rooms are driven through a pipe: each message is answered
+    by a pair (success, result).
+    Rooms notify the controller directly through its queue.
+    'serving' is set by the controller while its server is serving requests,
+    bots of the rooms stop when it is cleared.
+    """
+
+    name = "ShardWorker"
+
+    # Commands concerning the shard itself, other ones are sent to rooms
+    commands = (
+        "new_room",
+        "remove_room",
+        "stop"
+    )
+
+    def __init__(self, shard_id, param, connection, controller_queue, serving):
+
+        super().__init__()
+
+        self.daemon = True
+
+        self.shard_id = shard_id
+        self.param = param
+        self.connection = connection
+
+        # used by rooms in order to notify the controller
+        self.queue = controller_queue
+
+        self.serving = serving
+
+        # those attributes are set in the worker process
+        self.rooms = None
+        self.registry = None
+        self.room_registries = None
+        self.shutdown = None
+        self.watchdog = None
+
+    def run(self):
+
+        self.rooms = {}
+        self.room_registries = {}
+        self.registry = CommandRegistry(owner=self, commands=self.commands)
+        self.shutdown = Event()
+
+        # bots of the rooms hosted here send heartbeats to it
+        self.watchdog = Watchdog(
+            interval=self.param["engine"]["watchdog_interval"],
+            timeout=self.param["engine"]["watchdog_timeout"],
+            alert=lambda msg: self.queue.put(Message(
+                "ask_interface", "show_warning", "Shard {}: {}".format(self.shard_id, msg)))
+        )
+
+        self.watchdog.start()
+
+        self.log("Shard {} is running.".format(self.shard_id), level=1)
+
+        while not self.shutdown.is_set():
+
+            message = self.connection.recv()
+
+            try:
+                result = True, self.dispatch(message)
+
+            except Exception as e:
+                self.log("Error while handling '{}':\n{}".format(message, traceback.format_exc()), level=3)
+                result = False, "{}: {}".format(type(e).__name__, e)
+
+            self.connection.send(result)
+
+        self.log("Shard {} is dead.".format(self.shard_id), level=1)
+
+    def dispatch(self, message):
+
+        if message.command in self.commands:
+            return self.registry.dispatch(message)
+
+        room_id, args = message.args[0], message.args[1:]
+
+        room_message = Message(message.command, *args)
+        room_message.sent_at = message.sent_at
+
+        return self.room_registries[room_id].dispatch(room_message)
+
+    def is_serving(self):
+        return self.serving.is_set() and not self.shutdown.is_set()
+
+    def new_room(self, room_id):
+
+        self.rooms[room_id] = room.Room(controller=self, room_id=room_id, param=dict(self.param))
+        self.room_registries[room_id] = CommandRegistry(owner=self.rooms[room_id], commands=room.Room.remote_commands)
+
+    def remove_room(self, room_id):
+
+        self.rooms.pop(room_id).close()
+        del self.room_registries[room_id]
+
+    def stop(self):
+
+        for r in self.rooms.values():
+            r.close()
+
+        self.watchdog.stop()
+        self.shutdown.set()
+
+
+class ShardPool(Logger):
+
+    """
+    Start shard workers and forward room method calls
+    to the worker owning the room.
+    """
+
+    name = "ShardPool"
+
+    def __init__(self, n_shards, param, controller_queue, serving):
+
+        self.connections = []
+        self.locks = []
+        self.workers = []
+
+        for shard_id in range(n_shards):
+
+            connection, worker_connection = Pipe()
+
+            worker = ShardWorker(
+                shard_id=shard_id,
+                param=param,
+                connection=worker_connection,
+                controller_queue=controller_queue,
+                serving=serving
+            )
+
+            worker.start()
+
+            self.connections.append(connection)
+            self.locks.append(Lock())
+            self.workers.append(worker)
+
+        self.log("{} shard(s) started.".format(n_shards), level=1)
+
+    def get_shard(self, room_id):
+        return room_id % len(self.workers)
+
+    def call(self, room_id, command, *args):
+
+        shard_id = self.get_shard(room_id)
+
+        # the same pipe is used by server and controller threads
+        with self.locks[shard_id]:
+            self.connections[shard_id].send(Message(command, room_id, *args))
+            success, result = self.connections[shard_id].recv()
+
+        if not success:
+            raise ShardError("Shard {} failed to handle '{}': {}".format(shard_id, command, result))
+
+        return result
+
+    def call_many(self, calls):
+        """
+        'calls': list of (room_id, command, args).
+        Shards handle their calls in parallel: a call is sent to each shard
+        before their results are received, calls of a shard being handled in order.
+        Returns the results in the order of the calls, a 'ShardError' for calls that failed.
+        """
+
+        results = [None] * len(calls)
+
+        # key: shard_id, value: indexes of its calls
+        pending = {}
+
+        for i, (room_id, command, args) in enumerate(calls):
+            pending.setdefault(self.get_shard(room_id), []).append(i)
+
+        shard_ids = sorted(pending)
+
+        # locks are always taken in the same order
+        for shard_id in shard_ids:
+            self.locks[shard_id].acquire()
+
+        try:
+
+            while pending:
+
+                # one call at a time in each pipe, so that no pipe gets full
+                sent = [(shard_id, indexes.pop(0)) for shard_id, indexes in pending.items()]
+
+                for shard_id, i in sent:
+                    room_id, command, args = calls[i]
+                    self.connections[shard_id].send(Message(command, room_id, *args))
+
+                for shard_id, i in sent:
+
+                    success, result = self.connections[shard_id].recv()
+
+                    if success:
+                        results[i] = result
+                    else:
+                        results[i] = ShardError("Shard {} failed to handle '{}': {}".format(
+                            shard_id, calls[i][1], result))
+
+                pending = {shard_id: indexes for shard_id, indexes in pending.items() if indexes}
+
+        finally:
+            for shard_id in shard_ids:
+                self.locks[shard_id].release()
+
+        return results
+
+    def close(self):
+
+        for shard_id, worker in enumerate(self.workers):
+
+            if worker.is_alive():
+
+                with self.locks[shard_id]:
+                    self.connections[shard_id].send(Message("stop"))
+                    self.connections[shard_id].recv()
+
+            worker.join(timeout=1)
+
+
+class RemoteRoom(Logger):
+
+    """
+    Stand-in for a room hosted by a shard worker.
+    Running events are mirrored locally so that the controller
+    can check them without a round trip.
+    """
+
+    name = "RemoteRoom"
+
+    def __init__(self, pool, room_id):
+
+        self.pool = pool
+        self.room_id = room_id
+
+        self.running_game = Event()
+        self.continue_game = Event()
+
+        self.call("new_room")
+
+    @property
+    def label(self):
+        return "room {}".format(self.room_id)
+
+    def call(self, command, *args):
+        return self.pool.call(self.room_id, command, *args)
+
+    def launch(self):
+
+        self.continue_game.set()
+        self.running_game.set()
+        self.call("launch")
+
+    def stop(self):
+
+        self.continue_game.clear()
+        self.running_game.clear()
+        self.call("stop")
+
+    def stop_as_soon_as_possible(self):
+
+        self.continue_game.clear()
+        self.call("stop_as_soon_as_possible")
+
+    def new_game(self):
+
+        self.call("new_game")
+        self.continue_game.set()
+        self.running_game.set()
+
+    def load_game(self, file):
+
+        assignment, recovery = self.call("load_game", file)
+
+        if "error" not in recovery:
+            self.continue_game.set()
+            self.running_game.set()
+
+        return assignment, recovery
+
+    def set_assignment(self, assignment):
+        self.call("set_assignment", assignment)
+
+    def get_assignment(self):
+        return self.call("get_assignment")
+
+    def set_parametrization(self, param):
+        self.call("set_parametrization", param)
+
+    def set_params(self, params):
+        self.call("set_params", params)
+
+    def set_time_since_last_request(self, role, role_id, value):
+        self.call("set_time_since_last_request", role, role_id, value)
+
+    def stop_bots(self):
+        self.call("stop_bots")
+
+    def is_ended(self):
+        return self.call("is_ended")
+
+    def handle_request(self, request):
+        return self.call("handle_request", request)
+
+    def compute_figures(self):
+        self.call("compute_figures")
+
+    def get_current_data(self, known_versions=None):
+        return self.call("get_current_data", known_versions)
+
+    def get_lock_stats(self):
+        return self.call("get_lock_stats")
+
+    def get_backup_file(self):
+        return self.call("get_backup_file")
+
+    def close(self):
+        self.call("remove_room")
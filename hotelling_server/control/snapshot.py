@@ -0,0 +1,131 @@
+import pickle
+import struct
+import zlib
+
+from hotelling_server.control.history import HistoryStore
+
+
+class Snapshot:
+
+    """
+    File format of game snapshots:
+    a header (magic, schema version, compression, number of parts), then each part prefixed by its length.
+    The first part is the pickled state (protocol 5), the other ones are the buffers of NumPy arrays,
+    kept out of band so that they are neither copied into the pickle nor out of it at loading.
+    Parts are compressed with zlib if 'compression' is set.
+    Files without header are snapshots written by previous versions (schema version 0),
+    states of previous versions are brought up to date by 'migrate'.
+    """
+
+    magic = b"HOTSNAP"
+    version = 1
+
+    header = struct.Struct("<7sHBI")
+    part_header = struct.Struct("<Q")
+
+    compressions = {None: 0, "zlib": 1}
+
+    # raised by a truncated or corrupted snapshot
+    errors = (EOFError, ValueError, struct.error, zlib.error, pickle.UnpicklingError)
+
+    @staticmethod
+    def encode(state):
+        """returns the parts of the snapshot, arrays of 'state' must not change until they are written"""
+
+        buffers = []
+
+        blob = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+
+        return [blob] + [i.raw() for i in buffers]
+
+    @classmethod
+    def write(cls, file, parts, compression=None, level=1):
+
+        if compression is not None:
+            parts = [zlib.compress(i, level) for i in parts]
+
+        file.write(cls.header.pack(cls.magic, cls.version, cls.compressions[compression], len(parts)))
+
+        for part in parts:
+            file.write(cls.part_header.pack(len(part)))
+            file.write(part)
+
+    @classmethod
+    def read(cls, file):
+        """returns the state saved in 'file', up to date"""
+
+        content = bytearray(file.read())
+
+        if not content.startswith(cls.magic):
+            return cls.migrate(pickle.loads(content), version=0)
+
+        magic, version, compression, n_parts = cls.header.unpack_from(content)
+
+        view = memoryview(content)
+        offset = cls.header.size
+
+        parts = []
+
+        for _ in range(n_parts):
+
+            size, = cls.part_header.unpack_from(content, offset)
+            offset += cls.part_header.size
+
+            if offset + size > len(content):
+                raise EOFError("Snapshot is truncated.")
+
+            part = view[offset:offset + size]
+            offset += size
+
+            # buffers have to be writable, arrays are appended to when game goes on
+            parts.append(bytearray(zlib.decompress(part)) if compression else part)
+
+        state = pickle.loads(parts[0], buffers=parts[1:])
+
+        return cls.migrate(state, version=version)
+
+    @classmethod
+    def read_version(cls, file):
+        """schema version of snapshot 'file', read from its header only"""
+        return cls.read_info(file)[0]
+
+    @classmethod
+    def read_info(cls, file):
+        """schema version and compression of snapshot 'file', read from its header only"""
+
+        header = file.read(cls.header.size)
+
+        if header.startswith(cls.magic):
+            magic, version, compression, n_parts = cls.header.unpack(header)
+            return version, compression
+
+        # previous versions wrote a plain pickle, starting with its protocol
+        if header[:1] == pickle.PROTO:
+            return 0, 0
+
+        raise ValueError("Unknown file format.")
+
+    @classmethod
+    def migrate(cls, state, version):
+
+        if version > cls.version:
+            raise ValueError(
+                "Snapshot has schema version {}, this version only reads versions up to {}.".format(
+                    version, cls.version))
+
+        # 'migrate_<v>' brings a state of version v to version v + 1
+        for v in range(version, cls.version):
+            getattr(cls, "migrate_{}".format(v))(state)
+
+        return state
+
+    @staticmethod
+    def migrate_0(state):
+        """snapshots written as a plain pickle"""
+
+        # history was stored as lists before being stored in columns
+        if isinstance(state["history"], dict):
+            state["history"] = HistoryStore.from_lists(state["history"])
+
+        state.setdefault("journal_seq", 0)
+        state.setdefault("last_replies", {})
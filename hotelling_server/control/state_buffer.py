@@ -0,0 +1,221 @@
+import time
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+
+class StateBufferBusy(Exception):
+    pass
+
+
+class StateBuffer:
+
+    """
+    Numeric game state and statistics series of a room
+    published in a shared memory block.
+    Header is [sequence, t, statistics length, state written]:
+    sequence is odd while the writer updates the block (seqlock),
+    so readers work on views of the block and retry if it changed meanwhile.
+    """
+
+    firm_keys = (
+        "firm_positions", "firm_prices", "firm_profits",
+        "firm_cumulative_profits", "n_client"
+    )
+
+    customer_keys = (
+        "customer_firm_choices", "customer_extra_view_choices",
+        "customer_utility", "customer_cumulative_utility"
+    )
+
+    two_lines_keys = ("firm_distance", "firm_profits")
+    one_line_keys = ("customer_mean_extra_view_choices", "customer_mean_utility")
+
+    header_size = 4
+
+    # a write takes a few microseconds, a block that stays busy longer
+    # belongs to a writer that stopped in the middle of a write
+    max_retries = 100
+    retry_delay = 0.001
+
+    def __init__(self, n_firms, n_customers, capacity, name=None):
+
+        self.n_firms = n_firms
+        self.n_customers = n_customers
+        self.capacity = capacity
+
+        # the process creating the block is the writer and owns it
+        self.owner = name is None
+
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.size)
+
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # only the owner may unlink the block
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        self.header = None
+        self.state = None
+        self.statistics = None
+
+        # number of statistics points already written
+        self.n_written = 0
+
+        self._map()
+
+    @property
+    def size(self):
+
+        n_int = self.header_size + len(self.firm_keys) * self.n_firms + len(self.customer_keys) * self.n_customers
+        n_float = (2 * len(self.two_lines_keys) + len(self.one_line_keys)) * self.capacity
+
+        return 8 * (n_int + n_float)
+
+    @property
+    def descriptor(self):
+        """what a reader needs in order to attach"""
+
+        return {
+            "name": self.shm.name,
+            "n_firms": self.n_firms,
+            "n_customers": self.n_customers,
+            "capacity": self.capacity
+        }
+
+    @classmethod
+    def attach(cls, descriptor):
+        return cls(**descriptor)
+
+    def _map(self):
+
+        buffer = self.shm.buf
+        offset = 0
+
+        def view(shape, dtype):
+
+            nonlocal offset
+
+            array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            offset += array.nbytes
+
+            return array
+
+        self.header = view((self.header_size, ), np.int64)
+
+        self.state = {}
+
+        for key in self.firm_keys:
+            self.state[key] = view((self.n_firms, ), np.int64)
+
+        for key in self.customer_keys:
+            self.state[key] = view((self.n_customers, ), np.int64)
+
+        self.statistics = {}
+
+        for key in self.two_lines_keys:
+            self.statistics[key] = view((2, self.capacity), np.float64)
+
+        for key in self.one_line_keys:
+            self.statistics[key] = view((self.capacity, ), np.float64)
+
+    # ------------------------------ Writer -------------------------------------------------------- #
+
+    def write(self, current_state, t, statistics):
+        """called by the room owning the block, under its lock"""
+
+        self.header[0] += 1
+
+        written = True
+
+        for key, array in self.state.items():
+
+            # entries are empty before the game starts
+            if len(current_state[key]) == len(array):
+                array[:] = current_state[key]
+            else:
+                written = False
+
+        self.header[1] = t
+        self.header[2] = self._write_statistics(statistics)
+        self.header[3] = written
+
+        self.header[0] += 1
+
+    def _write_statistics(self, statistics):
+
+        if not statistics:
+            return 0
+
+        length = min(
+            [len(statistics[key][0]) for key in self.two_lines_keys] +
+            [len(statistics[key]) for key in self.one_line_keys])
+
+        # series are append only, so only new points are written
+        if length < self.n_written:
+            self.n_written = 0
+
+        start = self.n_written
+
+        for key in self.two_lines_keys:
+            for i in range(2):
+                self.statistics[key][i, start:length] = statistics[key][i][start:length]
+
+        for key in self.one_line_keys:
+            self.statistics[key][start:length] = statistics[key][start:length]
+
+        self.n_written = length
+
+        return length
+
+    # ------------------------------ Reader -------------------------------------------------------- #
+
+    def read(self, func):
+        """
+        call 'func' with views of the block until it was not modified meanwhile,
+        raises 'StateBufferBusy' if it was modified by each of 'max_retries' attempts
+        """
+
+        for i in range(self.max_retries):
+
+            sequence = self.header[0]
+
+            if not sequence % 2:
+
+                result = func(self.get_views())
+
+                if self.header[0] == sequence:
+                    return result
+
+            # let the writer finish
+            time.sleep(self.retry_delay)
+
+        raise StateBufferBusy("State buffer '{}' was being written during {} attempts to read it.".format(
+            self.shm.name, self.max_retries))
+
+    def get_views(self):
+
+        length = self.header[2]
+
+        return {
+            "state": self.state if self.header[3] else {k: [] for k in self.state},
+            "t": int(self.header[1]),
+            "statistics": {k: v[..., :length] for k, v in self.statistics.items()}
+        }
+
+    def close(self):
+
+        # views have to be released before the block is closed
+        self.header = None
+        self.state = None
+        self.statistics = None
+
+        try:
+            self.shm.close()
+
+        except BufferError:
+            # a view is still referenced by a reader (e.g. returned by 'func' in 'read'),
+            # the block is unmapped once it is garbage collected
+            pass
+
+        if self.owner:
+            self.shm.unlink()
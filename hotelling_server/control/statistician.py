@@ -14,6 +14,9 @@ class Statistician(Logger):
         self.mean_extra_view_choices = []
         self.mean_utility = []
 
+        # increased each time series are extended
+        self.version = 0
+
     def compute_distance(self):
 
         pos = self.controller.data.current_state["firm_positions"]
@@ -22,6 +25,7 @@ class Statistician(Logger):
             self.pos[i].append(pos[i])
 
         self.data["firm_distance"] = self.pos
+        self.version += 1
 
     def compute_mean_extra_view_choices(self):
 
@@ -30,6 +34,7 @@ class Statistician(Logger):
         self.mean_extra_view_choices.append(mean)
 
         self.data["customer_mean_extra_view_choices"] = self.mean_extra_view_choices
+        self.version += 1
 
     def compute_cumulative_profits(self):
 
@@ -39,6 +44,7 @@ class Statistician(Logger):
             self.cumulative_profits[i].append(profits[i])
 
         self.data["firm_cumulative_profits"] = self.cumulative_profits
+        self.version += 1
 
     def compute_profits(self):
 
@@ -48,6 +54,7 @@ class Statistician(Logger):
             self.profits[i].append(profits[i])
 
         self.data["firm_profits"] = self.profits
+        self.version += 1
 
     def compute_mean_utility(self):
 
@@ -56,3 +63,4 @@ class Statistician(Logger):
         self.mean_utility.append(mean)
 
         self.data["customer_mean_utility"] = self.mean_utility
+        self.version += 1
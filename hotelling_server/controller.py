@@ -1,59 +1,125 @@
+import time
 from multiprocessing import Queue, Event
+from queue import Empty
 from threading import Thread
 
 from utils.utils import Logger
-from hotelling_server.control import backup, data, game, statistician, \
-    time_manager, initialization, php_server
+from utils.message_bus import Message, CommandRegistry
+from utils.watchdog import Watchdog
+from hotelling_server.control import php_server, session_manager, backup, matchmaker, housekeeper, data
+from hotelling_server.parameters.config_service import ConfigService
 
 
 class Controller(Thread, Logger):
 
     name = "Controller"
 
-    def __init__(self, model):
+    # Commands that can be sent through 'queue'
+    commands = (
+        "ask_interface",
+        "server_error",
+        "server_update_client_time_on_interface",
+        "server_new_message",
+        "server_update_assignment_frame",
+        "ui_set_server_parameters",
+        "ui_set_assignment",
+        "ui_set_parametrization",
+        "ui_load_game",
+        "ui_recover_last_game",
+        "ui_stop_game",
+        "ui_force_to_stop_game",
+        "ui_close_window",
+        "ui_retry_server",
+        "ui_write_parameters",
+        "ui_update_game_view_data",
+        "ui_stop_bots",
+        "ui_stop_server",
+        "ui_look_for_alive_players",
+        "ui_new_message",
+        "ui_php_run_game",
+        "ui_php_scan_button",
+        "ui_php_erase_sql_tables",
+        "ui_php_set_missing_players",
+        "ui_ask_dispatch_stats",
+        "ui_new_room",
+        "ui_set_current_room",
+        "ui_send_go_signal",
+        "ui_reboot",
+        "time_manager_stop_game",
+        "time_manager_compute_figures"
+    )
+
+    def __init__(self, graphic_queue, communicate, queue=None):
 
         super().__init__()
 
-        self.mod = model
-
         # For receiving inputs
-        self.queue = Queue()
+        self.queue = queue if queue is not None else Queue()
+        self.registry = CommandRegistry(owner=self, commands=self.commands)
 
-        self.running_game = Event()
         self.running_server = Event()
 
         self.shutdown = Event()
         self.fatal_error = Event()
-        self.continue_game = Event()
         self.device_scanning_event = Event()
 
-        self.data = data.Data(controller=self)
-        self.time_manager = time_manager.TimeManager(controller=self)
-        self.backup = backup.Backup(controller=self)
-        self.statistician = statistician.Statistician(controller=self)
-        self.game = game.Game(controller=self)
-        self.init = initialization.Init(controller=self)
+        # Rooms hosted by this server, interface displays the current one
+        self.sessions = session_manager.SessionManager(controller=self)
+
+        # parameters changed on disk or written by interface are used by every room
+        for key in data.Data.keys:
+            ConfigService.add_listener(key, self.parameters_changed)
+
+        # time of the last check of parameters files
+        self.parameters_checked_at = time.time()
+
+        # rooms, server and bots threads send heartbeats to it
+        self.watchdog = Watchdog(
+            interval=self.sessions.param["engine"]["watchdog_interval"],
+            timeout=self.sessions.param["engine"]["watchdog_timeout"],
+            alert=lambda msg: self.ask_interface("show_warning", msg)
+        )
+
+        self.room = self.sessions.new_room()
+
+        # versions of the state and statistics of the displayed room known by interface
+        self.displayed_versions = None
 
         self.server = php_server.PHPServer(controller=self)
         # To give signals to server
         self.server_queue = self.server.main_queue
 
+        # launch games from the waiting list without interface steps
+        self.matchmaker = matchmaker.Matchmaker(controller=self)
+
+        # compress and remove old games of save folder
+        self.housekeeper = housekeeper.Housekeeper(controller=self)
+
         # For giving instructions to graphic process
-        self.graphic_queue = self.mod.ui.queue
-        self.communicate = self.mod.ui.communicate
+        # ('communicate' is None if interface runs in another process)
+        self.graphic_queue = graphic_queue
+        self.communicate = communicate
 
     def run(self):
 
+        self.watchdog.watch_queue("controller", self.queue)
+        self.watchdog.watch_queue("graphic", self.graphic_queue)
+        self.watchdog.watch_queue("server", self.server_queue)
+        self.watchdog.watch_queue("server_side", self.server.side_queue)
+        self.watchdog.start()
+        self.housekeeper.start()
+
         self.log("Waiting for a message.")
         go_signal_from_ui = self.queue.get()
         self.log("Got go signal from UI: '{}'.".format(go_signal_from_ui))
 
         # Send previous params to UI
-        self.ask_interface("set_previous_parameters", self.data.param)
+        self.ask_interface("set_previous_parameters", self.sessions.param)
 
         # Prepares ui frames
         self.ask_interface("prepare_frames")
         self.ask_interface("prepare_window")
+        self.ask_interface("set_rooms_game_frame", (self.sessions.get_room_ids(), self.room.room_id))
 
         self.ask_interface("show_frame_setting_up")
 
@@ -62,34 +128,67 @@ class Controller(Thread, Logger):
 
         while not self.shutdown.is_set():
 
-            self.log("Waiting for a message.")
-            message = self.queue.get()
+            self.watchdog.beat(self.name)
+
+            # files edited by hand are reloaded, whether messages are received or not
+            self.check_parameters()
+
+            # wake up regularly in order to send heartbeats and check parameters
+            try:
+                message = self.queue.get(
+                    timeout=min(self.watchdog.interval, self.sessions.param["engine"]["parameters_check_interval"]))
+
+            except Empty:
+                continue
+
             self.handle_message(message)
 
+        self.watchdog.stop()
+
         self.close_program()
 
-    def launch_game(self):
+    def launch_game(self, room):
 
-        self.ask_interface("show_frame_setting_up")
+        if room is self.room:
+            self.ask_interface("show_frame_setting_up")
 
         self.fatal_error.clear()
-        self.continue_game.set()
-        self.running_game.set()
         self.server.running_game.set()
-        self.ask_interface("show_frame_game")
-        self.log("Game launched.", level=1)
 
-    def stop_game_first_phase(self):
+        if room is self.room:
+            self.displayed_versions = None
+            self.ask_interface("show_frame_game")
+
+        self.log("Game launched in {}.".format(room.label), level=1)
+
+    def stop_game_first_phase(self, room):
+
+        self.log("Received stop task for {}".format(room.label))
+        room.stop_as_soon_as_possible()
+
+    def stop_game_second_phase(self, room):
+
+        room.stop()
+
+        # parameters that changed during the game are used by the next one
+        room.set_params(self.sessions.param)
+
+        # server keeps on serving game requests as long as a room is running
+        if not self.sessions.get_running_rooms():
+            self.server.running_game.clear()
 
-        self.log("Received stop task")
-        self.continue_game.clear()
-        self.time_manager.stop_as_soon_as_possible()
+        self.reclaim_room(room)
 
-    def stop_game_second_phase(self):
+    def reclaim_room(self, room):
+        """remove a room that is neither the default one, nor displayed, nor running, once it played a game"""
 
-        self.continue_game.clear()
-        self.running_game.clear()
-        self.server.running_game.clear()
+        if room is self.room or room.room_id == self.sessions.default_room_id or room.running_game.is_set() \
+                or room.get_backup_file() is None:
+            return
+
+        self.sessions.remove_room(room.room_id)
+
+        self.ask_interface("set_rooms_game_frame", (self.sessions.get_room_ids(), self.room.room_id))
 
     def close_program(self):
 
@@ -97,7 +196,9 @@ class Controller(Thread, Logger):
 
         self.server_queue.put(("Abort",))
         self.stop_server()
+        self.sessions.set_serving(False)
         self.server.end()
+        self.sessions.close()
 
         self.shutdown.set()
 
@@ -106,19 +207,22 @@ class Controller(Thread, Logger):
         if not self.fatal_error.is_set():
 
             self.fatal_error.set()
-            self.running_game.clear()
-            self.continue_game.clear()
+            self.room.stop()
 
             self.ask_interface("fatal_error_of_communication")
 
     def ask_interface(self, instruction, arg=None):
 
         if arg is not None:
-            self.graphic_queue.put((instruction, arg))
+            self.graphic_queue.put(Message(instruction, arg))
         else:
-            self.graphic_queue.put((instruction, ))
+            self.graphic_queue.put(Message(instruction))
 
-        self.communicate.signal.emit()
+        if self.communicate is not None:
+            self.communicate.signal.emit()
+
+    def is_serving(self):
+        return self.server.is_alive() and not self.server.shutdown_event.is_set()
 
     def stop_server(self):
 
@@ -130,6 +234,10 @@ class Controller(Thread, Logger):
         if not self.running_server.is_set():
             self.server.start()
             self.server_queue.put(("serve", ))
+            self.matchmaker.start()
+
+            # bots of rooms hosted by shards see the server as local ones do (see 'is_serving')
+            self.sessions.set_serving(True)
 
         self.running_server.set()
         self.log("Server running.", level=1)
@@ -148,14 +256,7 @@ class Controller(Thread, Logger):
 
     def handle_message(self, message):
 
-        command = message[0]
-        args = message[1:]
-        func = getattr(self, command)
-
-        if args:
-            func(*args)
-        else:
-            func()
+        self.registry.dispatch(message)
 
     # ------------------------------ Server interface ----------------------------------------#
 
@@ -164,21 +265,41 @@ class Controller(Thread, Logger):
         self.log("Server error.", level=3)
         self.ask_interface("server_error", error_message)
 
-    def server_request(self, server_data):
+    def serve_requests(self, requests):
+        """
+        Fast path called directly by the server thread:
+        each request is routed to its room and handled under the room data lock,
+        replies are returned to the caller in the order of requests.
+        Requests of rooms hosted by different shards are handled in parallel.
+        """
 
-        # When game is launched
-        if "ask_init" in server_data:
-            response = self.init.ask_init(server_data)
-            self.server_queue.put((response[0], response[1]))
+        routed = [self.sessions.route(i) for i in requests]
 
-        # init admin
-        elif "ask_admin_init" in server_data:
-            response = self.init.ask_admin_init()
-            self.server_queue.put((response[0], response[1]))
+        replies = iter(self.sessions.handle_requests([(r, request) for r, request in routed if r is not None]))
 
-        else:
-            response = self.game.handle_request(server_data)
-            self.server_queue.put((response[0], response[1]))
+        responses = []
+
+        for server_data, (room, request) in zip(requests, routed):
+
+            if room is None:
+                self.log("Request '{}' concerns an unknown room.".format(server_data), level=2)
+                responses.append(("error", "unknown_room"))
+                continue
+
+            response = next(replies)
+
+            if isinstance(response, Exception):
+                self.log("Request '{}' could not be handled: {}".format(server_data, response), level=3)
+                responses.append(("error", "room_error"))
+                continue
+
+            if response[0] == "reply":
+                response[1]["room_id"] = room.room_id
+                response[1]["game_id"] = self.sessions.get_client_id(room.room_id, response[1]["game_id"])
+
+            responses.append(response)
+
+        return responses
 
     def server_update_client_time_on_interface(self, args):
         """
@@ -186,8 +307,7 @@ class Controller(Thread, Logger):
         param 1: role_id
         param 2: time since last request
         """
-        self.data.current_state["time_since_last_request_{}s".format(
-            args[0])][args[1]] = str(args[2])
+        self.room.set_time_since_last_request(role=args[0], role_id=args[1], value=str(args[2]))
 
     def server_new_message(self, user_name, message):
 
@@ -196,15 +316,37 @@ class Controller(Thread, Logger):
 
     def server_update_assignment_frame(self, waiting_list):
 
-        n_player = self.data.param["game"]["n_customers"] + self.data.param["game"]["n_firms"]
+        if self.matchmaker.is_enabled():
 
-        if len(waiting_list) <= n_player:
-            participants = waiting_list
-        else:
-            participants = waiting_list[:n_player]
+            n_free_rooms = self.sessions.param["matchmaking"]["max_rooms"] - len(self.sessions.get_running_rooms())
+
+            for assignment in self.matchmaker.match(waiting_list, n_free_rooms):
+                self.launch_matched_game(assignment)
+
+        # assignment frame only displays players that are not playing yet
+        participants = self.matchmaker.get_unmatched(waiting_list)[:self.matchmaker.n_player]
 
         self.ask_interface("update_waiting_list_assignment_frame", participants)
 
+    # ------------------------------ Rooms management ----------------------------------------#
+
+    def set_current_room(self, room):
+
+        previous, self.room = self.room, room
+
+        # a room whose game ended is kept as long as it is displayed
+        self.reclaim_room(previous)
+        self.displayed_versions = None
+
+        self.ask_interface("set_rooms_game_frame", (self.sessions.get_room_ids(), room.room_id))
+
+        if room.running_game.is_set():
+            self.ask_interface("set_assignment_game_frame", room.get_assignment())
+            self.ask_interface("show_frame_game")
+
+        else:
+            self.ask_interface("show_frame_start")
+
     # ------------------------------ UI interface  -------------------------------------------#
 
     def ui_set_server_parameters(self, param):
@@ -218,37 +360,58 @@ class Controller(Thread, Logger):
 
     def ui_set_assignment(self, assignment):
         self.log("Setting game assignement from interface: {}".format(assignment))
-        self.data.set_assignment(assignment)
-        self.init.set_assignment(assignment)
-        self.data.write_param("assignment_php", self.data.assignment)
+        self.room.set_assignment(assignment)
+        backup.Backup.write_param("assignment_php", assignment)
         self.ask_interface("set_assignment_game_frame", assignment)
 
     def ui_set_parametrization(self, param):
         self.log("Setting parametrization from interface : {}".format(param), level=1)
-        self.data.set_parametrization(param)
-        self.data.condition = param["condition"]
+        self.room.set_parametrization(param)
 
     def ui_load_game(self, file):
         self.log("UI ask 'load game'.")
-        self.data.load(file)
 
-        # set assignment for interface (display game_view) and init
-        assignment = self.data.assignment
-        self.data.set_assignment(assignment)
-        self.init.set_assignment(assignment)
+        # the game is not compressed or removed while it is loaded
+        if not self.sessions.start_loading(file):
+            self.ask_interface("show_warning", "Game is being compressed, please try again in a moment.")
+            return
+
+        try:
+            assignment, recovery = self.room.load_game(file)
+
+        finally:
+            self.sessions.end_loading(file)
+
+        if "error" in recovery:
+            self.log("Game '{}' is not loaded: {}".format(file, recovery["error"]), level=3)
+            self.ask_interface("error_loading_session", recovery["error"])
+            return
+
+        # set assignment for interface (display game_view)
         self.ask_interface("set_assignment_game_frame", assignment)
+        self.launch_game(self.room)
+
+        self.ask_interface("show_info", "Game recovered at turn {} in {:.3f} s ({} journal record(s) replayed).".format(
+            recovery["t"], recovery["time"], recovery["journal_records"]))
+
+    def ui_recover_last_game(self):
+        self.log("UI ask 'recover last game'.")
+
+        file = backup.Backup.get_latest_file(self.sessions.param["folders"]["save"])
+
+        if file is None:
+            self.ask_interface("show_warning", "No game to recover!")
 
-        self.time_manager.setup()
-        self.launch_game()
-        self.game.load()
+        else:
+            self.ui_load_game(file)
 
     def ui_stop_game(self):
         self.log("UI ask 'stop game'.")
-        self.stop_game_first_phase()
+        self.stop_game_first_phase(self.room)
 
     def ui_force_to_stop_game(self):
         self.log("UI asks 'force to stop game'.")
-        self.stop_game_second_phase()
+        self.stop_game_second_phase(self.room)
 
     def ui_close_window(self):
         self.log("UI ask 'close window'.")
@@ -258,43 +421,146 @@ class Controller(Thread, Logger):
         self.log("UI ask 'retry server'.")
         self.server_queue.put(("game",))
 
-    def ui_write_parameters(self, key, value):
+    def ui_write_parameters(self, params):
         self.log("UI ask 'write parameters'.")
-        self.data.write_param(key, value)
+        backup.Backup.write_params(params)
         self.log("Write interface parameters to json files.")
 
+    def check_parameters(self):
+
+        now = time.time()
+
+        if now - self.parameters_checked_at >= self.sessions.param["engine"]["parameters_check_interval"]:
+            self.parameters_checked_at = now
+            ConfigService.check()
+
+    def parameters_changed(self, key, value):
+        self.log("Parameters '{}' changed.".format(key), level=1)
+        self.sessions.param[key] = value
+
+        # a running game keeps its parameters until it stops
+        for room in self.sessions.get_stopped_rooms():
+            room.set_params({key: value})
+
     def ui_update_game_view_data(self):
         """
         update figures and tables
         on game view.
-        does it only when game is running
+        does it only when game is running,
+        and only for parts whose version changed
         """
 
-        if self.running_game.is_set():
+        # interface asks for it every second, so it is a heartbeat of its event loop
+        self.watchdog.beat("UI")
+
+        if self.room.running_game.is_set():
             self.log("UI asks 'update data'.")
-            self.ask_interface("update_tables", self.get_current_data())
-            self.ask_interface("update_figures", self.get_current_data())
+
+            current_data = self.room.get_current_data(known_versions=self.displayed_versions)
+
+            # nothing changed since last update
+            if current_data is None:
+                return
+
+            version, statistics_version = current_data["versions"]
+
+            if self.displayed_versions is None or version != self.displayed_versions[0]:
+                self.ask_interface("update_tables", current_data)
+
+            if self.displayed_versions is None or statistics_version != self.displayed_versions[1]:
+                self.ask_interface("update_figures", current_data)
+
+            self.displayed_versions = current_data["versions"]
+
+    def ui_ask_dispatch_stats(self):
+        self.log("UI asks 'dispatch stats'.")
+        self.ask_interface("update_dispatch_stats", {
+            "commands": {self.name: self.registry.get_stats()},
+            "locks": self.sessions.get_lock_stats()
+        })
+
+    def launch_matched_game(self, assignment):
+
+        room = self.sessions.new_room()
+
+        self.log("Matchmaker launches a game in {}: {}".format(room.label, assignment), level=1)
+
+        room.set_assignment(assignment)
+        room.set_parametrization(self.sessions.param["parametrization"])
+
+        self.authorize_participants(room)
+
+        room.new_game()
+        self.launch_game(room)
+
+        self.ask_interface("set_rooms_game_frame", (self.sessions.get_room_ids(), self.room.room_id))
+
+    def authorize_participants(self, room):
+
+        assignment = sorted(room.get_assignment().items())
+
+        # ---------- get roles, participants, and game_ids in assignment ------- #
+        roles = [player["role"] for i, player in assignment if player["bot"] is False]
+        participants = [player["name"] for i, player in assignment if player["bot"] is False]
+        game_ids = [i for i, player in assignment if player["bot"] is False]
+        # --------------------------------------------------- #
+
+        # game ids are unique among rooms, requests are routed from them
+        game_ids = self.sessions.register(room.room_id, game_ids)
+
+        self.server.side_queue.put(("authorize_participants", participants, roles, game_ids, room.room_id))
+
+        return participants
+
+    def ui_new_room(self):
+        self.log("UI asks 'new room'.")
+        self.set_current_room(self.sessions.new_room())
+
+    def ui_set_current_room(self, room_id):
+
+        self.log("UI asks 'set current room' {}.".format(room_id))
+
+        room = self.sessions.get(room_id)
+
+        if room is not None and room is not self.room:
+            self.set_current_room(room)
 
     def ui_stop_bots(self):
         self.log("UI ask 'stop bots'.")
-        self.game.stop_bots()
+        self.room.stop_bots()
 
     def ui_stop_server(self):
         self.log("UI asks 'stop server'.")
         self.stop_server()
 
+    def ui_send_go_signal(self):
+        # the first go signal is consumed by 'run', later ones (e.g. interface set up again) change nothing
+        self.log("UI sends go signal again.")
+
+    def ui_reboot(self):
+
+        self.log("UI asks 'reboot'.")
+
+        self.stop_server()
+
+        if self.running_server.is_set():
+            self.server_queue.put(("serve", ))
+
     def ui_look_for_alive_players(self):
 
         self.log("UI asks 'look for alive players'.")
 
-        if self.game.is_ended():
+        if self.room.is_ended():
 
             # display start frame
             self.ask_interface("show_frame_start")
 
             # stop bots
-            self.game.stop_bots()
-            self.erase_tables()
+            self.room.stop_bots()
+
+            # tables are shared by all rooms
+            if not self.sessions.get_running_rooms():
+                self.erase_tables()
 
         else:
 
@@ -307,26 +573,20 @@ class Controller(Thread, Logger):
 
     def ui_php_run_game(self):
 
-        assignment = sorted(self.data.assignment.items())
-
-        # ---------- get roles, participants, and game_ids in assignment ------- #
-        roles = [player["role"] for i, player in assignment if player["bot"] is False]
-        participants = [player["name"] for i, player in assignment if player["bot"] is False]
-        game_ids = [i for i, player in assignment if player["bot"] is False]
-        # --------------------------------------------------- #
-
         # --------- Authorize participants to run game ------ #
-        self.server.side_queue.put(("authorize_participants", participants, roles, game_ids))
+        participants = self.authorize_participants(self.room)
+
+        # so that the matchmaker does not put them in another room
+        self.matchmaker.reserve(participants)
         # --------------------------------------------------- #
 
         self.ask_interface("show_frame_game")
 
         # ------- Run game -----------------------------------#
         self.log("UI ask 'run game'.")
-        self.data.new()
-        self.time_manager.setup()
-        self.launch_game()
-        self.game.new()
+
+        self.room.new_game()
+        self.launch_game(self.room)
         # --------------------------------------------------- #
 
     def ui_php_scan_button(self):
@@ -335,7 +595,10 @@ class Controller(Thread, Logger):
 
     def ui_php_erase_sql_tables(self, tables):
 
-        if self.running_server.is_set():
+        if any(r is not self.room for r in self.sessions.get_running_rooms()):
+            self.ask_interface("show_warning", "Tables are not erased as games are running in other rooms!")
+
+        elif self.running_server.is_set():
             self.server.side_queue.put(("erase_sql_tables", tables))
 
         else:
@@ -349,37 +612,22 @@ class Controller(Thread, Logger):
 
     # ------------------------------ Time Manager interface ------------------------------------ #
 
-    def time_manager_stop_game(self):
-        self.log("'TimeManager' asks 'stop game'.")
-        self.stop_game_second_phase()
+    def time_manager_stop_game(self, room_id):
+        self.log("'TimeManager' of room {} asks 'stop game'.".format(room_id))
 
-    def time_manager_compute_figures(self):
+        # room can be removed before its last messages are handled
+        if self.sessions.get(room_id) is not None:
+            self.stop_game_second_phase(self.sessions.get(room_id))
 
-        self.log("'TimeManager' asks 'compute_figures'")
+    def time_manager_compute_figures(self, room_id):
 
-        # Needs to be moved elsewhere?
-        self.statistician.compute_distance()
-        self.statistician.compute_mean_extra_view_choices()
-        self.statistician.compute_profits()
-        self.statistician.compute_mean_utility()
+        self.log("'TimeManager' of room {} asks 'compute_figures'".format(room_id))
 
-    # ---------------------- Parameters management -------------------------------------------- #
+        if self.sessions.get(room_id) is not None:
+            self.sessions.get(room_id).compute_figures()
 
-    def get_current_data(self):
-
-        return {
-            "current_state": self.data.current_state,
-            "bot_firms_id": self.data.bot_firms_id,
-            "firms_id": self.data.firms_id,
-            "bot_customers_id": self.data.bot_customers_id,
-            "customers_id": self.data.customers_id,
-            "roles": self.data.roles,
-            "time_manager_t": self.data.controller.time_manager.t,
-            "statistics": self.statistician.data,
-            "map_server_id_game_id": self.data.map_server_id_game_id,
-            "assignment": self.data.assignment
-        }
+    # ---------------------- Parameters management -------------------------------------------- #
 
     def get_parameters(self, key):
 
-        return self.data.param[key]
+        return self.sessions.param[key]
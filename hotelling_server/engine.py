@@ -0,0 +1,131 @@
+import secrets
+from multiprocessing import Process, Queue
+from multiprocessing.managers import BaseManager
+from threading import Thread
+
+from utils.utils import Logger
+from hotelling_server.parameters.config_service import ConfigService
+from . import controller
+
+
+class AuthkeyError(Exception):
+    pass
+
+
+class EngineManager(BaseManager):
+    """Expose engine queues to an interface started separately"""
+    pass
+
+
+class Engine(Process, Logger):
+
+    """
+    Run the controller (game engine and server transport)
+    in its own process, without interface.
+    The interface attaches through 'controller_queue' (instructions to controller)
+    and 'graphic_queue' (instructions from controller).
+    If an address is given, queues are also served on it
+    so that an interface can attach from another program.
+    """
+
+    name = "Engine"
+
+    def __init__(self, controller_queue, graphic_queue, address=None, authkey=None):
+
+        super().__init__()
+
+        self.controller_queue = controller_queue
+        self.graphic_queue = graphic_queue
+
+        self.address = address
+        self.authkey = authkey
+
+    def run(self):
+
+        cont = controller.Controller(
+            graphic_queue=self.graphic_queue,
+            communicate=None,
+            queue=self.controller_queue
+        )
+
+        if self.address is not None:
+            self.serve_queues()
+
+        self.log("Engine is running.", level=1)
+
+        cont.start()
+        cont.join()
+
+        self.log("Engine is dead.", level=1)
+
+    def serve_queues(self):
+
+        EngineManager.register("get_controller_queue", callable=lambda: self.controller_queue)
+        EngineManager.register("get_graphic_queue", callable=lambda: self.graphic_queue)
+
+        server = EngineManager(address=self.address, authkey=self.authkey).get_server()
+
+        Thread(target=server.serve_forever, daemon=True).start()
+
+        self.log("Engine queues are served on {}.".format(self.address), level=1)
+
+    @staticmethod
+    def attach(address, authkey):
+        """returns controller queue and graphic queue of an engine serving them on 'address'"""
+
+        EngineManager.register("get_controller_queue")
+        EngineManager.register("get_graphic_queue")
+
+        manager = EngineManager(address=address, authkey=authkey)
+        manager.connect()
+
+        return manager.get_controller_queue(), manager.get_graphic_queue()
+
+
+def get_engine_parameters():
+    return ConfigService.get("engine")
+
+
+# key shipped with every install by previous versions, it is not accepted
+former_default_authkey = "duopoly"
+
+
+def get_authkey(generate=False):
+    """
+    key of the engine queues ('authkey' in engine parameters).
+    If none is set, the engine generates one ('generate') and saves it,
+    an interface refuses to attach as it can not guess it.
+    """
+
+    param = get_engine_parameters()
+
+    authkey = param["authkey"]
+
+    if authkey in ("", former_default_authkey):
+
+        if not generate:
+            raise AuthkeyError(
+                "No 'authkey' is set in engine parameters: "
+                "set it to the key of the engine (written in its engine parameters at its first run).")
+
+        authkey = secrets.token_hex(16)
+        ConfigService.write("engine", dict(param, authkey=authkey))
+
+        Engine.log("A new authkey was generated and saved in engine parameters.", level=1)
+
+    return authkey.encode()
+
+
+def run_headless():
+    """run engine in this process and wait for an interface to attach"""
+
+    authkey = get_authkey(generate=True)
+
+    param = get_engine_parameters()
+
+    Engine(
+        controller_queue=Queue(),
+        graphic_queue=Queue(),
+        address=(param["address"], param["port"]),
+        authkey=authkey
+    ).run()
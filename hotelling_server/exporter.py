@@ -0,0 +1,216 @@
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+from os import path
+
+import numpy as np
+
+from utils.utils import Logger
+from hotelling_server.control.backup import Backup
+from hotelling_server.parameters.config_service import ConfigService
+
+
+class Exporter(Logger):
+
+    """
+    Export every game of the save folder as tables:
+    '<session>_firms.csv' (one row per firm and turn), '<session>_customers.csv'
+    (one row per customer and turn) and '<session>.npz' (numeric history columns,
+    string columns as codes with their '<entry>_categories').
+    Games are loaded in a pool of processes. 'manifest.json' of the output folder gives
+    the hash of the files of each exported game, so that a game is exported again
+    only if it changed since (an interrupted export goes on where it stopped).
+    """
+
+    name = "Exporter"
+
+    manifest_file = "manifest.json"
+
+    firms_header = (
+        "session", "t", "firm_id", "status", "position", "price", "profits", "cumulative_profits", "n_client"
+    )
+
+    customers_header = (
+        "session", "t", "customer_id", "firm_choice", "extra_view", "utility"
+    )
+
+    def __init__(self, folder, output, n_workers=None, force=False):
+
+        self.folder = path.expanduser(folder)
+        self.output = path.expanduser(output)
+        self.n_workers = n_workers
+        self.force = force
+
+        os.makedirs(self.output, exist_ok=True)
+
+        self.manifest = {} if force else self.read_manifest()
+
+    def read_manifest(self):
+
+        file = path.join(self.output, self.manifest_file)
+
+        if path.exists(file):
+            with open(file) as f:
+                return json.load(f)
+
+        return {}
+
+    def write_manifest(self):
+
+        file = path.join(self.output, self.manifest_file)
+
+        with open("{}.tmp".format(file), "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+        os.replace("{}.tmp".format(file), file)
+
+    def run(self):
+
+        files = sorted(glob(path.join(self.folder, "xp_*.p")))
+
+        self.log("{} game(s) found in '{}'.".format(len(files), self.folder), level=1)
+
+        counts = {"exported": 0, "skipped": 0, "error": 0}
+
+        with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+
+            futures = {
+                executor.submit(
+                    self.export_session, file, self.output, self.manifest.get(self.get_session(file), {}).get("hash")
+                ): file for file in files
+            }
+
+            for future in as_completed(futures):
+
+                file = futures[future]
+
+                try:
+                    result = future.result()
+
+                except Exception as e:
+                    self.log("Game '{}' could not be exported: {}".format(file, e), level=3)
+                    counts["error"] += 1
+                    continue
+
+                counts[result["status"]] += 1
+
+                if result["status"] == "exported":
+
+                    self.manifest[result["session"]] = {
+                        "file": file, "hash": result["hash"], "n_turns": result["n_turns"]
+                    }
+
+                    # written after each game so that an interrupted export can be resumed
+                    self.write_manifest()
+
+        self.log("{exported} game(s) exported, {skipped} unchanged, {error} error(s).".format(**counts), level=1)
+
+        return counts
+
+    @staticmethod
+    def get_session(file):
+        return path.basename(path.splitext(file)[0])
+
+    @classmethod
+    def export_session(cls, file, output, known_hash=None):
+        """run in a worker process"""
+
+        session = cls.get_session(file)
+        file_hash = Backup.get_hash(file)
+
+        if file_hash == known_hash:
+            return {"session": session, "status": "skipped"}
+
+        history = Backup.read_session(file)["history"]
+
+        cls.write_csv(
+            path.join(output, "{}_firms.csv".format(session)), cls.firms_header, cls.get_firms_rows(session, history)
+        )
+
+        cls.write_csv(
+            path.join(output, "{}_customers.csv".format(session)), cls.customers_header,
+            cls.get_customers_rows(session, history)
+        )
+
+        cls.write_npz(path.join(output, "{}.npz".format(session)), history)
+
+        return {"session": session, "status": "exported", "hash": file_hash, "n_turns": len(history)}
+
+    @staticmethod
+    def get_firms_rows(session, history):
+
+        for t in range(len(history)):
+
+            positions = history["firm_positions"][t]
+
+            for firm_id in range(len(positions)):
+                yield (
+                    session, t, firm_id, history["firm_status"][t][firm_id], positions[firm_id],
+                    history["firm_prices"][t][firm_id], history["firm_profits"][t][firm_id],
+                    history["firm_cumulative_profits"][t][firm_id], history["n_client"][t][firm_id]
+                )
+
+    @staticmethod
+    def get_customers_rows(session, history):
+
+        for t in range(len(history)):
+
+            choices = history["customer_firm_choices"][t]
+
+            for customer_id in range(len(choices)):
+                yield (
+                    session, t, customer_id, choices[customer_id],
+                    history["customer_extra_view_choices"][t][customer_id], history["customer_utility"][t][customer_id]
+                )
+
+    @staticmethod
+    def write_csv(file, header, rows):
+
+        with open("{}.tmp".format(file), "w", newline="") as f:
+
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+        os.replace("{}.tmp".format(file), file)
+
+    @staticmethod
+    def write_npz(file, history):
+
+        arrays = {}
+
+        for key, column in history.items():
+
+            if column.array is None or column.kind == "object":
+                continue
+
+            arrays[key] = column.values()
+
+            if column.kind == "enum":
+                arrays["{}_categories".format(key)] = np.array(column.categories)
+
+        # 'savez' adds the extension to a name that does not have it
+        tmp_file = "{}.tmp.npz".format(path.splitext(file)[0])
+
+        np.savez(tmp_file, **arrays)
+        os.replace(tmp_file, file)
+
+
+def main():
+
+    save_folder = ConfigService.get("folders")["save"]
+
+    parser = argparse.ArgumentParser(description="Export saved games as CSV and NPZ files.")
+    parser.add_argument("--folder", default=save_folder, help="save folder (default: '%(default)s')")
+    parser.add_argument("--output", default=None, help="output folder (default: 'export' in save folder)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: number of CPUs)")
+    parser.add_argument("--force", action="store_true", help="export again games that did not change")
+
+    args = parser.parse_args()
+
+    output = args.output if args.output is not None else path.join(args.folder, "export")
+
+    Exporter(folder=args.folder, output=output, n_workers=args.workers, force=args.force).run()
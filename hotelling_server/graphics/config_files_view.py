@@ -51,8 +51,7 @@ class ConfigFilesWindow(QWidget):
 
     def push_write_button(self):
 
-        for key in self.param.keys():
-            self.parent().write_parameters(key, self.tab_values[key].get_values())
+        self.parent().write_parameters({key: self.tab_values[key].get_values() for key in self.param.keys()})
 
         self.hide()
 
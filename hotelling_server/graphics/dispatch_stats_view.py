@@ -0,0 +1,134 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, \
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QGroupBox
+
+
+class DispatchStatsFrame(QWidget):
+
+    name = "DispatchStatsFrame"
+
+    command_columns = (
+        "Thread", "Command", "Count", "Mean wait (ms)", "Mean exec (ms)", "Max exec (ms)", "Total exec (s)")
+
+    lock_columns = (
+        "Lock", "Acquisitions", "Contended", "Contention (%)", "Total wait (ms)", "Max wait (ms)")
+
+    def __init__(self, parent):
+
+        super().__init__()
+
+        self._parent = parent
+
+        self.setWindowTitle("Dispatch statistics")
+
+        self.command_table = QTableWidget()
+        self.lock_table = QTableWidget()
+
+        self.command_group = QGroupBox("Commands")
+        self.lock_group = QGroupBox("Locks")
+
+        self.refresh_button = QPushButton("Refresh")
+        self.close_button = QPushButton("Close")
+
+        self.setup()
+
+    def parent(self):
+        return self._parent
+
+    def setup(self):
+
+        self.fill_layout()
+
+        for table, columns in ((self.command_table, self.command_columns), (self.lock_table, self.lock_columns)):
+
+            # set non editable and disable selection
+            table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            table.setSelectionMode(QAbstractItemView.NoSelection)
+            table.setFocusPolicy(Qt.NoFocus)
+
+            table.setColumnCount(len(columns))
+            table.setHorizontalHeaderLabels(columns)
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        # noinspection PyUnresolvedReferences
+        self.refresh_button.clicked.connect(self.push_refresh_button)
+        # noinspection PyUnresolvedReferences
+        self.close_button.clicked.connect(self.hide)
+
+        self.resize(900, 600)
+
+    def fill_layout(self):
+
+        vertical_layout = QVBoxLayout()
+        horizontal_layout = QHBoxLayout()
+
+        for group, table in ((self.command_group, self.command_table), (self.lock_group, self.lock_table)):
+
+            group_layout = QVBoxLayout()
+            group_layout.addWidget(table)
+            group.setLayout(group_layout)
+
+        vertical_layout.addWidget(self.command_group, stretch=3)
+        vertical_layout.addWidget(self.lock_group, stretch=1)
+
+        horizontal_layout.addWidget(self.refresh_button, alignment=Qt.AlignRight)
+        horizontal_layout.addWidget(self.close_button, alignment=Qt.AlignRight)
+
+        vertical_layout.addLayout(horizontal_layout)
+
+        self.setLayout(vertical_layout)
+
+    def push_refresh_button(self):
+
+        self.parent().ask_dispatch_stats()
+
+    def update_stats(self, stats):
+
+        self.update_command_table(stats["commands"])
+        self.update_lock_table(stats["locks"])
+
+    def update_command_table(self, stats):
+
+        rows = [
+            (thread, command, s)
+            for thread, commands in stats.items()
+            for command, s in commands.items()
+        ]
+
+        # most expensive commands first
+        rows.sort(key=lambda row: row[2]["exec_time"], reverse=True)
+
+        self.command_table.setRowCount(len(rows))
+
+        for x, (thread, command, s) in enumerate(rows):
+
+            self.fill_row(self.command_table, x, (
+                thread,
+                command,
+                s["count"],
+                "{:.2f}".format(s["wait_time"] / s["count"] * 1000),
+                "{:.2f}".format(s["exec_time"] / s["count"] * 1000),
+                "{:.2f}".format(s["max_exec_time"] * 1000),
+                "{:.3f}".format(s["exec_time"])
+            ))
+
+    def update_lock_table(self, stats):
+
+        self.lock_table.setRowCount(len(stats))
+
+        for x, (lock, s) in enumerate(sorted(stats.items())):
+
+            self.fill_row(self.lock_table, x, (
+                lock,
+                s["acquisitions"],
+                s["contended"],
+                "{:.1f}".format(s["contended"] / s["acquisitions"] * 100 if s["acquisitions"] else 0),
+                "{:.2f}".format(s["wait_time"] * 1000),
+                "{:.2f}".format(s["max_wait_time"] * 1000)
+            ))
+
+    @staticmethod
+    def fill_row(table, x, values):
+
+        for y, value in enumerate(values):
+            table.setItem(x, y, QTableWidgetItem(str(value)))
@@ -1,6 +1,6 @@
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
-from PyQt5.QtWidgets import QWidget, QPushButton, QVBoxLayout, QLabel
+from PyQt5.QtWidgets import QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QComboBox
 import numpy as np
 
 from hotelling_server.graphics.widgets.plot_layouts import PlotLayout
@@ -30,6 +30,9 @@ class GameFrame(QWidget, Logger):
 
         self.trial_counter = TrialCounter()
 
+        self.room_selector = QComboBox()
+        self.room_ids = []
+
         self.address_label = QLabel()
         self.address_text = None
 
@@ -77,6 +80,12 @@ class GameFrame(QWidget, Logger):
     def _setup(self):
 
         self.setLayout(self.layout)
+
+        room_layout = QHBoxLayout()
+        room_layout.addWidget(QLabel("Room"), alignment=Qt.AlignRight)
+        room_layout.addWidget(self.room_selector, alignment=Qt.AlignLeft)
+
+        self.layout.addLayout(room_layout, stretch=0)
         self.layout.addLayout(self.trial_counter, stretch=0)
 
         self.layout.addWidget(self.switch_button, stretch=0)
@@ -99,10 +108,24 @@ class GameFrame(QWidget, Logger):
         self.stop_button.clicked.connect(self.push_stop_button)
         # noinspection PyUnresolvedReferences
         self.switch_button.clicked.connect(self.push_switch_button)
+        # noinspection PyUnresolvedReferences
+        self.room_selector.activated.connect(self.select_room)
 
     def set_server_address(self, address):
         self.address_text = address
 
+    def set_rooms(self, room_ids, current_room_id):
+
+        self.room_ids = room_ids
+
+        self.room_selector.clear()
+        self.room_selector.addItems([str(i) for i in room_ids])
+        self.room_selector.setCurrentIndex(room_ids.index(current_room_id))
+
+    def select_room(self, index):
+
+        self.parent().set_current_room(self.room_ids[index])
+
     def set_assignment(self, assignment):
         self.assignment = assignment
 
@@ -0,0 +1,129 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, \
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+
+from hotelling_server.control.catalog import Catalog
+
+
+class LoadGameFrame(QWidget):
+
+    name = "LoadGameFrame"
+
+    columns = ("Session", "Condition", "Turns", "Firms", "Customers", "Players", "Ended", "Saved")
+
+    def __init__(self, parent):
+
+        super().__init__()
+
+        self._parent = parent
+
+        self.setWindowTitle("Load game")
+
+        self.sessions = []
+
+        self.filter_edit = QLineEdit()
+        self.table = QTableWidget()
+
+        self.load_button = QPushButton("Load")
+        self.browse_button = QPushButton("Browse...")
+        self.cancel_button = QPushButton("Cancel")
+
+        self.setup()
+
+    def parent(self):
+        return self._parent
+
+    def setup(self):
+
+        self.fill_layout()
+
+        # non editable, whole rows are selected
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+
+        self.table.setColumnCount(len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        self.filter_edit.setPlaceholderText("Session, condition, player...")
+
+        # noinspection PyUnresolvedReferences
+        self.filter_edit.textChanged.connect(self.apply_filter)
+        # noinspection PyUnresolvedReferences
+        self.table.cellDoubleClicked.connect(self.push_load_button)
+        # noinspection PyUnresolvedReferences
+        self.load_button.clicked.connect(self.push_load_button)
+        # noinspection PyUnresolvedReferences
+        self.browse_button.clicked.connect(self.push_browse_button)
+        # noinspection PyUnresolvedReferences
+        self.cancel_button.clicked.connect(self.hide)
+
+        self.load_button.setDefault(True)
+
+        self.resize(900, 500)
+
+    def fill_layout(self):
+
+        vertical_layout = QVBoxLayout()
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Filter"))
+        filter_layout.addWidget(self.filter_edit)
+
+        horizontal_layout = QHBoxLayout()
+        horizontal_layout.addWidget(self.browse_button, alignment=Qt.AlignLeft)
+        horizontal_layout.addStretch()
+        horizontal_layout.addWidget(self.load_button, alignment=Qt.AlignRight)
+        horizontal_layout.addWidget(self.cancel_button, alignment=Qt.AlignRight)
+
+        vertical_layout.addLayout(filter_layout)
+        vertical_layout.addWidget(self.table)
+        vertical_layout.addLayout(horizontal_layout)
+
+        self.setLayout(vertical_layout)
+
+    def prepare(self, folder):
+
+        self.sessions = Catalog(folder=folder).get_sessions()
+
+        self.table.setRowCount(len(self.sessions))
+
+        for x, s in enumerate(self.sessions):
+
+            values = (
+                s["session"], s["condition"], s["n_turns"], s["n_firms"], s["n_customers"],
+                ", ".join(s["players"]), "yes" if s["ended"] else "no", s["saved"]
+            )
+
+            for y, value in enumerate(values):
+                self.table.setItem(x, y, QTableWidgetItem(str(value)))
+
+        self.apply_filter(self.filter_edit.text())
+
+    def apply_filter(self, text):
+
+        text = text.lower()
+
+        for x in range(self.table.rowCount()):
+
+            row = " ".join(self.table.item(x, y).text() for y in range(len(self.columns))).lower()
+            self.table.setRowHidden(x, text not in row)
+
+    def push_load_button(self):
+
+        rows = self.table.selectionModel().selectedRows()
+
+        if not rows:
+            self.parent().show_info(msg="No game selected.")
+            return
+
+        if self.parent().load_selected_game(self.sessions[rows[0].row()]["file"]):
+            self.hide()
+
+    def push_browse_button(self):
+
+        file = self.parent().open_file_dialog()
+
+        if file and self.parent().load_selected_game(file):
+            self.hide()
@@ -16,10 +16,13 @@ class MenuBar(QMenuBar, Logger):
         self.action_menu = self.addMenu("Actions")
 
         self.load_game = QAction("Load game", self)
+        self.recover_last_game = QAction("Recover last game", self)
+        self.new_room = QAction("New room", self)
         self.show_config_files = QAction("Edit config files", self)
         self.erase_sql_tables = QAction("Erase sql tables", self)
         self.messenger = QAction("Chat with strangers", self)
         self.missing_players = QAction("Set missing players", self)
+        self.dispatch_stats = QAction("View dispatch statistics", self)
 
         self.setup_file()
         self.setup_edit()
@@ -32,6 +35,12 @@ class MenuBar(QMenuBar, Logger):
         self.load_game.triggered.connect(self.parent().open_file_to_load_game)
         self.file_menu.addAction(self.load_game)
 
+        self.recover_last_game.triggered.connect(self.parent().recover_last_game)
+        self.file_menu.addAction(self.recover_last_game)
+
+        self.new_room.triggered.connect(self.parent().new_room)
+        self.file_menu.addAction(self.new_room)
+
     def setup_edit(self):
 
         self.show_config_files.triggered.connect(self.parent().show_menubar_frame_config_files)
@@ -51,3 +60,7 @@ class MenuBar(QMenuBar, Logger):
         self.missing_players.triggered.connect(self.parent().show_menubar_frame_missing_players)
         self.action_menu.addAction(self.missing_players)
 
+        # Dispatch statistics
+        self.dispatch_stats.triggered.connect(self.parent().show_menubar_frame_dispatch_stats)
+        self.action_menu.addAction(self.dispatch_stats)
+
@@ -5,12 +5,15 @@ from PyQt5.QtCore import QObject, pyqtSignal, QTimer, Qt, QSettings
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QDesktopWidget, QFileDialog
 
 from utils.utils import Logger
+from utils.message_bus import Message, CommandRegistry
 
 from .graphics import game_view, start_view, \
         setting_up_view, assignment_view_php, menubar, config_files_view, \
-        erase_sql_tables_view, messenger, missing_players_view
+        erase_sql_tables_view, messenger, missing_players_view, dispatch_stats_view, load_game_view
 
 from .message_box import MessageBox
+from .control.state_buffer import StateBuffer, StateBufferBusy
+from .control.catalog import Catalog
 
 
 class Communicate(QObject):
@@ -22,6 +25,30 @@ class UI(QWidget, Logger, MessageBox):
     name = "Interface"
     app_name = "Duopoly Experiment"
 
+    # Commands that can be sent by controller through 'queue'
+    commands = (
+        "set_previous_parameters",
+        "prepare_frames",
+        "prepare_window",
+        "show_frame_setting_up",
+        "show_frame_start",
+        "show_frame_game",
+        "server_error",
+        "set_server_address_game_frame",
+        "set_assignment_game_frame",
+        "set_rooms_game_frame",
+        "update_waiting_list_assignment_frame",
+        "controller_new_message",
+        "update_tables",
+        "update_figures",
+        "update_dispatch_stats",
+        "force_to_quit_game",
+        "error_loading_session",
+        "show_warning",
+        "show_info",
+        "show_critical_and_ok"
+    )
+
     def __init__(self, model):
 
         super().__init__()
@@ -48,7 +75,11 @@ class UI(QWidget, Logger, MessageBox):
 
         self.already_asked_for_saving_parameters = 0
 
+        # shared memory block of the displayed room, attached on first update
+        self.state_buffer = None
+
         self.queue = Queue()
+        self.registry = CommandRegistry(owner=self, commands=self.commands)
 
         self.communicate = Communicate()
 
@@ -90,6 +121,11 @@ class UI(QWidget, Logger, MessageBox):
 
         self.frames["game"].set_assignment(assignment)
 
+    def set_rooms_game_frame(self, rooms):
+        """Set rooms that can be selected in game view (room ids, current room id)"""
+
+        self.frames["game"].set_rooms(*rooms)
+
     def update_waiting_list_assignment_frame(self, participants):
 
         self.frames["assign_php"].update_waiting_list(participants)
@@ -98,6 +134,12 @@ class UI(QWidget, Logger, MessageBox):
 
         self.menubar_frames["messenger"].new_message_from_user(args[0], args[1])
 
+    def update_dispatch_stats(self, stats):
+        """Display controller dispatch stats along with interface ones"""
+
+        stats["commands"][self.name] = self.registry.get_stats()
+        self.menubar_frames["dispatch_stats"].update_stats(stats)
+
     # -------------------------------------------------------------------------------------------------- #
 
     def _get_parameters(self, *keys):
@@ -106,7 +148,7 @@ class UI(QWidget, Logger, MessageBox):
 
     def setup(self):
 
-        self.controller_queue = self.mod.controller.queue
+        self.controller_queue = self.mod.controller_queue
         self.send_go_signal()
         self.communicate.signal.connect(self.look_for_msg)
 
@@ -154,6 +196,12 @@ class UI(QWidget, Logger, MessageBox):
             missing_players_view.MissingPlayersFrame(parent=self,
             param=self._get_parameters("game"))
 
+        self.menubar_frames["dispatch_stats"] = \
+            dispatch_stats_view.DispatchStatsFrame(parent=self)
+
+        self.menubar_frames["load_game"] = \
+            load_game_view.LoadGameFrame(parent=self)
+
         # ---------------------------------------------------------------- #
 
     def prepare_window(self):
@@ -188,6 +236,9 @@ class UI(QWidget, Logger, MessageBox):
             self.log("Close window", level=1)
             self.close_menubar_windows()
 
+            if self.state_buffer is not None:
+                self.state_buffer.close()
+
             # ---- stop timers ----- #
 
             if getattr(self.frames["assign_php"], "timer") is not None:
@@ -227,19 +278,57 @@ class UI(QWidget, Logger, MessageBox):
                 # assignment_php is the only param we do not want to save
                 self.param.pop("assignment_php")
 
-                for key in self.param.keys():
-                    self.write_parameters(key, self.param[key])
+                # changed files are written at once
+                self.write_parameters(
+                    {key: value for key, value in self.param.items() if value != self.old_param.get(key)}
+                )
 
             else:
                 self.log('Saving of parameters aborted.', level=1)
 
     # ------------------------- Called every second methods ------------------------------------- #
 
+    def get_state_buffer(self, descriptor):
+        """attach to the state buffer of the displayed room (it changes with room or capacity)"""
+
+        if self.state_buffer is None or self.state_buffer.descriptor != descriptor:
+
+            if self.state_buffer is not None:
+                self.state_buffer.close()
+
+            self.state_buffer = StateBuffer.attach(descriptor)
+
+        return self.state_buffer
+
     def update_figures(self, data):
-        self.frames["game"].update_statistics(data["statistics"])
+
+        # series are copied as figures keep references to their data
+        try:
+            statistics = self.get_state_buffer(data["state_buffer"]).read(
+                lambda views: {k: v.copy() for k, v in views["statistics"].items() if v.shape[-1]}
+            )
+
+        except StateBufferBusy as e:
+            # figures are updated again with next data
+            self.log(str(e), level=2)
+            return
+
+        self.frames["game"].update_statistics(statistics)
 
     def update_tables(self, data):
-        self.frames["game"].update_tables(data)
+
+        # state is copied while the block does not change, then tables are filled once
+        try:
+            state = self.get_state_buffer(data["state_buffer"]).read(
+                lambda views: {k: v.copy() for k, v in views["state"].items()}
+            )
+
+        except StateBufferBusy as e:
+            self.log(str(e), level=2)
+
+        else:
+            self.frames["game"].update_tables(dict(data, current_state=dict(data["current_state"], **state)))
+
         self.frames["game"].set_trial_number(data["time_manager_t"])
 
     # ------------------------- Method used in order to treat requests from controller ------------ #
@@ -252,12 +341,7 @@ class UI(QWidget, Logger, MessageBox):
             msg = self.queue.get()
             self.log("I received message '{}'.".format(msg))
 
-            command = getattr(self, msg[0])
-            args = msg[1:]
-            if args:
-                command(*args)
-            else:
-                command()
+            self.registry.dispatch(msg)
 
             # Able now to handle a new display instruction
             self.occupied.clear()
@@ -316,13 +400,18 @@ class UI(QWidget, Logger, MessageBox):
 
         self.menubar_frames["missing_players"].show()
 
+    def show_menubar_frame_dispatch_stats(self):
+
+        self.menubar_frames["dispatch_stats"].show()
+        self.ask_dispatch_stats()
+
     # -------------------------------------- Message box related --------------------------------------------------------------- #
 
-    def error_loading_session(self):
+    def error_loading_session(self, error):
 
-        self.show_warning(msg="Error in loading the selected file. Please select another one!")
-        self.frames["setting_up"].show()
-        self.frames["load_game_new_game"].open_file_dialog()
+        self.show_warning(msg="Error in loading the selected file. Please select another one!\n{}".format(error))
+        self.show_frame_start()
+        self.open_file_to_load_game()
 
     def server_error(self, error_message):
 
@@ -393,14 +482,23 @@ class UI(QWidget, Logger, MessageBox):
 
     def open_file_to_load_game(self):
 
-        file = self.open_file_dialog()
+        self.menubar_frames["load_game"].prepare(folder=path.expanduser(self.param["folders"]["save"]))
+        self.menubar_frames["load_game"].show()
 
-        if file:
-            self.set_server_parameters(param=self.param)
-            self.load_game(file)
+    def load_selected_game(self, file):
+        """returns True if game is loaded"""
 
-        else:
-            self.show_info(msg="No file selected.")
+        # a file that can not be read is not sent to the controller
+        error = Catalog.validate(file)
+
+        if error is not None:
+            self.show_warning(msg=error)
+            return False
+
+        self.set_server_parameters(param=self.param)
+        self.load_game(file)
+
+        return True
 
     # ----------------- called by views methods -------------------------------------------------------- #
 
@@ -411,63 +509,77 @@ class UI(QWidget, Logger, MessageBox):
     # ----------------- and putting something in controller queue -------------- #
 
     def update_game_view_data(self):
-        self.controller_queue.put(("ui_update_game_view_data", ))
+        self.controller_queue.put(Message("ui_update_game_view_data"))
 
     def load_game(self, file):
-        self.controller_queue.put(("ui_load_game", file))
+        self.controller_queue.put(Message("ui_load_game", file))
+
+    def recover_last_game(self):
+
+        self.set_server_parameters(param=self.param)
+        self.controller_queue.put(Message("ui_recover_last_game"))
 
     def stop_game(self):
-        self.controller_queue.put(("ui_stop_game", ))
+        self.controller_queue.put(Message("ui_stop_game"))
 
     def force_to_stop_game(self):
-        self.controller_queue.put(("ui_force_to_stop_game", ))
+        self.controller_queue.put(Message("ui_force_to_stop_game"))
 
     def close_window(self):
-        self.controller_queue.put(("ui_close_window", ))
+        self.controller_queue.put(Message("ui_close_window"))
 
     def retry_server(self):
-        self.controller_queue.put(("ui_retry_server", ))
+        self.controller_queue.put(Message("ui_retry_server"))
 
-    def write_parameters(self, key, data):
-        self.controller_queue.put(("ui_write_parameters", key, data))
+    def write_parameters(self, params):
+        self.controller_queue.put(Message("ui_write_parameters", params))
 
     def send_go_signal(self):
-        self.controller_queue.put(("ui_send_go_signal", ))
+        self.controller_queue.put(Message("ui_send_go_signal"))
 
     def send_reboot_signal(self):
-        self.controller_queue.put(("reboot", ))
+        self.controller_queue.put(Message("ui_reboot"))
 
     def stop_bots(self):
-        self.controller_queue.put(("ui_stop_bots", ))
+        self.controller_queue.put(Message("ui_stop_bots"))
 
     def stop_server(self):
-        self.controller_queue.put(("ui_stop_server",))
+        self.controller_queue.put(Message("ui_stop_server"))
 
     def look_for_alive_players(self):
-        self.controller_queue.put(("ui_look_for_alive_players", ))
+        self.controller_queue.put(Message("ui_look_for_alive_players"))
 
     def php_scan_button(self):
-        self.controller_queue.put(("ui_php_scan_button", ))
+        self.controller_queue.put(Message("ui_php_scan_button"))
 
     def php_erase_sql_tables(self, tables):
-        self.controller_queue.put(("ui_php_erase_sql_tables", tables))
+        self.controller_queue.put(Message("ui_php_erase_sql_tables", tables))
 
     def php_run_game(self):
-        self.controller_queue.put(("ui_php_run_game", ))
+        self.controller_queue.put(Message("ui_php_run_game"))
 
     def set_assignment(self, assignment):
-        self.controller_queue.put(("ui_set_assignment", assignment))
+        self.controller_queue.put(Message("ui_set_assignment", assignment))
 
     def set_parametrization(self, param):
-        self.controller_queue.put(("ui_set_parametrization", param))
+        self.controller_queue.put(Message("ui_set_parametrization", param))
 
     def set_server_parameters(self, param):
-        self.controller_queue.put(("ui_set_server_parameters", param))
+        self.controller_queue.put(Message("ui_set_server_parameters", param))
 
     def send_message_to_user(self, user, msg):
-        self.controller_queue.put(("ui_new_message", user, msg))
+        self.controller_queue.put(Message("ui_new_message", user, msg))
 
     def set_missing_players(self, value):
-        self.controller_queue.put(("ui_php_set_missing_players", value))
+        self.controller_queue.put(Message("ui_php_set_missing_players", value))
+
+    def ask_dispatch_stats(self):
+        self.controller_queue.put(Message("ui_ask_dispatch_stats"))
+
+    def new_room(self):
+        self.controller_queue.put(Message("ui_new_room"))
+
+    def set_current_room(self, room_id):
+        self.controller_queue.put(Message("ui_set_current_room", room_id))
 
     # ---------------------- #
@@ -1,34 +1,90 @@
 import sys
+from multiprocessing import Queue
+from threading import Thread
 
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QIcon
 
-from . import interface, controller
+from . import interface, controller, engine
+
+
+class GraphicRelay(Thread):
+
+    """
+    Forward instructions of a controller running
+    in another process to the interface.
+    """
+
+    def __init__(self, graphic_queue, ui):
+
+        super().__init__(daemon=True)
+
+        self.graphic_queue = graphic_queue
+        self.ui = ui
+
+    def run(self):
+
+        while True:
+
+            self.ui.queue.put(self.graphic_queue.get())
+            self.ui.communicate.signal.emit()
 
 
 class Model:
 
     """Model class.
     Create the elements of the model, orchestrate their interactions.
+    Controller runs either in a thread of the interface process,
+    in a child process ('ui_process' in engine parameters),
+    or in a headless engine the interface attaches to.
     """
 
-    def __init__(self):
+    def __init__(self, attach=False):
 
         self.git_branch = "php_server"
 
+        self.param = engine.get_engine_parameters()
+
         self.app = QApplication(sys.argv)
         self.app.setWindowIcon(QIcon("img/icon.icns"))
         self.ui = interface.UI(model=self)
-        self.controller = controller.Controller(model=self)
+
+        self.controller = None
+        self.engine = None
+        self.relay = None
+
+        if attach:
+            self.controller_queue, graphic_queue = engine.Engine.attach(
+                address=(self.param["address"], self.param["port"]),
+                authkey=engine.get_authkey())
+            self.relay = GraphicRelay(graphic_queue=graphic_queue, ui=self.ui)
+
+        elif self.param["ui_process"]:
+            self.controller_queue, graphic_queue = Queue(), Queue()
+            self.engine = engine.Engine(controller_queue=self.controller_queue, graphic_queue=graphic_queue)
+            self.relay = GraphicRelay(graphic_queue=graphic_queue, ui=self.ui)
+
+        else:
+            self.controller = controller.Controller(graphic_queue=self.ui.queue, communicate=self.ui.communicate)
+            self.controller_queue = self.controller.queue
 
     def run(self):
 
         try:
 
-            self.controller.start()
+            if self.engine is not None:
+                self.engine.start()
+
+            if self.controller is not None:
+                self.controller.start()
+
+            if self.relay is not None:
+                self.relay.start()
+
             self.ui.setup()
             self.ui.show()
             sys.exit(self.app.exec_())
 
         except Exception as e:
             self.ui.fatal_error(error_message=str(e))
+
@@ -0,0 +1,241 @@
+import json
+import os
+from contextlib import contextmanager
+from os import path
+from threading import RLock
+
+from utils.utils import Logger
+
+
+class ConfigService(Logger):
+
+    """
+    Parameters files of the process, each one parsed once and shared by every component.
+    A file is parsed again when its modification time changed ('get' or 'check'),
+    then listeners of its key are called with its new value.
+    Files are checked against their template: missing entries take the value of the template,
+    entries of another type are refused.
+    Values computed from a file ('derived') are kept until the file changes.
+    Returned values are shared, they must not be modified but replaced through 'write'.
+    """
+
+    name = "ConfigService"
+
+    # noinspection SpellCheckingInspection
+    folder = "hotelling_server/parameters"
+    templates_folder = "templates"
+
+    lock = RLock()
+
+    # key: name of file, value: (modification time, parameters)
+    cache = {}
+
+    # key: (name of file, name of value), value: value
+    derived_values = {}
+
+    # key: name of file, value: functions called with name and new parameters,
+    # in the thread that noticed the change, once it released the lock
+    listeners = {}
+
+    # changes noticed under lock, and number of nested 'locked' blocks of the thread holding it
+    pending_changes = []
+    depth = 0
+
+    @classmethod
+    @contextmanager
+    def locked(cls):
+        """
+        hold the lock, then notify listeners of the changes noticed meanwhile:
+        listeners take other locks (e.g. those of rooms), they must not wait for them under this one
+        """
+
+        with cls.lock:
+
+            cls.depth += 1
+
+            try:
+                yield
+
+            finally:
+
+                cls.depth -= 1
+
+                if cls.depth:
+                    changes = []
+
+                else:
+                    changes = cls.pending_changes
+                    cls.pending_changes = []
+
+        for key, value in changes:
+            cls.notify(key, value)
+
+    @classmethod
+    def get_file(cls, key):
+        return path.join(cls.folder, "{}.json".format(key))
+
+    @classmethod
+    def get(cls, key):
+
+        with cls.locked():
+
+            mtime = os.stat(cls.get_file(key)).st_mtime_ns
+
+            if key not in cls.cache or cls.cache[key][0] != mtime:
+                cls.load(key, mtime)
+
+            return cls.cache[key][1]
+
+    @classmethod
+    def get_many(cls, *keys):
+        return {key: cls.get(key) for key in keys}
+
+    @classmethod
+    def load(cls, key, mtime):
+
+        reloaded = key in cls.cache
+
+        try:
+            with open(cls.get_file(key)) as file:
+                value = cls.validate(key, json.load(file))
+
+        except ValueError as e:
+
+            if not reloaded:
+                raise
+
+            # e.g. file being edited, previous parameters are kept until next change
+            cls.log("'{}' parameters can not be reloaded: {}".format(key, e), level=3)
+            cls.cache[key] = (mtime, cls.cache[key][1])
+            return
+
+        cls.set(key, value, mtime)
+
+        if reloaded:
+            cls.log("'{}' parameters changed on disk, they are reloaded.".format(key), level=1)
+            cls.pending_changes.append((key, value))
+
+    @classmethod
+    def set(cls, key, value, mtime):
+
+        cls.cache[key] = (mtime, value)
+
+        for k in [i for i in cls.derived_values if i[0] == key]:
+            del cls.derived_values[k]
+
+    @classmethod
+    def check(cls):
+        """reload files that changed since they were parsed"""
+
+        with cls.locked():
+            for key in list(cls.cache):
+                cls.get(key)
+
+    @classmethod
+    def derived(cls, key, name, compute):
+        """value computed by 'compute' from parameters 'key', computed again when they change"""
+
+        with cls.locked():
+
+            value = cls.get(key)
+
+            if (key, name) not in cls.derived_values:
+                cls.derived_values[(key, name)] = compute(value)
+
+            return cls.derived_values[(key, name)]
+
+    @classmethod
+    def write(cls, key, value):
+        cls.write_many({key: value})
+
+    @classmethod
+    def write_many(cls, values):
+        """
+        write parameters of several files in one batch, only those which changed.
+        Every file is written to a temporary file before any of them replaces its file,
+        so that a crash leaves each file either as it was or as it should be, never truncated.
+        """
+
+        with cls.locked():
+
+            # every value is checked before anything is written
+            values = {
+                key: cls.validate(key, value) for key, value in values.items()
+                if key not in cls.cache or cls.cache[key][1] != value
+            }
+
+            for key, value in values.items():
+
+                with open("{}.tmp".format(cls.get_file(key)), "w") as f:
+                    json.dump(value, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            for key in values:
+                os.replace("{}.tmp".format(cls.get_file(key)), cls.get_file(key))
+
+            for key, value in values.items():
+                cls.set(key, value, os.stat(cls.get_file(key)).st_mtime_ns)
+                cls.pending_changes.append((key, value))
+
+        if values:
+            cls.log("Parameters written: {}.".format(", ".join(sorted(values))), level=1)
+
+    @classmethod
+    def add_listener(cls, key, function):
+
+        with cls.lock:
+            cls.listeners.setdefault(key, []).append(function)
+
+    @classmethod
+    def notify(cls, key, value):
+
+        with cls.lock:
+            listeners = list(cls.listeners.get(key, []))
+
+        for function in listeners:
+            function(key, value)
+
+    @classmethod
+    def validate(cls, key, value):
+
+        template_file = path.join(cls.templates_folder, "{}.json".format(key))
+
+        if not path.exists(template_file):
+            return value
+
+        with open(template_file) as file:
+            template = json.load(file)
+
+        # e.g. assignment, a list of any length
+        if not isinstance(template, dict) or not isinstance(value, dict):
+            return value
+
+        value = dict(value)
+
+        for k, default in template.items():
+
+            if k not in value:
+                cls.log("'{}' is missing in '{}' parameters, template value '{}' is used.".format(
+                    k, key, default), level=2)
+                value[k] = default
+
+            elif not cls.is_same_type(value[k], default):
+                raise ValueError("'{}' of '{}' parameters should be of type '{}', not '{}'.".format(
+                    k, key, type(default).__name__, type(value[k]).__name__))
+
+        return value
+
+    @staticmethod
+    def is_same_type(value, default):
+
+        if default is None or value is None:
+            return True
+
+        if isinstance(default, bool) or isinstance(value, bool):
+            return isinstance(default, bool) and isinstance(value, bool)
+
+        if isinstance(default, (int, float)):
+            return isinstance(value, (int, float))
+
+        return isinstance(value, type(default))
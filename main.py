@@ -1,13 +1,24 @@
+import sys
+
+
 def main():
     
     from hotelling_server.parameters.config_files_manager import ConfigFilesManager
 
     ConfigFilesManager.run()
 
-    from hotelling_server import model
+    if "--headless" in sys.argv:
+
+        from hotelling_server import engine
+
+        engine.run_headless()
+
+    else:
+
+        from hotelling_server import model
 
-    m = model.Model()
-    m.run()
+        m = model.Model(attach="--attach" in sys.argv)
+        m.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,6 @@
+from hotelling_server.exporter import main
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,95 @@
+import glob
+import os
+import shutil
+import sys
+from os import path
+from queue import Queue
+
+import pytest
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+
+# paths of parameters files (and of bots data) are relative to the repository, as when running 'main.py'
+sys.path.insert(0, root)
+os.chdir(root)
+
+from utils.watchdog import Watchdog  # noqa: E402
+from hotelling_server.parameters.config_service import ConfigService  # noqa: E402
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """parameters files copied in a temporary folder, so that tests can change them"""
+
+    folder = tmp_path / "parameters"
+    folder.mkdir()
+
+    for file in glob.glob("templates/*.json") + glob.glob("hotelling_server/parameters/*.json"):
+        shutil.copy(file, str(folder))
+
+    monkeypatch.setattr(ConfigService, "folder", str(folder))
+    monkeypatch.setattr(ConfigService, "cache", {})
+    monkeypatch.setattr(ConfigService, "derived_values", {})
+    monkeypatch.setattr(ConfigService, "listeners", {})
+
+    return folder
+
+
+class Controller:
+
+    """what a room needs from the process hosting it"""
+
+    name = "Controller"
+
+    def __init__(self):
+
+        self.queue = Queue()
+        self.watchdog = Watchdog(interval=1, timeout=10, alert=print)
+
+    @staticmethod
+    def is_serving():
+        return True
+
+
+@pytest.fixture
+def make_room(config, tmp_path):
+    """
+    returns a function creating a room whose players are all humans,
+    checkpoints are written at turn end unless 'persistence' parameters say otherwise
+    """
+
+    from hotelling_server.control import room
+    from hotelling_server.control.data import Data
+
+    param = dict(Data.load_param())
+    param["folders"] = {"save": str(tmp_path / "save")}
+    param["persistence"] = dict(param["persistence"], checkpoint="turn")
+
+    n_agents = param["game"]["n_firms"] + param["game"]["n_customers"]
+
+    assignment = {
+        i: {"name": "player_{}".format(i), "role": "firm" if i < param["game"]["n_firms"] else "customer", "bot": False}
+        for i in range(n_agents)
+    }
+
+    controller = Controller()
+    rooms = []
+
+    def make(**persistence):
+
+        r = room.Room(
+            controller=controller,
+            room_id=len(rooms),
+            param=dict(param, persistence=dict(param["persistence"], **persistence))
+        )
+        r.set_assignment(assignment)
+        r.set_parametrization(param["parametrization"])
+
+        rooms.append(r)
+
+        return r
+
+    yield make
+
+    for r in rooms:
+        r.close()
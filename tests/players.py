@@ -0,0 +1,46 @@
+"""requests sent by the players of a room whose players are all humans (see 'make_room')"""
+
+
+def get_firms(r):
+    """game ids of active and passive firms"""
+
+    status = r.data.current_state["firm_status"]
+    active = next(g for g, f in r.data.firms_id.items() if status[f] == "active")
+    passive = next(g for g in r.data.firms_id if g != active)
+
+    return active, passive
+
+
+def get_customers(r):
+    return sorted(r.data.customers_id)
+
+
+def init(r):
+    for game_id in sorted(r.data.assignment):
+        assert r.handle_request("ask_init/{}".format(game_id))[0] == "reply"
+
+
+def play_customer(r, game_id, t):
+    r.handle_request("ask_customer_firm_choices/{}/{}".format(game_id, t))
+    return r.handle_request("ask_customer_choice_recording/{}/{}/1/0".format(game_id, t))
+
+
+def end_turn(r, t):
+
+    active, passive = get_firms(r)
+
+    r.handle_request("ask_firm_passive_opponent_choice/{}/{}".format(passive, t))
+    r.handle_request("ask_firm_passive_customer_choices/{}/{}".format(passive, t))
+    r.handle_request("ask_firm_active_customer_choices/{}/{}".format(active, t))
+
+
+def play_turn(r, t):
+
+    active, passive = get_firms(r)
+
+    r.handle_request("ask_firm_active_choice_recording/{}/{}/3/5".format(active, t))
+
+    for game_id in get_customers(r):
+        play_customer(r, game_id, t)
+
+    end_turn(r, t)
@@ -0,0 +1,47 @@
+import json
+import os
+from threading import Thread
+
+from hotelling_server.parameters.config_service import ConfigService
+
+
+def is_lock_free():
+    """whether another thread can take the lock of the service"""
+
+    result = []
+
+    def acquire():
+
+        result.append(ConfigService.lock.acquire(timeout=1))
+
+        if result[0]:
+            ConfigService.lock.release()
+
+    thread = Thread(target=acquire)
+    thread.start()
+    thread.join()
+
+    return result[0]
+
+
+def test_listeners_are_called_out_of_lock(config):
+
+    calls = []
+
+    ConfigService.get("game")
+    ConfigService.add_listener("game", lambda key, value: calls.append((key, value, is_lock_free())))
+
+    ConfigService.write("game", dict(ConfigService.get("game"), n_prices=12))
+
+    file = str(config / "game.json")
+
+    with open(file, "w") as f:
+        json.dump(dict(ConfigService.get("game"), n_prices=13), f)
+
+    # modification time has to differ from the one of the previous write
+    os.utime(file, ns=(0, 0))
+
+    # nested in a derived value, as when parameters are read by a component
+    ConfigService.derived("game", "n_prices", lambda value: value["n_prices"])
+
+    assert [(key, value["n_prices"], free) for key, value, free in calls] == [("game", 12, True), ("game", 13, True)]
@@ -0,0 +1,101 @@
+from copy import deepcopy
+
+import numpy as np
+
+from hotelling_server.control.data import Data
+from players import get_customers, get_firms, init, play_customer, play_turn
+
+
+def test_repeated_read_keeps_version_and_snapshot(make_room):
+
+    r = make_room()
+    r.new_game()
+    init(r)
+
+    for t in range(2):
+        play_turn(r, t)
+
+    customer = get_customers(r)[0]
+    request = "ask_customer_firm_choices/{}/0".format(customer)
+
+    reply = r.handle_request(request)
+
+    version = r.data.version
+    snapshot = r.data.snapshot()
+
+    # past turn results asked again, e.g. by a client polling after a reconnection
+    for i in range(3):
+        assert r.handle_request(request) == reply
+
+    assert r.data.version == version
+    assert r.data.snapshot() is snapshot
+
+    # a choice changes the game
+    play_customer(r, customer, 2)
+
+    assert r.data.version > version
+    assert r.data.snapshot() is not snapshot
+
+
+def get_saved_state(r):
+    """state as saved by a snapshot"""
+
+    with r.data.lock:
+        return dict(deepcopy(r.data.get_state()), history=r.data.history.freeze())
+
+
+def test_delta_brings_saved_state_up_to_date(make_room):
+
+    r = make_room()
+    r.new_game()
+    init(r)
+
+    # everything is saved by a snapshot
+    r.data.get_delta()
+    state = get_saved_state(r)
+
+    # half a turn: no turn ends, so no checkpoint is written meanwhile
+    active, passive = get_firms(r)
+    r.handle_request("ask_firm_active_choice_recording/{}/0/3/5".format(active))
+
+    for game_id in get_customers(r)[:5]:
+        play_customer(r, game_id, 0)
+
+    delta = r.data.get_delta()
+
+    # only changed rows are saved
+    assert set(delta["current_state"]["customer_replies"][1]) == {r.data.customers_id[i] for i in get_customers(r)[:5]}
+    assert set(delta["fields"]["last_replies"][1]) == {active} | set(get_customers(r)[:5])
+
+    Data.apply_delta(state, delta)
+
+    np.testing.assert_equal({k: v for k, v in state.items() if k != "history"}, r.data.get_state())
+
+    # nothing changed since
+    assert r.data.get_delta()["current_state"] == {}
+
+
+def test_replay_applies_records_in_order(make_room):
+
+    r = make_room()
+    r.new_game()
+    init(r)
+
+    r.data.get_delta()
+    state = get_saved_state(r)
+
+    play_customer(r, get_customers(r)[0], 0)
+
+    records = [
+        ("delta", r.data.get_delta()),
+        ("turn", {key: r.data.current_state[key] for key in r.data.entries}),
+        # written by previous versions
+        ("state", {"roles": ["firm"]})
+    ]
+
+    assert Data.replay(state, iter(records)) == 3
+
+    assert state["current_state"]["customer_replies"][r.data.customers_id[get_customers(r)[0]]] == 1
+    assert len(state["history"]) == 1
+    assert list(state["history"]["customer_replies"][0]) == list(r.data.current_state["customer_replies"])
+    assert state["roles"] == ["firm"]
@@ -0,0 +1,231 @@
+import os
+import pickle
+from os import path
+
+import numpy as np
+
+from hotelling_server.control.history import HistoryColumn, HistoryStore
+from players import init, play_turn
+
+
+def test_column_changed_for_objects_leaves_its_file_until_snapshot(tmp_path):
+
+    folder = str(tmp_path / "history")
+
+    store = HistoryStore(["n_client"], folder=folder)
+    file = store.get_file("n_client")
+
+    store.append({"n_client": [1, 2]})
+    assert path.exists(file)
+
+    store.append({"n_client": [1, None]})
+
+    # rows of the previous snapshot are still in the file
+    assert path.exists(file)
+    assert store.stale_files == [file]
+
+    copy = pickle.loads(pickle.dumps(store.freeze()))
+
+    store.remove_stale_files()
+    assert not path.exists(file)
+
+    assert copy.stale_files == []
+    assert list(copy["n_client"]) == [[1, 2], [1, None]]
+
+
+def test_new_game_removes_files_of_previous_game(tmp_path):
+
+    folder = str(tmp_path / "history")
+
+    store = HistoryStore(["n_client"], folder=folder)
+    store.append({"n_client": [1, 2]})
+
+    store = HistoryStore(["n_client"], folder=folder)
+
+    assert os.listdir(folder) == []
+
+    store.append({"n_client": [None, 2]})
+    store.write_index()
+
+    assert os.listdir(folder) == [HistoryStore.index_file]
+
+
+def test_snapshot_removes_stale_files_and_game_reloads(make_room):
+
+    r = make_room(history_backend="memmap")
+    r.new_game()
+    init(r)
+
+    play_turn(r, 0)
+
+    file = r.data.history.get_file("firm_profits")
+    assert path.exists(file)
+
+    # e.g. a value a column can not store as numbers, saved with the state at the end of a turn
+    with r.data.lock:
+        r.data.write_entry("firm_profits", [0, None])
+        r.data.update_history()
+
+        assert r.data.history.stale_files == [file]
+
+    r.backup.checkpoint()
+
+    assert not path.exists(file)
+
+    recovered = make_room(history_backend="memmap")
+    recovered.load_game(r.backup.file)
+
+    assert len(recovered.data.history) == 2
+    assert recovered.data.history["firm_profits"][0] == r.data.history["firm_profits"][0]
+    assert recovered.data.history["firm_profits"][1] == [0, None]
+
+
+def test_columns_grow_and_keep_their_rows():
+
+    store = HistoryStore(["firm_prices", "firm_status", "customer_utility"])
+
+    n_turns = 3 * HistoryColumn.initial_capacity + 1
+
+    for t in range(n_turns):
+        store.append({
+            "firm_prices": [t, t + 1],
+            "firm_status": ["active", "passive"][::1 if t % 2 else -1],
+            "customer_utility": t / 2
+        })
+
+    assert len(store) == n_turns
+    assert len(store["firm_prices"].array) >= n_turns
+
+    assert list(store["firm_prices"][5]) == [5, 6]
+    assert store["firm_status"][5] == ["active", "passive"]
+    assert store["firm_status"][6] == ["passive", "active"]
+    assert store["customer_utility"][-1] == (n_turns - 1) / 2
+
+    # status strings are stored as codes
+    assert store["firm_status"].values().dtype == np.int16
+
+
+def test_rows_are_copied_at_appending():
+
+    store = HistoryStore(["firm_prices"])
+
+    prices = np.array([1, 2])
+    store.append({"firm_prices": prices})
+    prices[0] = 10
+
+    assert list(store["firm_prices"][0]) == [1, 2]
+
+
+def test_column_changes_type_when_needed():
+
+    store = HistoryStore(["firm_profits", "n_client"])
+
+    store.append({"firm_profits": [1, 2], "n_client": [1, 2]})
+
+    # integers then floats
+    store.append({"firm_profits": [1.5, 2], "n_client": [1, 2]})
+
+    # numbers then objects
+    store.append({"firm_profits": [1.5, 2], "n_client": [1, None]})
+
+    assert store["firm_profits"].values().dtype == np.float64
+    assert [list(i) for i in store["firm_profits"]] == [[1, 2], [1.5, 2], [1.5, 2]]
+    assert [list(i) for i in store["n_client"]] == [[1, 2], [1, 2], [1, None]]
+
+
+def test_pickled_store_keeps_its_rows_only():
+
+    store = HistoryStore(["firm_prices"])
+
+    for t in range(3):
+        store.append({"firm_prices": [t, t]})
+
+    copy = pickle.loads(pickle.dumps(store))
+
+    assert len(copy["firm_prices"].array) == 3
+    assert [list(i) for i in copy["firm_prices"]] == [[0, 0], [1, 1], [2, 2]]
+
+    # it still grows
+    copy.append({"firm_prices": [3, 3]})
+    assert len(copy) == 4
+
+
+def test_history_saved_as_lists_by_previous_versions():
+
+    store = HistoryStore.from_lists({"firm_prices": [[1, 2], [3, 4]], "firm_status": [["active", "passive"]] * 2})
+
+    assert len(store) == 2
+    assert list(store["firm_prices"][1]) == [3, 4]
+    assert store["firm_status"][0] == ["active", "passive"]
+
+
+def test_mapped_columns_grow_in_their_files(tmp_path):
+
+    folder = str(tmp_path / "history")
+
+    store = HistoryStore(["firm_prices", "firm_status"], folder=folder)
+
+    n_turns = HistoryColumn.initial_capacity + 1
+
+    for t in range(n_turns):
+        store.append({"firm_prices": [t, t], "firm_status": ["active", "passive"]})
+
+    assert store["firm_prices"].is_mapped
+    assert sorted(os.listdir(folder)) == ["firm_prices.npy", "firm_status.npy"]
+
+    store.flush()
+
+    # pickled without their rows, columns are mapped again at loading
+    copy = pickle.loads(pickle.dumps(store))
+
+    assert copy["firm_prices"].is_mapped
+    assert len(copy) == n_turns
+    assert list(copy["firm_prices"][-1]) == [n_turns - 1] * 2
+    assert copy["firm_status"][0] == ["active", "passive"]
+
+
+def test_open_reads_turns_of_last_index(tmp_path):
+
+    folder = str(tmp_path / "history")
+
+    store = HistoryStore(["firm_prices", "firm_status"], folder=folder)
+
+    for t in range(3):
+        store.append({"firm_prices": [t, t], "firm_status": ["active", "passive"]})
+
+    store.flush()
+    store.write_index()
+
+    # not written by a checkpoint yet
+    store.append({"firm_prices": [3, 3], "firm_status": ["passive", "active"]})
+
+    opened = HistoryStore.open(folder)
+
+    assert len(opened) == 3
+    assert [list(i) for i in opened["firm_prices"]] == [[0, 0], [1, 1], [2, 2]]
+    assert opened["firm_status"][2] == ["active", "passive"]
+
+
+def test_memory_mapped_game_reloads(make_room):
+
+    r = make_room(history_backend="memmap")
+    r.new_game()
+    init(r)
+
+    for t in range(3):
+        play_turn(r, t)
+
+    r.backup.checkpoint()
+
+    # index is written by checkpoints
+    opened = HistoryStore.open(r.data.history.folder)
+    assert len(opened) == 3
+
+    recovered = make_room(history_backend="memmap")
+    recovered.load_game(r.backup.file)
+
+    assert len(recovered.data.history) == 3
+
+    for key in ("firm_prices", "firm_positions", "customer_firm_choices", "firm_status"):
+        assert recovered.data.history[key].is_mapped
+        assert [list(i) for i in recovered.data.history[key]] == [list(i) for i in r.data.history[key]]
@@ -0,0 +1,139 @@
+import os
+import time
+from os import path
+from threading import Event
+from types import SimpleNamespace
+
+from hotelling_server.control.housekeeper import Housekeeper
+
+
+class Sessions:
+
+    """games of the rooms of the server, as seen by the housekeeper"""
+
+    def __init__(self, folder, **housekeeping):
+
+        self.param = {
+            "folders": {"save": folder},
+            "housekeeping": dict({
+                "enabled": True,
+                "interval": 600,
+                "min_idle_time": 3600,
+                "compress": False,
+                "compression_level": 6,
+                "deduplicate": False,
+                "max_count": 0,
+                "max_age_days": 0,
+                "max_size_mb": 0
+            }, **housekeeping)
+        }
+
+        self.open_files = set()
+
+    def get_open_files(self):
+        return {path.realpath(i) for i in self.open_files}
+
+    def reserve(self, file):
+        return path.realpath(file) not in self.get_open_files()
+
+    def release(self, file):
+        pass
+
+
+def make_housekeeper(folder, **housekeeping):
+    return Housekeeper(controller=SimpleNamespace(sessions=Sessions(str(folder), **housekeeping), shutdown=Event()))
+
+
+def make_games(folder, ages_days, size=1000):
+    """games saved 'ages_days' days ago, with a journal"""
+
+    files = []
+
+    for i, age in enumerate(ages_days):
+
+        file = str(folder / "xp_game-{}.p".format(i))
+
+        for f in (file, str(folder / "xp_game-{}.journal".format(i))):
+
+            with open(f, "wb") as stream:
+                stream.write(b"\0" * size)
+
+            mtime = time.time() - age * 24 * 3600
+            os.utime(f, (mtime, mtime))
+
+        files.append(file)
+
+    return files
+
+
+def get_games(folder):
+    return sorted(i for i in os.listdir(str(folder)) if i.endswith(".p"))
+
+
+def test_oldest_games_are_removed_beyond_max_count(tmp_path):
+
+    make_games(tmp_path, [1, 5, 3, 4])
+
+    housekeeper = make_housekeeper(tmp_path, max_count=2)
+    housekeeper.apply_retention(housekeeper.get_idle_sessions())
+
+    assert get_games(tmp_path) == ["xp_game-0.p", "xp_game-2.p"]
+
+    # with their journal
+    assert not path.exists(str(tmp_path / "xp_game-1.journal"))
+    assert path.exists(str(tmp_path / "xp_game-2.journal"))
+
+
+def test_games_older_than_max_age_are_removed(tmp_path):
+
+    make_games(tmp_path, [1, 10, 3, 40])
+
+    housekeeper = make_housekeeper(tmp_path, max_age_days=7)
+    housekeeper.apply_retention(housekeeper.get_idle_sessions())
+
+    assert get_games(tmp_path) == ["xp_game-0.p", "xp_game-2.p"]
+
+
+def test_oldest_games_are_removed_beyond_max_size(tmp_path):
+
+    # each game takes 1 MB with its journal
+    make_games(tmp_path, [1, 2, 3, 4], size=2 ** 19)
+
+    housekeeper = make_housekeeper(tmp_path, max_size_mb=2)
+    housekeeper.apply_retention(housekeeper.get_idle_sessions())
+
+    assert get_games(tmp_path) == ["xp_game-0.p", "xp_game-1.p"]
+
+
+def test_games_in_use_count_but_are_kept(tmp_path):
+
+    games = make_games(tmp_path, [1, 5, 3, 4])
+
+    housekeeper = make_housekeeper(tmp_path, max_count=2)
+
+    # oldest game is played in a room
+    housekeeper.cont.sessions.open_files.add(games[1])
+
+    housekeeper.apply_retention(housekeeper.get_idle_sessions())
+
+    assert get_games(tmp_path) == ["xp_game-0.p", "xp_game-1.p"]
+
+
+def test_recent_games_are_not_touched(tmp_path):
+
+    make_games(tmp_path, [0, 0, 0])
+
+    housekeeper = make_housekeeper(tmp_path, max_count=1)
+    housekeeper.apply_retention(housekeeper.get_idle_sessions())
+
+    assert get_games(tmp_path) == ["xp_game-0.p", "xp_game-1.p", "xp_game-2.p"]
+
+
+def test_no_limit_keeps_everything(tmp_path):
+
+    make_games(tmp_path, [1, 100, 1000])
+
+    housekeeper = make_housekeeper(tmp_path)
+    housekeeper.apply_retention(housekeeper.get_idle_sessions())
+
+    assert len(get_games(tmp_path)) == 3
@@ -0,0 +1,83 @@
+from hotelling_server.control.journal import Journal
+
+
+def write(journal, *payloads):
+    journal.write([journal.encode("delta", p) for p in payloads])
+
+
+def test_records_are_read_in_order(tmp_path):
+
+    journal = Journal(file=str(tmp_path / "game.journal"))
+
+    write(journal, {"a": 1}, {"a": 2})
+    write(journal, {"a": 3})
+    journal.close()
+
+    assert list(Journal(file=journal.file).read()) == [("delta", {"a": 1}), ("delta", {"a": 2}), ("delta", {"a": 3})]
+
+
+def test_truncated_record_is_ignored(tmp_path):
+
+    journal = Journal(file=str(tmp_path / "game.journal"))
+
+    write(journal, {"a": 1}, {"a": 2})
+    journal.close()
+
+    # crash while the last record was written
+    with open(journal.file, "rb+") as file:
+        file.truncate(len(file.read()) - 3)
+
+    recovered = Journal(file=journal.file)
+
+    assert list(recovered.read()) == [("delta", {"a": 1})]
+    assert recovered.n_records == 1
+
+    # only a part of the header of a record
+    with open(journal.file, "ab") as file:
+        file.write(b"\x01")
+
+    assert list(Journal(file=journal.file).read()) == [("delta", {"a": 1})]
+
+
+def test_truncation_keeps_numbering(tmp_path):
+
+    journal = Journal(file=str(tmp_path / "game.journal"))
+
+    write(journal, {"a": 1}, {"a": 2})
+
+    # records are now part of a snapshot written with this sequence number
+    seq = journal.seq
+    journal.truncate()
+
+    assert journal.n_records == 0
+    assert list(Journal(file=journal.file).read()) == []
+
+    write(journal, {"a": 3})
+    journal.close()
+
+    recovered = Journal(file=journal.file)
+
+    assert list(recovered.read(after=seq)) == [("delta", {"a": 3})]
+    assert recovered.seq == seq + 1
+
+
+def test_records_of_snapshot_are_skipped(tmp_path):
+
+    journal = Journal(file=str(tmp_path / "game.journal"))
+
+    write(journal, {"a": 1}, {"a": 2}, {"a": 3})
+    journal.close()
+
+    # e.g. a crash between the writing of a snapshot and the truncation of the journal
+    assert list(Journal(file=journal.file).read(after=2)) == [("delta", {"a": 3})]
+
+
+def test_reset_starts_numbering_again(tmp_path):
+
+    journal = Journal(file=str(tmp_path / "game.journal"))
+
+    write(journal, {"a": 1})
+    journal.reset()
+
+    assert journal.seq == 0
+    assert list(journal.read()) == []
@@ -0,0 +1,86 @@
+import time
+from types import SimpleNamespace
+
+from hotelling_server.control.matchmaker import Matchmaker
+
+
+def make_matchmaker(**matchmaking):
+
+    param = {
+        "game": {"n_firms": 2, "n_customers": 2},
+        "matchmaking": dict({
+            "enabled": True,
+            "interval": 5,
+            "max_rooms": 4,
+            "fill_with_bots": True,
+            "min_players": 1,
+            "max_waiting_time": 60,
+            "human_roles": ["firm", "customer"]
+        }, **matchmaking)
+    }
+
+    return Matchmaker(controller=SimpleNamespace(sessions=SimpleNamespace(param=param)))
+
+
+def get_names(assignment):
+    return [assignment[i]["name"] for i in sorted(assignment)]
+
+
+def test_full_games_are_matched_in_waiting_order():
+
+    m = make_matchmaker()
+
+    assignments = m.match(["a", "b", "c", "d", "e", "f", "g", "h", "i"], n_free_rooms=4)
+
+    assert [get_names(i) for i in assignments] == [["a", "b", "c", "d"], ["e", "f", "g", "h"]]
+
+    assert [assignments[0][i]["role"] for i in range(4)] == ["firm", "firm", "customer", "customer"]
+    assert not any(i["bot"] for a in assignments for i in a.values())
+
+    # matched players are not matched again while they stay in the waiting list
+    assignments = m.match(["a", "b", "c", "d", "i", "j", "k", "l"], n_free_rooms=4)
+
+    assert [get_names(i) for i in assignments] == [["i", "j", "k", "l"]]
+
+
+def test_number_of_games_is_limited_by_free_rooms():
+
+    m = make_matchmaker()
+
+    assert len(m.match(list("abcdefgh"), n_free_rooms=1)) == 1
+
+    # those who were not matched are matched when a room is free
+    assert [get_names(i) for i in m.match(list("abcdefgh"), n_free_rooms=1)] == [list("efgh")]
+
+
+def test_players_who_waited_too_long_play_with_bots():
+
+    m = make_matchmaker(max_waiting_time=10)
+
+    assert m.match(["a", "b"], n_free_rooms=1) == []
+
+    m.first_seen["a"] -= 11
+
+    assignment, = m.match(["a", "b"], n_free_rooms=1)
+
+    assert get_names(assignment) == ["a", "b", "Bot", "Bot"]
+    assert [assignment[i]["bot"] for i in range(4)] == [False, False, True, True]
+
+
+def test_bots_are_not_used_when_disabled():
+
+    m = make_matchmaker(fill_with_bots=False, max_waiting_time=0)
+
+    m.first_seen["a"] = time.time() - 100
+
+    assert m.match(["a", "b"], n_free_rooms=1) == []
+
+
+def test_player_leaving_waiting_list_can_be_matched_again():
+
+    m = make_matchmaker()
+
+    m.match(list("abcd"), n_free_rooms=1)
+    m.match([], n_free_rooms=1)
+
+    assert [get_names(i) for i in m.match(list("abcd"), n_free_rooms=1)] == [list("abcd")]
@@ -0,0 +1,91 @@
+import shutil
+from os import path
+
+from hotelling_server.control import backup
+from players import get_firms, get_customers, init, play_customer, end_turn, play_turn
+
+
+def test_recovery_in_the_middle_of_a_turn(make_room):
+
+    r = make_room()
+    r.new_game()
+    init(r)
+
+    for t in range(4):
+        play_turn(r, t)
+
+    assert r.time_manager.t == 4
+
+    active, passive = get_firms(r)
+    customers = get_customers(r)
+
+    # active firm and one customer replied, then server crashed after last checkpoint
+    r.handle_request("ask_firm_active_choice_recording/{}/4/3/5".format(active))
+    reply = play_customer(r, customers[3], 4)
+
+    r.backup.checkpoint()
+
+    recovered = make_room()
+    assignment, recovery = recovered.load_game(r.backup.file)
+
+    assert "error" not in recovery
+    assert recovered.time_manager.t == 4
+    assert recovered.time_manager.state == "active_has_played"
+    assert recovered.data.current_state["customer_replies"][recovered.data.customers_id[customers[3]]] == 1
+
+    # the customer did not get its reply, it asks again
+    assert play_customer(recovered, customers[3], 4) == reply
+
+    for game_id in customers:
+        if game_id != customers[3]:
+            play_customer(recovered, game_id, 4)
+
+    assert sum(recovered.data.current_state["customer_replies"]) == len(customers)
+    assert recovered.time_manager.state == "active_has_played_and_all_customers_replied"
+
+    end_turn(recovered, 4)
+
+    assert recovered.time_manager.t == 5
+
+    active, passive = get_firms(recovered)
+
+    assert recovered.handle_request("ask_firm_active_choice_recording/{}/5/3/5".format(active))[0] == "reply"
+
+
+def copy_game(file, folder):
+    """copy of the snapshot and journal of a game, which can be loaded without changing the game"""
+
+    folder.mkdir()
+
+    for source in (file, backup.Backup.get_journal_file(file)):
+        shutil.copy(source, str(folder))
+
+    return str(folder / path.basename(file))
+
+
+def test_recovery_with_truncated_journal(make_room, tmp_path):
+
+    r = make_room()
+    r.new_game()
+    init(r)
+
+    for t in range(3):
+        play_turn(r, t)
+        r.backup.checkpoint()
+
+    r.close()
+
+    complete = copy_game(r.backup.file, tmp_path / "complete")
+    truncated = copy_game(r.backup.file, tmp_path / "truncated")
+
+    # crash while the last record was written
+    with open(backup.Backup.get_journal_file(truncated), "rb+") as file:
+        file.truncate(len(file.read()) - 1)
+
+    assignment, recovery = make_room().load_game(complete)
+    assert "error" not in recovery
+    assert recovery["t"] == 3
+
+    assignment, truncated_recovery = make_room().load_game(truncated)
+    assert "error" not in truncated_recovery
+    assert truncated_recovery["journal_records"] == recovery["journal_records"] - 1
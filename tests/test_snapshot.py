@@ -0,0 +1,114 @@
+import io
+import pickle
+
+import numpy as np
+import pytest
+
+from hotelling_server.control.history import HistoryStore
+from hotelling_server.control.snapshot import Snapshot
+
+
+def make_state():
+
+    history = HistoryStore(["firm_prices"])
+
+    for t in range(3):
+        history.append({"firm_prices": [t, t + 1]})
+
+    return {
+        "current_state": {"firm_prices": np.array([4, 5]), "firm_status": ["active", "passive"]},
+        "history": history,
+        "journal_seq": 7,
+        "last_replies": {}
+    }
+
+
+def write(state, compression):
+
+    file = io.BytesIO()
+    Snapshot.write(file, Snapshot.encode(state), compression=compression)
+
+    return file.getvalue()
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_state_is_read_back(compression):
+
+    content = write(make_state(), compression)
+
+    assert Snapshot.read_info(io.BytesIO(content)) == (Snapshot.version, Snapshot.compressions[compression])
+
+    state = Snapshot.read(io.BytesIO(content))
+
+    assert list(state["current_state"]["firm_prices"]) == [4, 5]
+    assert state["current_state"]["firm_status"] == ["active", "passive"]
+    assert state["journal_seq"] == 7
+    assert [list(i) for i in state["history"]["firm_prices"]] == [[0, 1], [1, 2], [2, 3]]
+
+    # arrays go on being written once loaded
+    state["current_state"]["firm_prices"][0] = 6
+    state["history"].append({"firm_prices": [3, 4]})
+
+    assert len(state["history"]) == 4
+
+
+def test_arrays_are_out_of_band():
+
+    state = make_state()
+    state["current_state"]["firm_prices"] = np.arange(1000)
+
+    parts = Snapshot.encode(state)
+
+    assert len(parts) > 1
+    assert len(parts[0]) < np.arange(1000).nbytes
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_truncated_snapshot_raises(compression):
+
+    content = write(make_state(), compression)
+
+    with pytest.raises(Snapshot.errors):
+        Snapshot.read(io.BytesIO(content[:-10]))
+
+
+def test_newer_schema_is_refused():
+
+    content = bytearray(write(make_state(), None))
+    content[len(Snapshot.magic):len(Snapshot.magic) + 2] = (Snapshot.version + 1).to_bytes(2, "little")
+
+    with pytest.raises(ValueError):
+        Snapshot.read(io.BytesIO(bytes(content)))
+
+
+def test_plain_pickle_of_previous_versions_is_migrated():
+
+    # history as lists, no journal
+    state = {
+        "current_state": {"firm_prices": [4, 5]},
+        "history": {"firm_prices": [[0, 1], [1, 2]], "firm_status": [["active", "passive"]] * 2}
+    }
+
+    content = pickle.dumps(state)
+
+    assert Snapshot.read_version(io.BytesIO(content)) == 0
+
+    migrated = Snapshot.read(io.BytesIO(content))
+
+    assert isinstance(migrated["history"], HistoryStore)
+    assert len(migrated["history"]) == 2
+    assert list(migrated["history"]["firm_prices"][1]) == [1, 2]
+    assert migrated["history"]["firm_status"][0] == ["active", "passive"]
+    assert migrated["journal_seq"] == 0
+    assert migrated["last_replies"] == {}
+
+
+def test_migrate_0_keeps_columns():
+
+    state = make_state()
+    del state["journal_seq"]
+
+    Snapshot.migrate_0(state)
+
+    assert len(state["history"]) == 3
+    assert state["journal_seq"] == 0
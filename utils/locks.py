@@ -0,0 +1,63 @@
+import time
+from threading import RLock, Lock
+
+
+class InstrumentedLock:
+
+    """
+    Reentrant lock counting how often threads had to wait for it
+    and how long they waited.
+    Uncontended acquisitions only cost a non-blocking attempt.
+    """
+
+    def __init__(self, name):
+
+        self.name = name
+
+        self._lock = RLock()
+        self._stats_lock = Lock()
+
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_time = 0.
+        self.max_wait_time = 0.
+
+    def acquire(self):
+
+        if self._lock.acquire(blocking=False):
+            wait_time = None
+
+        else:
+            start = time.perf_counter()
+            self._lock.acquire()
+            wait_time = time.perf_counter() - start
+
+        with self._stats_lock:
+
+            self.acquisitions += 1
+
+            if wait_time is not None:
+                self.contended += 1
+                self.wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *args):
+        self.release()
+
+    def get_stats(self):
+
+        with self._stats_lock:
+            return {
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time
+            }
@@ -0,0 +1,109 @@
+import time
+from threading import Lock
+
+from utils.utils import Logger
+
+
+class Message:
+
+    """
+    Command sent through a queue to a thread
+    owning a 'CommandRegistry'.
+    Sending time is recorded in order to measure queue wait time.
+    """
+
+    __slots__ = ("command", "args", "sent_at")
+
+    def __init__(self, command, *args):
+
+        self.command = command
+        self.args = args
+        self.sent_at = time.time()
+
+    def __repr__(self):
+        return "Message{}".format((self.command, ) + self.args)
+
+
+class HandlerStats:
+
+    __slots__ = ("count", "wait_time", "exec_time", "max_exec_time")
+
+    def __init__(self):
+
+        self.count = 0
+        self.wait_time = 0.
+        self.exec_time = 0.
+        self.max_exec_time = 0.
+
+    def add(self, wait_time, exec_time):
+
+        self.count += 1
+        self.wait_time += wait_time
+        self.exec_time += exec_time
+        self.max_exec_time = max(self.max_exec_time, exec_time)
+
+    def as_dict(self):
+
+        return {
+            "count": self.count,
+            "wait_time": self.wait_time,
+            "exec_time": self.exec_time,
+            "max_exec_time": self.max_exec_time
+        }
+
+
+class CommandRegistry(Logger):
+
+    """
+    Map command names to handlers once, at startup.
+    Every command has to be declared explicitly by the owner,
+    and a missing handler is an error at construction time.
+    """
+
+    name = "CommandRegistry"
+
+    def __init__(self, owner, commands):
+
+        self.owner_name = owner.name
+
+        self.handlers = {}
+
+        for command in commands:
+
+            handler = getattr(owner, command, None)
+
+            if handler is None:
+                raise AttributeError("'{}' declares command '{}' but has no handler for it.".format(
+                    self.owner_name, command))
+
+            self.handlers[command] = handler
+
+        self.stats = {command: HandlerStats() for command in commands}
+        self.stats_lock = Lock()
+
+    def dispatch(self, message):
+
+        handler = self.handlers.get(message.command)
+
+        if handler is None:
+            self.log("'{}' received unknown command '{}'.".format(self.owner_name, message.command), level=3)
+            return
+
+        start = time.time()
+        wait_time = start - message.sent_at
+
+        try:
+            return handler(*message.args)
+
+        finally:
+
+            exec_time = time.time() - start
+
+            with self.stats_lock:
+                self.stats[message.command].add(wait_time=wait_time, exec_time=exec_time)
+
+    def get_stats(self):
+        """returns stats of commands that have been dispatched at least once"""
+
+        with self.stats_lock:
+            return {k: v.as_dict() for k, v in self.stats.items() if v.count}
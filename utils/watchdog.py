@@ -0,0 +1,114 @@
+import sys
+import time
+import traceback
+import threading
+from threading import Thread, Event, Lock
+
+from utils.utils import Logger
+
+
+class Watchdog(Thread, Logger):
+
+    """
+    Track heartbeats of long-lived threads.
+    A thread sends 'beat(name)' on each iteration of its loop, and 'forget(name)'
+    when it is legitimately idle or stops.
+    When a heartbeat is older than 'timeout', stacks of every thread
+    and depths of watched queues are logged and 'alert' is called with a summary.
+    """
+
+    name = "Watchdog"
+
+    def __init__(self, interval, timeout, alert):
+
+        super().__init__()
+
+        self.daemon = True
+
+        self.interval = interval
+        self.timeout = timeout
+        self.alert = alert
+
+        self.lock = Lock()
+
+        # key: name, value: time of last heartbeat
+        self.heartbeats = {}
+        self.stalled = set()
+
+        # key: name, value: queue
+        self.queues = {}
+
+        self.shutdown = Event()
+
+    def beat(self, name):
+
+        with self.lock:
+            self.heartbeats[name] = time.time()
+
+    def forget(self, name):
+
+        with self.lock:
+            self.heartbeats.pop(name, None)
+            self.stalled.discard(name)
+
+    def watch_queue(self, name, queue):
+        self.queues[name] = queue
+
+    def stop(self):
+        self.shutdown.set()
+
+    def run(self):
+
+        while not self.shutdown.wait(self.interval):
+            self.check()
+
+    def check(self):
+
+        now = time.time()
+
+        with self.lock:
+
+            late = {name for name, last in self.heartbeats.items() if now - last > self.timeout}
+
+            newly_stalled = late - self.stalled
+            recovered = self.stalled - late
+
+            self.stalled = late
+
+        for name in recovered:
+            self.log("'{}' is alive again.".format(name), level=1)
+
+        if newly_stalled:
+
+            summary = "No heartbeat from {} for more than {} s.".format(
+                ", ".join("'{}'".format(i) for i in sorted(newly_stalled)), self.timeout)
+
+            self.log("{}\n{}".format(summary, self.get_report()), level=3)
+            self.alert(summary)
+
+    def get_queue_depths(self):
+
+        depths = {}
+
+        for name, queue in self.queues.items():
+
+            try:
+                depths[name] = queue.qsize()
+
+            # not implemented on every platform
+            except NotImplementedError:
+                depths[name] = "unknown"
+
+        return depths
+
+    def get_report(self):
+
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+
+        lines = ["Queue depths: {}".format(self.get_queue_depths())]
+
+        for ident, frame in sys._current_frames().items():
+            lines.append("Thread '{}' ({}):".format(thread_names.get(ident, "unknown"), ident))
+            lines.append("".join(traceback.format_stack(frame)))
+
+        return "\n".join(lines)